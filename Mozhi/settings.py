@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from environs import Env
 import os
 
@@ -26,11 +27,90 @@ SAVE_DIR = env.str("SAVE_DIR", default=os.path.join(BASE_DIR, 'Projects'))
 #Custom Variable to set pagination
 PAGE_NUM = env.int("PAGE_NUM", default = 10)
 
+#Custom variables to show estimated (planner or briefly cached) transcript counts instead of a COUNT(*) on every page
+APPROXIMATE_COUNTS = env.bool("APPROXIMATE_COUNTS", default = False)
+COUNT_CACHE_TIMEOUT = env.int("COUNT_CACHE_TIMEOUT", default = 60)
+
 #Custom Import Batch Size variable
 BATCH_SIZE = env.int("BATCH_SIZE", default = 500)
 
-#Custom variable to set read limit
-LINES_PER_READ = env.int("LINES_PER_READ", default = 50)
+#Custom variable to set how many bytes of a manifest are read at a time
+MANIFEST_BLOCK_SIZE = env.int("MANIFEST_BLOCK_SIZE", default = 1024 * 1024)
+
+#Custom variables for parsing very large manifests on a process pool
+MANIFEST_WORKERS = env.int("MANIFEST_WORKERS", default = os.cpu_count() or 1)
+MANIFEST_CHUNK_SIZE = env.int("MANIFEST_CHUNK_SIZE", default = 64 * 1024 * 1024)
+MANIFEST_PARALLEL_THRESHOLD = env.int("MANIFEST_PARALLEL_THRESHOLD", default = 256 * 1024 * 1024)
+
+#Custom variables to queue imports for `manage.py run_import_worker` instead of running them in the request
+BACKGROUND_IMPORTS = env.bool("BACKGROUND_IMPORTS", default = False)
+IMPORT_POLL_INTERVAL = env.float("IMPORT_POLL_INTERVAL", default = 1.0)
+IMPORT_STALE_AFTER = env.int("IMPORT_STALE_AFTER", default = 15 * 60)
+IMPORT_PROGRESS_STREAM_SECONDS = env.float("IMPORT_PROGRESS_STREAM_SECONDS", default = 20.0)
+
+#Custom variable to bound the worker pool used to probe audio durations on import
+PROBE_WORKERS = env.int("PROBE_WORKERS", default = min(32, (os.cpu_count() or 1) + 4))
+
+#Custom variable to set how many audio directory listings are cached per process
+AUDIO_INDEX_CACHE_SIZE = env.int("AUDIO_INDEX_CACHE_SIZE", default = 8)
+
+#Custom variables to let the web server stream audio ("x-accel-redirect" for nginx, "x-sendfile" for Apache/lighttpd, empty to serve from Django)
+AUDIO_SENDFILE_MODE = env.str("AUDIO_SENDFILE_MODE", default = "").lower()
+AUDIO_SENDFILE_PREFIX = env.str("AUDIO_SENDFILE_PREFIX", default = "/protected-audio/")
+
+#Custom variable to set how many min/max pairs are precomputed for each waveform
+PEAKS_BINS = env.int("PEAKS_BINS", default = 800)
+
+#Custom variables for resumable recording uploads: suggested chunk size, and seconds an unfinished upload is kept
+UPLOAD_CHUNK_SIZE = env.int("UPLOAD_CHUNK_SIZE", default = 4 * 1024 * 1024)
+UPLOAD_EXPIRY = env.int("UPLOAD_EXPIRY", default = 24 * 60 * 60)
+
+#Custom variable to choose how recordings are stored: "wav", or "flac" for lossless files about half the size
+AUDIO_STORAGE_FORMAT = env.str("AUDIO_STORAGE_FORMAT", default = "wav").lower()
+if AUDIO_STORAGE_FORMAT not in ("wav", "flac"):
+    raise ImproperlyConfigured(f'AUDIO_STORAGE_FORMAT must be "wav" or "flac", not "{AUDIO_STORAGE_FORMAT}"')
+
+#Custom variable to route audio serving, recording uploads and the export stream to async views; set it when serving Mozhi/asgi.py
+ASYNC_VIEWS = env.bool("ASYNC_VIEWS", default = False)
+
+#Custom variables for request metrics: per-view latency, SQL and filesystem costs and response sizes, kept as
+#histograms for /metrics/ (also over the last METRICS_WINDOW seconds), and sent with each response as a Server-Timing header
+REQUEST_METRICS = env.bool("REQUEST_METRICS", default = True)
+SERVER_TIMING = env.bool("SERVER_TIMING", default = True)
+METRICS_WINDOW = env.int("METRICS_WINDOW", default = 300)
+
+#Custom variables to choose the database: "sqlite" (default) or "postgresql", which needs psycopg installed.
+#DB_NAME is the file path for SQLite; the other DB_* variables are only used by PostgreSQL
+DB_ENGINE = env.str("DB_ENGINE", default = "sqlite").lower()
+DB_NAME = env.str("DB_NAME", default = str(BASE_DIR / 'db.sqlite3') if DB_ENGINE == "sqlite" else "mozhi")
+DB_USER = env.str("DB_USER", default = "")
+DB_PASSWORD = env.str("DB_PASSWORD", default = "")
+DB_HOST = env.str("DB_HOST", default = "")
+DB_PORT = env.str("DB_PORT", default = "")
+
+#Custom variables for running on SQLite in production: WAL journal, tuned pragmas and a busy timeout on every
+#connection, IMMEDIATE write transactions and persistent connections, so reads and edits keep working during an import
+SQLITE_PRODUCTION = env.bool("SQLITE_PRODUCTION", default = False)
+SQLITE_BUSY_TIMEOUT = env.float("SQLITE_BUSY_TIMEOUT", default = 20.0)
+SQLITE_MMAP_SIZE = env.int("SQLITE_MMAP_SIZE", default = 256 * 1024 * 1024)
+SQLITE_CACHE_SIZE = env.int("SQLITE_CACHE_SIZE", default = -64000)
+CONN_MAX_AGE = env.int("CONN_MAX_AGE", default = 600 if SQLITE_PRODUCTION or DB_ENGINE == "postgresql" else 0)
+
+SQLITE_PRODUCTION_OPTIONS = {
+    # Seconds a connection waits for a lock before "database is locked".
+    "timeout": SQLITE_BUSY_TIMEOUT,
+    # Take the write lock when a transaction starts, so a reader that later
+    # writes queues on the busy timeout instead of failing to upgrade.
+    "transaction_mode": "IMMEDIATE",
+    "init_command": ";".join([
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+        # Negative values are KiB rather than pages.
+        f"PRAGMA cache_size={SQLITE_CACHE_SIZE}",
+        "PRAGMA temp_store=MEMORY",
+    ]),
+}
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -76,6 +156,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so the session and auth queries of each request are counted too.
+    'transcription.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -108,12 +190,31 @@ WSGI_APPLICATION = 'Mozhi.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+if DB_ENGINE == "postgresql":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': DB_NAME,
+            'USER': DB_USER,
+            'PASSWORD': DB_PASSWORD,
+            'HOST': DB_HOST,
+            'PORT': DB_PORT,
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': CONN_MAX_AGE > 0,
+        }
     }
-}
+elif DB_ENGINE == "sqlite":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': DB_NAME,
+            'OPTIONS': SQLITE_PRODUCTION_OPTIONS if SQLITE_PRODUCTION else {},
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': CONN_MAX_AGE > 0,
+        }
+    }
+else:
+    raise ImproperlyConfigured(f'DB_ENGINE must be "sqlite" or "postgresql", not "{DB_ENGINE}"')
 
 
 # Password validation
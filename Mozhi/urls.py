@@ -19,11 +19,15 @@ from django.urls import path, include, re_path
 from django.views.generic import RedirectView
 from django.conf import settings
 from django.conf.urls.static import static
-from transcription import views
+from transcription import views, async_views
+from Mozhi.settings import ASYNC_VIEWS
 from django.contrib.auth import views as auth_views
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.cache import never_cache
 
+# Under ASGI the I/O-bound endpoints are served by their async versions.
+io_views = async_views if ASYNC_VIEWS else views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('users/login/', never_cache(views.custom_login_view), name='login'),    
@@ -32,12 +36,23 @@ urlpatterns = [
     path('', views.project_list, name='project_list'),
     path('projects/create/', views.create_project, name='create_project'),
     path('projects/import/', views.import_project, name='import_project'),
+    path('projects/import/jobs/<uuid:job_id>/', views.import_job_status, name='import_job_status'),
+    path('projects/import/jobs/<uuid:job_id>/progress/', views.import_job_progress, name='import_job_progress'),
+    path('projects/import/jobs/<uuid:job_id>/resume/', views.resume_import, name='resume_import'),
     path('projects/<uuid:project_id>/', views.project_detail, name='project_detail'),
     path('projects/<uuid:project_id>/delete/', views.delete_project, name='delete_project'),
+    path('projects/<uuid:project_id>/sync/', views.sync_project, name='sync_project'),
     path('transcripts/<uuid:transcript_id>/delete/', views.delete_transcript, name='delete_transcript'),
     path('transcripts/<uuid:transcript_id>/edit/', views.edit_transcript, name='edit_transcript'),
-    path('api/save-record/', views.save_record, name='save_record'),
-    path('audio/<uuid:transcript_id>/', views.serve_audio, name='serve_audio'),
+    path('transcripts/edit/', views.edit_transcripts, name='edit_transcripts'),
+    path('api/save-record/', io_views.save_record, name='save_record'),
+    path('api/uploads/', views.start_upload, name='start_upload'),
+    path('api/uploads/<uuid:upload_id>/', io_views.upload_chunk, name='upload_chunk'),
+    path('api/uploads/<uuid:upload_id>/finish/', io_views.finish_upload, name='finish_upload'),
+    path('audio/<uuid:transcript_id>/', io_views.serve_audio, name='serve_audio'),
+    path('audio/<uuid:transcript_id>/peaks/', views.audio_peaks, name='audio_peaks'),
+    path('search/', views.search, name='search'),
+    path('metrics/', views.metrics_view, name='metrics'),
     path('export/', include('export.urls')),
     re_path(r'^.*$', RedirectView.as_view(pattern_name='project_list', permanent=False)),
 ]
@@ -0,0 +1,96 @@
+"""
+Async version of the details.json export, routed in place of
+views.export_project_json when ASYNC_VIEWS is set (see
+transcription/async_views.py). Rows come from the async ORM iterator and
+each batch is written to the manifest in a worker thread, so a slow client
+reading the progress stream does not hold a server thread.
+"""
+import asyncio
+import json
+import os
+
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+
+from Mozhi.settings import BATCH_SIZE
+from transcription.audio_index import list_directory, project_audio_dir
+from transcription.manifest import ManifestWriter
+from transcription.models import Project, Transcript
+from .views import manifest_entries
+
+
+def _write_batch(writer, rows, audio_dir, audio_files, missing_files):
+    written = 0
+    for entry in manifest_entries(rows, audio_dir, audio_files, missing_files):
+        writer.write(entry)
+        written += 1
+    return written
+
+
+@csrf_exempt
+@login_required
+async def export_project_json(request, project_id):
+    """Async views.export_project_json."""
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'error': 'Method not allowed'}, status=405)
+
+    project = await aget_object_or_404(Project, id=project_id)
+    batch_size = int(BATCH_SIZE)
+    jsonl = request.POST.get('format') == 'jsonl'
+
+    async def stream_progress():
+        processed = 0
+        missing_files = []
+        audio_dir = project_audio_dir(project)
+        audio_files = await asyncio.to_thread(list_directory, audio_dir)
+
+        yield json.dumps({"type": "init", "total": project.transcript_count}) + "\n"
+
+        # named=True: plain values_list() opens its cursor as soon as the
+        # iterator is created, which aiterator() does on the event loop.
+        rows = (
+            Transcript.objects
+            .filter(project=project)
+            .values_list('audio_file', 'transcript', 'duration', named=True)
+            .aiterator(chunk_size=batch_size)
+        )
+
+        try:
+            project_dir = os.path.join(project.folder_path, project.name)
+            await asyncio.to_thread(os.makedirs, project_dir, exist_ok=True)
+            json_file_path = os.path.join(project_dir, 'details.json')
+
+            # details.json is only replaced once every entry has been written.
+            writer = ManifestWriter(json_file_path, jsonl=jsonl)
+            await asyncio.to_thread(writer.__enter__)
+            try:
+                batch = []
+                async for row in rows:
+                    batch.append(row)
+                    if len(batch) == batch_size:
+                        processed += await asyncio.to_thread(
+                            _write_batch, writer, batch, audio_dir, audio_files, missing_files)
+                        batch = []
+                        yield json.dumps({"type": "progress", "current": processed}) + "\n"
+                if batch:
+                    processed += await asyncio.to_thread(
+                        _write_batch, writer, batch, audio_dir, audio_files, missing_files)
+                    yield json.dumps({"type": "progress", "current": processed}) + "\n"
+            except BaseException as e:
+                await asyncio.to_thread(writer.__exit__, type(e), e, e.__traceback__)
+                raise
+            await asyncio.to_thread(writer.__exit__, None, None, None)
+
+            await Project.objects.filter(pk=project.pk).aupdate(missing_audio_count=len(missing_files))
+
+            yield json.dumps({
+                "type": "success",
+                "message": f"Exported to {json_file_path}",
+                "missing_files": missing_files
+            }) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+
+    return StreamingHttpResponse(stream_progress(), content_type='application/x-ndjson')
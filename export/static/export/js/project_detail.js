@@ -1,106 +1,120 @@
 // Export JSON Logic
 const exportJsonBtn = document.getElementById('exportJsonBtn');
+const exportJsonlBtn = document.getElementById('exportJsonlBtn');
 const exportModal = document.getElementById('exportModal');
 const exportStatusText = document.getElementById('exportStatusText');
 const exportProgressBar = document.getElementById('exportProgressBar');
 const exportProgressCount = document.getElementById('exportProgressCount');
 const closeExportModalBtn = document.getElementById('closeExportModalBtn');
 
-if (exportJsonBtn) {
-    exportJsonBtn.onclick = async () => {
-        // Reset and open modal
-        exportStatusText.textContent = 'Preparing export...';
-        exportProgressBar.style.width = '0%';
-        exportProgressBar.className = 'progress-bar';
-        exportProgressCount.textContent = '';
-        closeExportModalBtn.style.display = 'none';
-        exportModal.style.display = 'block';
-        exportJsonBtn.disabled = true;
+// `format` is 'json' for a JSON array or 'jsonl' for one object per line.
+async function runExport(format) {
+    // Reset and open modal
+    exportStatusText.textContent = 'Preparing export...';
+    exportProgressBar.style.width = '0%';
+    exportProgressBar.className = 'progress-bar';
+    exportProgressCount.textContent = '';
+    closeExportModalBtn.style.display = 'none';
+    exportModal.style.display = 'block';
+    exportJsonBtn.disabled = true;
+    if (exportJsonlBtn) exportJsonlBtn.disabled = true;
 
-        try {
-            const response = await fetch(window.exportJsonUrl, {
-                method: 'POST',
-                headers: { 'X-CSRFToken': window.csrfToken }
-            });
+    const formData = new FormData();
+    formData.append('format', format);
+
+    try {
+        const response = await fetch(window.exportJsonUrl, {
+            method: 'POST',
+            body: formData,
+            headers: { 'X-CSRFToken': window.csrfToken }
+        });
 
-            if (!response.ok) throw new Error(`Server error: ${response.status}`);
-
-            const reader = response.body.getReader();
-            const decoder = new TextDecoder();
-            let buffer = '';
-            let total = 0;
-
-            while (true) {
-                const { done, value } = await reader.read();
-                if (done) break;
-
-                buffer += decoder.decode(value, { stream: true });
-                const lines = buffer.split('\n');
-                buffer = lines.pop();
-
-                for (const line of lines) {
-                    if (!line.trim()) continue;
-                    try {
-                        const msg = JSON.parse(line);
-                        if (msg.type === 'init') {
-                            total = msg.total;
-                            exportStatusText.textContent = `Exporting ${total} transcripts...`;
-                            exportProgressCount.textContent = `0 / ${total}`;
-                        } else if (msg.type === 'progress') {
-                            const pct = total > 0 ? (msg.current / total) * 100 : 0;
-                            exportProgressBar.style.width = `${pct}%`;
-                            exportProgressCount.textContent = `${msg.current} / ${total}`;
-                        } else if (msg.type === 'success') {
-                            exportProgressBar.style.width = '100%';
-                            exportProgressCount.textContent = `${total} / ${total}`;
-
-                            if (msg.missing_files && msg.missing_files.length > 0) {
-                                exportStatusText.textContent = `✓ Exported, but ${msg.missing_files.length} audio files were missing.`;
-                                exportStatusText.style.color = '#c0392b';
-
-                                const logContainer = document.createElement('div');
-                                logContainer.style.marginTop = '15px';
-                                logContainer.style.textAlign = 'center';
-
-                                const downloadBtn = document.createElement('button');
-                                downloadBtn.className = 'btn btn-secondary';
-                                downloadBtn.textContent = 'Download Error Log';
-                                downloadBtn.onclick = () => {
-                                    const blob = new Blob([msg.missing_files.join('\n')], { type: 'text/plain' });
-                                    const url = URL.createObjectURL(blob);
-                                    const a = document.createElement('a');
-                                    a.href = url;
-                                    a.download = `export_errors_${Date.now()}.txt`;
-                                    a.click();
-                                    URL.revokeObjectURL(url);
-                                };
-
-                                logContainer.appendChild(downloadBtn);
-                                exportStatusText.parentNode.insertBefore(logContainer, exportStatusText.nextSibling);
-
-                                closeExportModalBtn.style.display = 'inline-block';
-                            } else {
-                                exportProgressBar.classList.add('success');
-                                exportStatusText.textContent = `✓ ${msg.message}`;
-                                closeExportModalBtn.style.display = 'inline-block';
-                            }
-                        } else if (msg.type === 'error') {
-                            exportProgressBar.classList.add('error');
-                            exportStatusText.textContent = `✗ Error: ${msg.error}`;
+        if (!response.ok) throw new Error(`Server error: ${response.status}`);
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let total = 0;
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                try {
+                    const msg = JSON.parse(line);
+                    if (msg.type === 'init') {
+                        total = msg.total;
+                        exportStatusText.textContent = `Exporting ${total} transcripts...`;
+                        exportProgressCount.textContent = `0 / ${total}`;
+                    } else if (msg.type === 'progress') {
+                        const pct = total > 0 ? (msg.current / total) * 100 : 0;
+                        exportProgressBar.style.width = `${pct}%`;
+                        exportProgressCount.textContent = `${msg.current} / ${total}`;
+                    } else if (msg.type === 'success') {
+                        exportProgressBar.style.width = '100%';
+                        exportProgressCount.textContent = `${total} / ${total}`;
+
+                        if (msg.missing_files && msg.missing_files.length > 0) {
+                            exportStatusText.textContent = `✓ Exported, but ${msg.missing_files.length} audio files were missing.`;
+                            exportStatusText.style.color = '#c0392b';
+
+                            const logContainer = document.createElement('div');
+                            logContainer.style.marginTop = '15px';
+                            logContainer.style.textAlign = 'center';
+
+                            const downloadBtn = document.createElement('button');
+                            downloadBtn.className = 'btn btn-secondary';
+                            downloadBtn.textContent = 'Download Error Log';
+                            downloadBtn.onclick = () => {
+                                const blob = new Blob([msg.missing_files.join('\n')], { type: 'text/plain' });
+                                const url = URL.createObjectURL(blob);
+                                const a = document.createElement('a');
+                                a.href = url;
+                                a.download = `export_errors_${Date.now()}.txt`;
+                                a.click();
+                                URL.revokeObjectURL(url);
+                            };
+
+                            logContainer.appendChild(downloadBtn);
+                            exportStatusText.parentNode.insertBefore(logContainer, exportStatusText.nextSibling);
+
+                            closeExportModalBtn.style.display = 'inline-block';
+                        } else {
+                            exportProgressBar.classList.add('success');
+                            exportStatusText.textContent = `✓ ${msg.message}`;
+                            closeExportModalBtn.style.display = 'inline-block';
                         }
-                    } catch (e) {
-                        console.error('Parse error:', e, line);
+                    } else if (msg.type === 'error') {
+                        exportProgressBar.classList.add('error');
+                        exportStatusText.textContent = `✗ Error: ${msg.error}`;
                     }
+                } catch (e) {
+                    console.error('Parse error:', e, line);
                 }
             }
-        } catch (err) {
-            exportProgressBar.classList.add('error');
-            exportStatusText.textContent = `✗ Failed: ${err.message}`;
-        } finally {
-            exportJsonBtn.disabled = false;
-            closeExportModalBtn.style.display = 'inline-block';
         }
-    };
+    } catch (err) {
+        exportProgressBar.classList.add('error');
+        exportStatusText.textContent = `✗ Failed: ${err.message}`;
+    } finally {
+        exportJsonBtn.disabled = false;
+        if (exportJsonlBtn) exportJsonlBtn.disabled = false;
+        closeExportModalBtn.style.display = 'inline-block';
+    }
+}
+
+if (exportJsonBtn) {
+    exportJsonBtn.onclick = () => runExport('json');
+}
+
+if (exportJsonlBtn) {
+    exportJsonlBtn.onclick = () => runExport('jsonl');
 }
 
 closeExportModalBtn.onclick = () => {
@@ -409,10 +423,16 @@ function wirePlayPause(playBtn, isPlayingFn, toggleFn) {
     const iconPlay = playBtn.querySelector('.icon-play');
     const iconPause = playBtn.querySelector('.icon-pause');
     playBtn.addEventListener('click', toggleFn);
-    return function syncIcons(playing) {
+    function syncIcons(playing) {
         iconPlay.style.display = playing ? 'none' : 'block';
         iconPause.style.display = playing ? 'block' : 'none';
+    }
+    // Detach the button again when the player is destroyed.
+    syncIcons.unwire = () => {
+        playBtn.removeEventListener('click', toggleFn);
+        syncIcons(false);
     };
+    return syncIcons;
 }
 
 // ── Player error helper ───────────────────────────────────────────────
@@ -425,9 +445,54 @@ function showPlayerError(wrapper, playBtn, message) {
     playBtn.style.cursor = 'not-allowed';
 }
 
+// ── Waveform peaks ────────────────────────────────────────────────────
+// audio_peaks returns base64 int8 [min, max] pairs; turn them into bar heights.
+function fetchPeaks(peaksUrl) {
+    return fetch(peaksUrl)
+        .then(r => {
+            if (!r.ok) throw Object.assign(new Error(`HTTP ${r.status}`), { httpStatus: r.status });
+            return r.json();
+        })
+        .then(data => {
+            const pairs = new Int8Array(Uint8Array.from(atob(data.peaks), c => c.charCodeAt(0)).buffer);
+            const peaks = [];
+            for (let i = 0; i < pairs.length; i += 2) peaks.push(Math.max(-pairs[i], pairs[i + 1]) / 127);
+            return { peaks: normalisePeaks(peaks), duration: data.duration };
+        });
+}
+
+// Decode audio in the browser and build peak data (used when no peaks URL is given).
+function decodePeaks(src) {
+    return fetch(src)
+        .then(r => {
+            if (!r.ok) {
+                // HTTP error (e.g. 404 — audio file missing on disk)
+                throw Object.assign(new Error(`HTTP ${r.status}`), { httpStatus: r.status });
+            }
+            return r.arrayBuffer();
+        })
+        .then(buf => new (window.AudioContext || window.webkitAudioContext)().decodeAudioData(buf))
+        .then(decoded => {
+            const raw = decoded.getChannelData(0);
+            const samples = 800; // resolution
+            const chunk = Math.floor(raw.length / samples);
+            const peaks = Array.from({ length: samples }, (_, i) => {
+                let max = 0;
+                for (let j = 0; j < chunk; j++) max = Math.max(max, Math.abs(raw[i * chunk + j]));
+                return max;
+            });
+            return { peaks: normalisePeaks(peaks), duration: decoded.duration };
+        });
+}
+
+function normalisePeaks(peaks) {
+    const maxPeak = Math.max(...peaks, 0.001);
+    return peaks.map(p => p / maxPeak);
+}
+
 // ── Canvas Fallback Player ────────────────────────────────────────────
-// Uses Web Audio API (decodeAudioData) + HTMLAudioElement — zero CDN.
-function initFallbackPlayer(id, src) {
+// Draws precomputed peaks on a canvas + HTMLAudioElement — zero CDN.
+function initFallbackPlayer(id, src, peaksUrl) {
     const wrapper = document.getElementById('waveform-' + id);
     const playBtn = document.querySelector('.play-pause-btn[data-id="' + id + '"]');
     const currentEl = document.getElementById('current-' + id);
@@ -479,33 +544,12 @@ function initFallbackPlayer(id, src) {
         }
     }
 
-    // Decode audio and build peak data
-    fetch(src)
-        .then(r => {
-            if (!r.ok) {
-                // HTTP error (e.g. 404 — audio file missing on disk)
-                throw Object.assign(new Error(`HTTP ${r.status}`), { httpStatus: r.status });
-            }
-            return r.arrayBuffer();
-        })
-        .then(buf => new (window.AudioContext || window.webkitAudioContext)().decodeAudioData(buf))
-        .then(decoded => {
-            duration = decoded.duration;
+    // Server-side peaks are a few KB; the audio itself is not fetched here.
+    (peaksUrl ? fetchPeaks(peaksUrl) : decodePeaks(src))
+        .then(result => {
+            peaks = result.peaks;
+            duration = result.duration;
             totalEl.textContent = formatTime(duration);
-
-            const raw = decoded.getChannelData(0);
-            const samples = 800; // resolution
-            const chunk = Math.floor(raw.length / samples);
-            peaks = Array.from({ length: samples }, (_, i) => {
-                let max = 0;
-                for (let j = 0; j < chunk; j++) max = Math.max(max, Math.abs(raw[i * chunk + j]));
-                return max;
-            });
-
-            // Normalise
-            const maxPeak = Math.max(...peaks, 0.001);
-            peaks = peaks.map(p => p / maxPeak);
-
             drawWaveform(0);
         })
         .catch(err => {
@@ -515,8 +559,10 @@ function initFallbackPlayer(id, src) {
             showPlayerError(wrapper, playBtn, msg);
         });
 
-    // HTMLAudioElement for playback
-    const audio = new Audio(src);
+    // HTMLAudioElement for playback; nothing is downloaded until play is pressed.
+    const audio = new Audio();
+    audio.preload = 'none';
+    audio.src = src;
     let rafId = null;
     const syncIcons = wirePlayPause(playBtn, () => !audio.paused, () => audio.paused ? audio.play() : audio.pause());
 
@@ -543,54 +589,147 @@ function initFallbackPlayer(id, src) {
     });
 
     // Redraw on resize
-    window.addEventListener('resize', () => drawWaveform(duration ? audio.currentTime / duration : 0));
+    const onResize = () => drawWaveform(duration ? audio.currentTime / duration : 0);
+    window.addEventListener('resize', onResize);
+
+    return {
+        isPlaying: () => !audio.paused,
+        // Stop playback and drop the canvas, the peaks and any buffered audio.
+        destroy() {
+            cancelAnimationFrame(rafId);
+            audio.pause();
+            audio.removeAttribute('src');
+            audio.load();
+            peaks = [];
+            window.removeEventListener('resize', onResize);
+            syncIcons.unwire();
+            wrapper.innerHTML = '';
+            currentEl.textContent = '0:00';
+        },
+    };
 }
 
 // ── WaveSurfer Player ─────────────────────────────────────────────────
-function initWaveSurferPlayer(id, src) {
+function initWaveSurferPlayer(id, src, peaksUrl) {
     const container = document.getElementById('waveform-' + id);
     const playBtn = document.querySelector('.play-pause-btn[data-id="' + id + '"]');
     const currentEl = document.getElementById('current-' + id);
     const totalEl = document.getElementById('total-' + id);
-    const syncIcons = wirePlayPause(playBtn, null, () => ws.playPause());
-
-    const ws = WaveSurfer.create({
-        container: container,
-        waveColor: '#b0bec5',
-        progressColor: '#1a1a2e',
-        cursorColor: '#139b06',
-        cursorWidth: 2,
-        height: 64,
-        barWidth: 2,
-        barGap: 1.5,
-        barRadius: 2,
-        normalize: true,
-        url: src,
-    });
+    let ws = null;
+    let media = null;
+    let destroyed = false;
+    const syncIcons = wirePlayPause(playBtn, null, () => ws && ws.playPause());
+
+    function create(extra) {
+        if (destroyed) return;
+        ws = WaveSurfer.create({
+            container: container,
+            waveColor: '#b0bec5',
+            progressColor: '#1a1a2e',
+            cursorColor: '#139b06',
+            cursorWidth: 2,
+            height: 64,
+            barWidth: 2,
+            barGap: 1.5,
+            barRadius: 2,
+            normalize: true,
+            url: src,
+            ...extra,
+        });
 
-    ws.on('ready', () => totalEl.textContent = formatTime(ws.getDuration()));
-    ws.on('audioprocess', () => currentEl.textContent = formatTime(ws.getCurrentTime()));
-    ws.on('seeking', () => currentEl.textContent = formatTime(ws.getCurrentTime()));
-    ws.on('play', () => syncIcons(true));
-    ws.on('pause', () => syncIcons(false));
-    ws.on('finish', () => syncIcons(false));
-    ws.on('error', (err) => {
-        // WaveSurfer fires this on HTTP 404 or decoding failures
-        const msg = (err && err.message && err.message.includes('404'))
-            ? 'Audio file not found'
-            : 'Could not load audio';
-        showPlayerError(container, playBtn, msg);
-    });
+        ws.on('ready', () => totalEl.textContent = formatTime(ws.getDuration()));
+        ws.on('audioprocess', () => currentEl.textContent = formatTime(ws.getCurrentTime()));
+        ws.on('seeking', () => currentEl.textContent = formatTime(ws.getCurrentTime()));
+        ws.on('play', () => syncIcons(true));
+        ws.on('pause', () => syncIcons(false));
+        ws.on('finish', () => syncIcons(false));
+        ws.on('error', (err) => {
+            // WaveSurfer fires this on HTTP 404 or decoding failures
+            const msg = (err && err.message && err.message.includes('404'))
+                ? 'Audio file not found'
+                : 'Could not load audio';
+            showPlayerError(container, playBtn, msg);
+        });
+    }
+
+    // With peaks and a duration WaveSurfer skips decoding, and a media
+    // element with preload="none" only downloads the audio on play.
+    if (!peaksUrl) {
+        create({});
+    } else {
+        fetchPeaks(peaksUrl)
+            .then(({ peaks, duration }) => {
+                media = new Audio();
+                media.preload = 'none';
+                create({ media: media, peaks: [peaks], duration: duration });
+            })
+            .catch(err => {
+                if (err.httpStatus === 404) {
+                    showPlayerError(container, playBtn, 'Audio file not found');
+                } else {
+                    create({});
+                }
+            });
+    }
+
+    return {
+        isPlaying: () => !!ws && ws.isPlaying(),
+        // Tear down WaveSurfer's canvases and decoded audio.
+        destroy() {
+            destroyed = true;
+            if (ws) ws.destroy();
+            if (media) {
+                media.removeAttribute('src');
+                media.load();
+            }
+            ws = media = null;
+            syncIcons.unwire();
+            currentEl.textContent = '0:00';
+        },
+    };
 }
 
 // ── Init all players ──────────────────────────────────────────────────
 const useWaveSurfer = !window.waveSurferFailed && typeof WaveSurfer !== 'undefined';
 
-document.querySelectorAll('.audio-src').forEach(function (el) {
+// Players are only built when their row comes near the viewport, and are
+// torn down again once it scrolls away (unless still playing), so a page
+// of hundreds of clips only ever holds the players and audio in view.
+const players = new Map();
+
+function createPlayer(el) {
     const id = el.dataset.id;
     const src = el.dataset.src; // This URL must resolve to a valid audio file
-    useWaveSurfer ? initWaveSurferPlayer(id, src) : initFallbackPlayer(id, src);
-});
+    const peaksUrl = el.dataset.peaks;
+    return useWaveSurfer ? initWaveSurferPlayer(id, src, peaksUrl) : initFallbackPlayer(id, src, peaksUrl);
+}
+
+if ('IntersectionObserver' in window) {
+    const sources = new Map();
+    const observer = new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+            const el = sources.get(entry.target);
+            const player = players.get(el.dataset.id);
+            if (entry.isIntersecting) {
+                if (!player) players.set(el.dataset.id, createPlayer(el));
+            } else if (player && !player.isPlaying()) {
+                player.destroy();
+                players.delete(el.dataset.id);
+            }
+        });
+    }, { rootMargin: '400px 0px' });
+
+    document.querySelectorAll('.audio-src').forEach(function (el) {
+        // The .audio-src span itself is hidden, so watch the visible player.
+        const playerEl = document.getElementById('player-' + el.dataset.id);
+        sources.set(playerEl, el);
+        observer.observe(playerEl);
+    });
+} else {
+    document.querySelectorAll('.audio-src').forEach(function (el) {
+        players.set(el.dataset.id, createPlayer(el));
+    });
+}
 
 // ── Inline Edit Transcript Logic ──────────────────────────────────────
 document.querySelectorAll('.edit-transcript-btn').forEach(btn => {
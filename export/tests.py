@@ -16,6 +16,7 @@ class ExportTests(TestCase):
         self.client = Client()
         # Create a user for transcription relationship
         self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.force_login(self.user)
         
         self.project = Project.objects.create(
             name="ExportProject",
@@ -170,3 +171,76 @@ class ExportTests(TestCase):
         self.assertFalse(Transcript.objects.filter(id=self.transcript.id).exists())
         self.assertFalse(os.path.exists(target_path))
 
+
+    def test_export_jsonl_format(self):
+        """format=jsonl writes one object per line to details.json."""
+        audio_dir = os.path.join(TEST_MEDIA_ROOT, self.project.name, 'audio')
+        os.makedirs(audio_dir, exist_ok=True)
+        for name in ['a.wav', 'b.wav']:
+            Transcript.objects.create(project=self.project, user=self.user, audio_file=name,
+                                      transcript=name.upper(), duration=1.0)
+            with open(os.path.join(audio_dir, name), 'wb') as f:
+                f.write(b'RIFF')
+
+        response = self.client.post(reverse('export:export_project_json', args=[self.project.id]), {
+            'format': 'jsonl'
+        })
+        b''.join(response.streaming_content)
+
+        details_json_path = os.path.join(self.project.folder_path, self.project.name, 'details.json')
+        with open(details_json_path) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual(sorted(line['text'] for line in lines), ['A.WAV', 'B.WAV'])
+        self.assertEqual(lines[0]['duration'], 1.0)
+
+    def test_failed_export_keeps_previous_details_json(self):
+        """An export that fails part way never leaves a truncated details.json behind."""
+        from unittest.mock import patch
+        project_dir = os.path.join(TEST_MEDIA_ROOT, self.project.name)
+        os.makedirs(os.path.join(project_dir, 'audio'), exist_ok=True)
+        with open(os.path.join(project_dir, 'audio', self.transcript.audio_file), 'wb') as f:
+            f.write(b'RIFF')
+        details_json_path = os.path.join(project_dir, 'details.json')
+        with open(details_json_path, 'w') as f:
+            f.write('[{"audio_filepath": "audio/old.wav", "text": "Old"}]')
+
+        with patch('export.views.get_audio_duration', side_effect=OSError("disk went away")):
+            response = self.client.post(reverse('export:export_project_json', args=[self.project.id]))
+            lines = [json.loads(l) for l in b''.join(response.streaming_content).decode().splitlines()]
+
+        self.assertEqual(lines[-1], {"type": "error", "error": "disk went away"})
+        with open(details_json_path) as f:
+            self.assertEqual(json.load(f), [{"audio_filepath": "audio/old.wav", "text": "Old"}])
+        self.assertEqual(sorted(os.listdir(project_dir)), ['audio', 'details.json'])
+
+    async def test_async_export_writes_the_same_details_json(self):
+        """The async export streams progress and writes the same manifest as the sync one."""
+        import types
+        from django.test import AsyncClient
+        from django.urls import path
+        from . import async_views
+        urlconf = types.ModuleType('async_urls')
+        urlconf.urlpatterns = [path('export/<uuid:project_id>/', async_views.export_project_json)]
+
+        audio_dir = os.path.join(TEST_MEDIA_ROOT, self.project.name, 'audio')
+        os.makedirs(audio_dir, exist_ok=True)
+        await Transcript.objects.acreate(project=self.project, user=self.user, audio_file='a.wav',
+                                         transcript='A', duration=1.0)
+        with open(os.path.join(audio_dir, 'a.wav'), 'wb') as f:
+            f.write(b'RIFF')
+
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        with self.settings(ROOT_URLCONF=urlconf):
+            response = await client.post(f'/export/{self.project.id}/')
+            content = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        lines = [json.loads(l) for l in content.splitlines()]
+
+        self.assertEqual(lines[0], {"type": "init", "total": self.project.transcript_count})
+        self.assertEqual(lines[-1]["type"], "success", lines[-1])
+        self.assertEqual(lines[-1]['missing_files'], ['export_test.wav'])
+        details_json_path = os.path.join(self.project.folder_path, self.project.name, 'details.json')
+        with open(details_json_path) as f:
+            self.assertEqual([entry['text'] for entry in json.load(f)], ['A'])
+        await self.project.arefresh_from_db()
+        self.assertEqual(self.project.missing_audio_count, 1)
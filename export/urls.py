@@ -1,12 +1,16 @@
 from django.urls import path
-from . import views
+from Mozhi.settings import ASYNC_VIEWS
+from . import views, async_views
 
 app_name = 'export'
 
+# Under ASGI the export stream is served by its async version.
+io_views = async_views if ASYNC_VIEWS else views
+
 urlpatterns = [
     path('', views.project_list, name='project_list'),
     path('projects/<uuid:project_id>/', views.project_detail, name='project_detail'),
     path('projects/<uuid:project_id>/delete/', views.delete_project, name='delete_project'),
     path('transcripts/<uuid:transcript_id>/delete/', views.delete_transcript, name='delete_transcript'),
-    path('projects/<uuid:project_id>/export/json/', views.export_project_json, name='export_project_json'),
+    path('projects/<uuid:project_id>/export/json/', io_views.export_project_json, name='export_project_json'),
 ]
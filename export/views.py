@@ -2,12 +2,18 @@ from Mozhi.settings import PAGE_NUM, BATCH_SIZE
 import json
 import os
 import shutil
-from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse
-from transcription.models import Project, Transcript
+from django.shortcuts import render, get_object_or_404
+from django.http import JsonResponse, StreamingHttpResponse
+from transcription.models import Project, Transcript, counter_deltas
+from transcription.audio import get_audio_duration
+from transcription.manifest import ManifestWriter
+from transcription.audio_index import list_directory, project_audio_dir
+from transcription.peaks import remove_peaks
+from transcription.pagination import page_from_request
 from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
+from django.db import transaction
 
 
 @login_required
@@ -23,93 +29,99 @@ def project_list(request):
         'page_obj': page_obj,
         })
 
-@login_required
-def _audio_path(transcript):
-    """Return the absolute path to a transcript's audio file."""
-    project = transcript.project
-    return os.path.join(project.folder_path, project.name, 'audio', transcript.audio_file)
-
-
 @login_required
 def project_detail(request, project_id):
     project = get_object_or_404(Project, id=project_id)
-    transcripts_list = project.transcripts.all().order_by('-created_at')
+    transcripts_list = project.transcripts.all()
 
-    paginator = Paginator(transcripts_list, PAGE_NUM)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    transcripts_count = transcripts_list.count()
+    page_obj = page_from_request(request, transcripts_list, PAGE_NUM)
 
     # Annotate each transcript on the current page with audio_exists so the
-    # template can show a warning badge without an extra DB or fs round-trip.
+    # template can show a warning badge. The audio directory listing is
+    # cached, so this is one stat per render rather than one per row.
+    audio_files = list_directory(project_audio_dir(project))
     for t in page_obj:
-        t.audio_exists = os.path.exists(_audio_path(t))
+        t.audio_exists = os.path.basename(t.audio_file) in audio_files
 
     return render(request, 'export/project_detail.html', {
         'project': project,
         'page_obj': page_obj,
-        'transcripts_count': transcripts_list,
+        'transcripts_count': project.transcript_count,
 
     })
 
 
-from django.http import StreamingHttpResponse
-import time
+def manifest_entries(rows, audio_dir, audio_files, missing_files):
+    """
+    Yield the details.json entries for `(audio_file, text, duration)` rows,
+    skipping rows whose file is not in `audio_files` and appending their
+    names to `missing_files`.
+    """
+    for audio_file, text, duration in rows:
+        filename = os.path.basename(audio_file)
+        file_path = os.path.join(audio_dir, filename)
+
+        if filename not in audio_files:
+            missing_files.append(filename)
+            continue  # log and skip missing file
+
+        yield {
+            "audio_filepath": f"audio/{filename}",
+            "text": text if text else "",
+            "duration": duration if duration is not None else get_audio_duration(file_path),
+        }
+
 
 @csrf_exempt
 @login_required
 def export_project_json(request, project_id):
     if request.method == 'POST':
         project = get_object_or_404(Project, id=project_id)
-        total_count = Transcript.objects.filter(project=project).count()
+        total_count = project.transcript_count
         batch_size = int(BATCH_SIZE)
 
+        jsonl = request.POST.get('format') == 'jsonl'
+
         def stream_progress():
-            data = []
             processed = 0
             missing_files = []
+            audio_dir = project_audio_dir(project)
+            # One directory scan instead of a stat per transcript.
+            audio_files = list_directory(audio_dir)
 
             # Send initial count
             yield json.dumps({"type": "init", "total": total_count}) + "\n"
 
-            # Process in batches using iterator() to avoid loading all records into memory
-            transcripts = (
+            # Plain tuples in chunks: no model instances, and nothing is kept
+            # once it has been written to the temp file.
+            rows = (
                 Transcript.objects
                 .filter(project=project)
-                .only('audio_file', 'transcript')  # fetch only needed fields
+                .values_list('audio_file', 'transcript', 'duration')
                 .iterator(chunk_size=batch_size)
             )
 
-            for t in transcripts:
-                filename = os.path.basename(t.audio_file)
-                file_path = os.path.join(project.folder_path, project.name, 'audio', filename)
-
-                if not os.path.exists(file_path):
-                    missing_files.append(filename)
-                    continue  # log and skip missing file
-
-                data.append({
-                    "audio_filepath": f"audio/{filename}",
-                    "text": t.transcript if t.transcript else ""
-                })
-                processed += 1
-
-                # Yield a progress update after each batch boundary
-                if processed % batch_size == 0:
-                    yield json.dumps({"type": "progress", "current": processed}) + "\n"
-
-            # Yield final progress if the total wasn't a clean multiple of batch_size
-            if processed % batch_size != 0:
-                yield json.dumps({"type": "progress", "current": processed}) + "\n"
-
-            # Save to project folder as details.json
             try:
                 project_dir = os.path.join(project.folder_path, project.name)
                 os.makedirs(project_dir, exist_ok=True)
-
                 json_file_path = os.path.join(project_dir, 'details.json')
-                with open(json_file_path, 'w') as f:
-                    json.dump(data, f, indent=4)
+
+                # details.json is only replaced once every entry has been written.
+                with ManifestWriter(json_file_path, jsonl=jsonl) as writer:
+                    for entry in manifest_entries(rows, audio_dir, audio_files, missing_files):
+                        writer.write(entry)
+                        processed += 1
+
+                        # Yield a progress update after each batch boundary
+                        if processed % batch_size == 0:
+                            yield json.dumps({"type": "progress", "current": processed}) + "\n"
+
+                    # Yield final progress if the total wasn't a clean multiple of batch_size
+                    if processed % batch_size != 0:
+                        yield json.dumps({"type": "progress", "current": processed}) + "\n"
+
+                # The export has just checked every row, so record what it found.
+                Project.objects.filter(pk=project.pk).update(missing_audio_count=len(missing_files))
 
                 yield json.dumps({
                     "type": "success", 
@@ -155,16 +167,35 @@ def delete_transcript(request, transcript_id):
         delete_files = request.POST.get('delete_files') == 'true'
 
         try:
-            if delete_files:
-                project = transcript.project
-                # audio_file is a CharField
-                filename = os.path.basename(transcript.audio_file)
-                target_path = os.path.join(project.folder_path, project.name, 'audio', filename)
-                if os.path.exists(target_path):
-                    os.remove(target_path)
-            
-            # Delete from DB
-            transcript.delete()
+            project = transcript.project
+            # audio_file is a CharField
+            filename = os.path.basename(transcript.audio_file)
+            target_path = os.path.join(project.folder_path, project.name, 'audio', filename)
+
+            # Subtract the stored duration; only rows that were never probed touch the disk.
+            audio_exists = os.path.exists(target_path)
+            duration = transcript.duration
+            if duration is None and audio_exists:
+                duration = get_audio_duration(target_path)
+
+            # Delete from DB, together with the project totals it contributed to
+            with transaction.atomic():
+                # Re-read the text under a lock, and only subtract what this
+                # request deleted: a concurrent delete may have got there first.
+                text = (
+                    Transcript.objects.select_for_update().filter(pk=transcript.pk)
+                    .values_list('transcript', flat=True).first()
+                )
+                deleted = Transcript.objects.filter(pk=transcript.pk).delete()[0]
+                if deleted:
+                    project.adjust_counters(
+                        duration=-(duration or 0.0),
+                        **counter_deltas(removed=[text], missing_audio=0 if audio_exists else -1),
+                    )
+
+            if deleted and delete_files and audio_exists:
+                os.remove(target_path)
+                remove_peaks(target_path)
             return JsonResponse({'status': 'success'})
         except Exception as e:
             return JsonResponse({'status': 'error', 'error': str(e)}, status=500)
@@ -1,6 +1,7 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 from django.db.models.signals import post_migrate
-from Mozhi.settings import SUPERUSER_USERNAME, SUPERUSER_EMAIL, SUPERUSER_PASSWORD
+from Mozhi.settings import SUPERUSER_USERNAME, SUPERUSER_EMAIL, SUPERUSER_PASSWORD, REQUEST_METRICS
 from django.core.management import call_command
 import sys
 import os
@@ -11,6 +12,11 @@ class TranscriptionConfig(AppConfig):
 
     def ready(self):
         post_migrate.connect(create_default_superuser, sender=self)
+        post_migrate.connect(restore_search_index, sender=self)
+
+        if REQUEST_METRICS:
+            from .metrics import install_sql_probe
+            connection_created.connect(install_sql_probe)
 
         if 'runserver' in sys.argv and os.environ.get('RUN_MAIN') == 'true':
             try:
@@ -21,12 +27,24 @@ class TranscriptionConfig(AppConfig):
 
             
 
-def create_default_superuser(sender, **kwargs):
+def restore_search_index(sender, using='default', **kwargs):
+    from django.db import connections
+    from .search import restore_sqlite_index
+    connection = connections[using]
+    try:
+        if connection.vendor == 'sqlite' and restore_sqlite_index(connection):
+            print("Restored the search index triggers and rebuilt the index")
+    except Exception as e:
+        print(f"Could not check the search index: {e}")
+
+
+def create_default_superuser(sender, using='default', **kwargs):
     from django.contrib.auth.models import User
+    users = User.objects.db_manager(using)
     try:
-        if not User.objects.filter(username=SUPERUSER_USERNAME).exists():
+        if not users.filter(username=SUPERUSER_USERNAME).exists():
             print(f"Creating default superuser: {SUPERUSER_USERNAME}")
-            User.objects.create_superuser(SUPERUSER_USERNAME, SUPERUSER_EMAIL, SUPERUSER_PASSWORD)
+            users.create_superuser(SUPERUSER_USERNAME, SUPERUSER_EMAIL, SUPERUSER_PASSWORD)
         else:
             print(f"Superuser '{SUPERUSER_USERNAME}' already exists.")
     except Exception as e:
@@ -0,0 +1,145 @@
+"""
+Async versions of the I/O-bound views, for running under ASGI.
+
+With ASYNC_VIEWS set, Mozhi/urls.py routes audio serving, recording
+uploads and (in the export app) the details.json export here instead of
+to the sync views. A slow client then holds a coroutine instead of a
+whole server thread while audio or progress is streamed to it.
+
+File I/O runs in worker threads (asyncio.to_thread) and the ORM through
+Django's async queryset methods or sync_to_async, so the event loop never
+blocks. The request body itself has already been spooled by Django's
+ASGI handler before the view runs.
+"""
+import asyncio
+import os
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+
+from .models import Project, Transcript, Upload
+from .serving import aserve_as_wav, aserve_file, audio_content_type
+from .uploads import (
+    UploadError, UploadOffsetError, place_upload, received_bytes, register_recording,
+    register_upload, remove_part, store_upload, touch_upload, write_chunk,
+)
+
+
+@login_required
+async def serve_audio(request, transcript_id):
+    """Async views.serve_audio."""
+    transcript = await aget_object_or_404(Transcript.objects.select_related('project'), id=transcript_id)
+    project = transcript.project
+    file_path = os.path.join(project.folder_path, project.name, 'audio', transcript.audio_file)
+
+    if request.GET.get('format') == 'wav' and audio_content_type(file_path) != 'audio/wav':
+        return await aserve_as_wav(request, file_path)
+    return await aserve_file(request, file_path, content_type=audio_content_type(file_path))
+
+
+@csrf_exempt
+@login_required
+async def save_record(request):
+    """Async views.save_record."""
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'error': 'Method not allowed'}, status=405)
+
+    # Parsing the multipart body reads the spooled request.
+    post, files = await asyncio.to_thread(lambda: (request.POST, request.FILES))
+    project_id = post.get('project_id')
+    transcript_text = post.get('transcript')
+    audio_file = files.get('audio')
+
+    if not all([project_id, audio_file]):
+        return JsonResponse({'status': 'error', 'error': 'Missing data'}, status=400)
+
+    try:
+        project = await aget_object_or_404(Project, id=project_id)
+        transcript_instance = Transcript(
+            project=project,
+            user=await request.auser(),
+            transcript=transcript_text,
+        )
+        audio_dir = os.path.join(project.folder_path, project.name, 'audio')
+
+        filename, info = await asyncio.to_thread(store_upload, audio_file.chunks(), audio_dir, transcript_instance.id)
+        transcript_instance.audio_file = filename
+        transcript_instance.set_audio_info(info)
+
+        await sync_to_async(register_recording)(transcript_instance, os.path.join(audio_dir, filename))
+
+        return JsonResponse({'status': 'success', 'transcript_id': str(transcript_instance.id)})
+    except UploadError as e:
+        return JsonResponse({'status': 'error', 'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'status': 'error', 'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@login_required
+async def upload_chunk(request, upload_id):
+    """Async views.upload_chunk."""
+    upload = await aget_object_or_404(Upload.objects.select_related('project'), id=upload_id)
+
+    if request.method == 'GET':
+        received = await asyncio.to_thread(received_bytes, upload)
+        return JsonResponse({'status': 'success', 'offset': received, 'size': upload.size})
+
+    if request.method == 'PUT':
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return JsonResponse({'status': 'error', 'error': 'Missing Upload-Offset header'}, status=400)
+
+        try:
+            chunks = iter(lambda: request.read(64 * 1024), b'')
+            received = await asyncio.to_thread(write_chunk, upload, offset, chunks)
+            await sync_to_async(touch_upload)(upload)
+            return JsonResponse({'status': 'success', 'offset': received})
+        except UploadOffsetError as e:
+            return JsonResponse({'status': 'error', 'error': str(e), 'offset': e.received}, status=409)
+        except UploadError as e:
+            return JsonResponse({'status': 'error', 'error': str(e)}, status=400)
+        except Exception as e:
+            return JsonResponse({'status': 'error', 'error': str(e)}, status=500)
+
+    if request.method == 'DELETE':
+        try:
+            await asyncio.to_thread(remove_part, upload)
+            await upload.adelete()
+            return JsonResponse({'status': 'success'})
+        except Exception as e:
+            return JsonResponse({'status': 'error', 'error': str(e)}, status=500)
+
+    return JsonResponse({'status': 'error', 'error': 'Method not allowed'}, status=405)
+
+
+@csrf_exempt
+@login_required
+async def finish_upload(request, upload_id):
+    """Async views.finish_upload."""
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'error': 'Method not allowed'}, status=405)
+
+    upload = await Upload.objects.select_related('project', 'user').filter(id=upload_id).afirst()
+    if upload is None:
+        if await Transcript.objects.filter(id=upload_id).aexists():
+            return JsonResponse({'status': 'success', 'transcript_id': str(upload_id)})
+        return JsonResponse({'status': 'error', 'error': 'Upload not found'}, status=404)
+
+    try:
+        try:
+            filename, info = await asyncio.to_thread(place_upload, upload)
+        except Exception:
+            if await Transcript.objects.filter(id=upload.id).aexists():
+                return JsonResponse({'status': 'success', 'transcript_id': str(upload.id)})
+            raise
+        transcript = await sync_to_async(register_upload)(upload, filename, info)
+        return JsonResponse({'status': 'success', 'transcript_id': str(transcript.id)})
+    except UploadError as e:
+        return JsonResponse({'status': 'error', 'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'status': 'error', 'error': str(e)}, status=500)
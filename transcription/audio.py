@@ -0,0 +1,277 @@
+"""
+Header-only audio metadata.
+
+Reads just enough of a file to know its duration, sample rate, channel
+count and bit depth, without decoding any audio. RIFF/WAVE (PCM, IEEE
+float, WAVE_FORMAT_EXTENSIBLE and RF64), FLAC (STREAMINFO) and Ogg
+(Vorbis, Opus and FLAC) are parsed directly; anything else falls back
+to librosa.
+"""
+import logging
+import os
+import struct
+from typing import NamedTuple, Optional
+
+from .metrics import fs_probe
+
+logger = logging.getLogger(__name__)
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_ALAW = 0x0006
+WAVE_FORMAT_MULAW = 0x0007
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Formats whose data chunk is a plain sequence of fixed-size frames.
+FRAME_BASED_WAVE_FORMATS = {
+    WAVE_FORMAT_PCM,
+    WAVE_FORMAT_IEEE_FLOAT,
+    WAVE_FORMAT_ALAW,
+    WAVE_FORMAT_MULAW,
+}
+
+OGG_TAIL_WINDOW = 64 * 1024
+
+
+class AudioFormatError(ValueError):
+    """Raised when a file's header cannot be parsed as a supported format."""
+
+
+class AudioMetadata(NamedTuple):
+    duration: float
+    sample_rate: int
+    channels: int
+    bits_per_sample: Optional[int]
+    format: str
+
+
+class AudioFileInfo(NamedTuple):
+    duration: float
+    sample_rate: int
+    channels: int
+    bits_per_sample: Optional[int]
+    format: str
+    file_size: Optional[int]
+    file_mtime: Optional[float]
+
+
+EMPTY_METADATA = AudioMetadata(0.0, 0, 0, None, '')
+
+
+def _read_exact(f, size):
+    data = f.read(size)
+    if len(data) < size:
+        raise AudioFormatError("Unexpected end of file")
+    return data
+
+
+def _parse_wave(f, file_size):
+    riff_id, riff_size, wave_id = struct.unpack('<4sI4s', _read_exact(f, 12))
+    if wave_id != b'WAVE':
+        raise AudioFormatError("RIFF file is not WAVE")
+
+    fmt = None
+    data_size = None
+    rf64_data_size = None
+
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        chunk_id, chunk_size = struct.unpack('<4sI', header)
+        chunk_start = f.tell()
+
+        if chunk_id == b'ds64':
+            _, rf64_data_size = struct.unpack('<QQ', _read_exact(f, 16))
+        elif chunk_id == b'fmt ':
+            fmt = _read_exact(f, min(chunk_size, 40))
+        elif chunk_id == b'data':
+            data_size = chunk_size
+            if riff_id == b'RF64' and chunk_size == 0xFFFFFFFF and rf64_data_size is not None:
+                data_size = rf64_data_size
+            # Streamed or truncated files carry a bogus size; trust the disk.
+            data_size = min(data_size, file_size - chunk_start)
+            if fmt is not None:
+                break
+
+        f.seek(chunk_start + chunk_size + (chunk_size & 1))
+
+    if fmt is None or len(fmt) < 16:
+        raise AudioFormatError("WAVE file has no fmt chunk")
+    if data_size is None:
+        raise AudioFormatError("WAVE file has no data chunk")
+
+    format_tag, channels, sample_rate, _, block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+    if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 40:
+        valid_bits, _, sub_format = struct.unpack('<HI16s', fmt[18:40])
+        format_tag, = struct.unpack('<H', sub_format[:2])
+        bits = valid_bits or bits
+
+    if sample_rate <= 0:
+        raise AudioFormatError(f"Invalid sample rate {sample_rate}")
+
+    if format_tag not in FRAME_BASED_WAVE_FORMATS or not block_align:
+        # Compressed WAVE payloads (ADPCM, MP3, ...) are left to librosa.
+        raise AudioFormatError(f"Unsupported WAVE format tag {format_tag:#06x}")
+
+    frames = data_size // block_align
+    return AudioMetadata(frames / sample_rate, sample_rate, channels, bits, 'wav')
+
+
+def _parse_streaminfo(block):
+    """Decode the 34-byte FLAC STREAMINFO block."""
+    if len(block) < 34:
+        raise AudioFormatError("Truncated FLAC STREAMINFO")
+    packed, = struct.unpack('>Q', block[10:18])
+    sample_rate = packed >> 44
+    channels = ((packed >> 41) & 0x7) + 1
+    bits = ((packed >> 36) & 0x1F) + 1
+    total_samples = packed & 0xFFFFFFFFF
+    if sample_rate <= 0:
+        raise AudioFormatError(f"Invalid sample rate {sample_rate}")
+    return AudioMetadata(total_samples / sample_rate, sample_rate, channels, bits, 'flac')
+
+
+def _parse_flac(f):
+    block_header = _read_exact(f, 4)
+    if block_header[0] & 0x7F != 0:
+        raise AudioFormatError("FLAC stream does not start with STREAMINFO")
+    return _parse_streaminfo(_read_exact(f, 34))
+
+
+def _last_ogg_granule(f, file_size, serial):
+    """Return the granule position of the last page of `serial` in the file."""
+    end = file_size
+    while end > 0:
+        start = max(0, end - OGG_TAIL_WINDOW)
+        f.seek(start)
+        # Overlap by one page header so a capture pattern on the boundary is seen.
+        window = f.read(end - start + 27)
+        pos = window.rfind(b'OggS')
+        while pos != -1:
+            if pos + 27 <= len(window):
+                granule, page_serial = struct.unpack('<qI', window[pos + 6:pos + 18])
+                if page_serial == serial and granule >= 0:
+                    return granule
+            pos = window.rfind(b'OggS', 0, pos)
+        end = start
+    raise AudioFormatError("Ogg stream has no final granule position")
+
+
+def _parse_ogg(f, file_size):
+    page = f.read(4096)
+    if len(page) < 27:
+        raise AudioFormatError("Truncated Ogg page")
+    serial, = struct.unpack('<I', page[14:18])
+    segments = page[26]
+    packet = page[27 + segments:]
+
+    def require(size):
+        if len(packet) < size:
+            raise AudioFormatError("Truncated Ogg identification header")
+
+    if packet.startswith(b'\x01vorbis'):
+        require(16)
+        channels = packet[11]
+        sample_rate, = struct.unpack('<I', packet[12:16])
+        bits, pre_skip, codec = None, 0, 'vorbis'
+    elif packet.startswith(b'OpusHead'):
+        require(12)
+        channels = packet[9]
+        pre_skip, = struct.unpack('<H', packet[10:12])
+        # Opus granule positions always count 48 kHz samples.
+        sample_rate, bits, codec = 48000, None, 'opus'
+    elif packet.startswith(b'\x7fFLAC') and packet[9:13] == b'fLaC':
+        info = _parse_streaminfo(packet[17:51])
+        channels, sample_rate, bits = info.channels, info.sample_rate, info.bits_per_sample
+        pre_skip, codec = 0, 'flac'
+    else:
+        raise AudioFormatError("Unsupported Ogg codec")
+
+    if sample_rate <= 0:
+        raise AudioFormatError(f"Invalid sample rate {sample_rate}")
+
+    granule = _last_ogg_granule(f, file_size, serial)
+    duration = max(0, granule - pre_skip) / sample_rate
+    return AudioMetadata(duration, sample_rate, channels, bits, f'ogg/{codec}')
+
+
+def parse_audio_header(filepath: str) -> AudioMetadata:
+    """
+    Parse the metadata of `filepath` from its header alone.
+
+    Raises AudioFormatError if the file is not a WAVE, FLAC or Ogg file
+    this module understands.
+    """
+    with open(filepath, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        magic = f.read(4)
+
+        if magic in (b'RIFF', b'RF64'):
+            f.seek(0)
+            return _parse_wave(f, file_size)
+
+        if magic[:3] == b'ID3':
+            # FLAC files occasionally carry an ID3v2 tag in front of the stream.
+            rest = _read_exact(f, 6)
+            size = (rest[2] << 21) | (rest[3] << 14) | (rest[4] << 7) | rest[5]
+            f.seek(10 + size)
+            magic = f.read(4)
+
+        if magic == b'fLaC':
+            return _parse_flac(f)
+
+        if magic == b'OggS':
+            f.seek(0)
+            return _parse_ogg(f, file_size)
+
+    raise AudioFormatError("Unrecognised audio container")
+
+
+def _read_with_librosa(filepath):
+    import librosa
+
+    duration = librosa.get_duration(path=filepath)
+    sample_rate = librosa.get_samplerate(filepath)
+    return AudioMetadata(duration, sample_rate, 0, None, 'librosa')
+
+
+@fs_probe
+def read_audio_metadata(filepath: str) -> AudioMetadata:
+    """
+    Return the AudioMetadata of `filepath`, parsing the header directly and
+    only falling back to librosa for formats that cannot be parsed.
+    Errors are logged and reported as EMPTY_METADATA.
+    """
+    try:
+        return parse_audio_header(filepath)
+    except AudioFormatError as e:
+        logger.info(f"Falling back to librosa for {filepath}: {e}")
+    except OSError as e:
+        logger.error(f"Failed to read {filepath}: {e}")
+        return EMPTY_METADATA
+
+    try:
+        return _read_with_librosa(filepath)
+    except Exception as e:
+        logger.error(f"Failed to read duration for {filepath}: {e}")
+        return EMPTY_METADATA
+
+
+def get_audio_duration(filepath: str) -> float:
+    """Return the duration in seconds of an audio file, or 0.0 if unreadable."""
+    return read_audio_metadata(filepath).duration
+
+
+@fs_probe
+def probe_audio_file(filepath: str) -> AudioFileInfo:
+    """
+    Return the header metadata of `filepath` together with its size and
+    mtime. A file that cannot be stat'ed has no size or mtime.
+    """
+    try:
+        st = os.stat(filepath)
+    except OSError as e:
+        logger.error(f"Failed to stat {filepath}: {e}")
+        return AudioFileInfo(*EMPTY_METADATA, None, None)
+    return AudioFileInfo(*read_audio_metadata(filepath), st.st_size, st.st_mtime)
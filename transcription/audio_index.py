@@ -0,0 +1,86 @@
+"""
+Directory-listing based existence checks for audio files.
+
+Checking every transcript with os.path.exists costs one stat per file,
+which is very slow on network filesystems holding hundreds of thousands
+of files. Instead, each audio directory is listed once with os.scandir
+and the set of names is cached, keyed by the directory's mtime: adding,
+removing or renaming a file changes the mtime and triggers a fresh scan.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from Mozhi.settings import AUDIO_INDEX_CACHE_SIZE
+from .metrics import fs_probe
+
+# Listings of directories modified this recently are not cached, since a
+# filesystem with coarse timestamps could change again without the mtime
+# moving.
+MTIME_SETTLE_SECONDS = 2.0
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def project_audio_dir(project):
+    """Return the directory holding a project's audio files."""
+    return os.path.join(project.folder_path, project.name, 'audio')
+
+
+@fs_probe
+def list_directory(path: str) -> frozenset:
+    """
+    Return the names of the entries in `path`, or an empty set if it does
+    not exist. Costs one stat when the cached listing is still current.
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return frozenset()
+
+    with _lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            _cache.move_to_end(path)
+            return cached[1]
+
+    try:
+        with os.scandir(path) as entries:
+            names = frozenset(entry.name for entry in entries)
+    except OSError:
+        return frozenset()
+
+    if time.time() - mtime / 1e9 > MTIME_SETTLE_SECONDS:
+        with _lock:
+            _cache[path] = (mtime, names)
+            _cache.move_to_end(path)
+            while len(_cache) > AUDIO_INDEX_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return names
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+
+
+class AudioIndex:
+    """
+    Answer `exists(path)` for many files while listing each directory at
+    most once. Meant to live for one request or one pass over a project.
+    """
+
+    def __init__(self):
+        self._dirs = {}
+
+    def names(self, directory: str) -> frozenset:
+        names = self._dirs.get(directory)
+        if names is None:
+            names = self._dirs[directory] = list_directory(directory)
+        return names
+
+    def exists(self, path: str) -> bool:
+        directory, name = os.path.split(path)
+        return name in self.names(directory)
@@ -0,0 +1,15 @@
+"""Helpers shared by the benchmark management commands."""
+import statistics
+
+
+def latency_summary(latencies):
+    """Count, median, 95th percentile and maximum of `latencies` (seconds), in ms."""
+    latencies = sorted(latencies)
+    if not latencies:
+        return {'count': 0}
+    return {
+        'count': len(latencies),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2),
+    }
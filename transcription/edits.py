@@ -0,0 +1,159 @@
+"""
+Applying many transcript text edits at once.
+
+Edits are `{"id": ..., "text": ...}` objects, sent either as a JSON array
+or as NDJSON (one object per line). They are applied with bulk_update in
+BATCH_SIZE chunks inside one transaction, and every edit gets its own
+status so a script can tell which ones to retry.
+"""
+import json
+import uuid
+from collections import defaultdict
+from typing import NamedTuple, Optional
+
+from django.db import transaction
+
+from Mozhi.settings import BATCH_SIZE
+from .models import Project, Transcript, counter_deltas
+
+STATUS_UPDATED = 'updated'
+STATUS_UNCHANGED = 'unchanged'
+STATUS_NOT_FOUND = 'not_found'
+STATUS_INVALID = 'invalid'
+# An earlier edit of an id that is edited again later in the same chunk.
+STATUS_SUPERSEDED = 'superseded'
+
+
+class EditResult(NamedTuple):
+    id: Optional[str]
+    status: str
+    error: str = ''
+
+    def as_dict(self):
+        result = {'id': self.id, 'status': self.status}
+        if self.error:
+            result['error'] = self.error
+        return result
+
+
+class EditsFormatError(ValueError):
+    """Raised by a strict parse_edits for a body that is not valid JSON or NDJSON."""
+
+
+def parse_edits(data, strict=False):
+    """
+    Yield the edits in `data` (str or bytes), a JSON array or NDJSON. A
+    line that is not valid JSON is yielded as `{'_error': ...}`, or raises
+    EditsFormatError if `strict`.
+    """
+    def malformed(message):
+        if strict:
+            raise EditsFormatError(message)
+        return {'_error': message}
+
+    if isinstance(data, bytes):
+        try:
+            data = data.decode('utf-8-sig')
+        except UnicodeDecodeError as e:
+            yield malformed(f"Malformed JSON: {e}")
+            return
+    stripped = data.lstrip()
+    if stripped.startswith('['):
+        try:
+            items = json.loads(stripped)
+        except ValueError as e:
+            yield malformed(f"Malformed JSON: {e}")
+            return
+        yield from items
+        return
+    for line in stripped.splitlines():
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield malformed(f"Malformed JSON line: {e}")
+
+
+def _validate(item):
+    """Return `(id, uuid, text, error)` for one edit."""
+    if not isinstance(item, dict):
+        return None, None, None, "Each edit must be an object"
+    if '_error' in item:
+        return None, None, None, item['_error']
+    raw_id = item.get('id')
+    try:
+        pk = uuid.UUID(str(raw_id))
+    except ValueError:
+        return raw_id, None, None, "Invalid id"
+    text = item.get('text')
+    if not isinstance(text, str):
+        return raw_id, pk, None, "'text' must be a string"
+    # Same normalisation as the single edit view.
+    return raw_id, pk, text.strip(), ''
+
+
+def _apply_chunk(chunk, results):
+    """Apply one chunk of validated `(index, id, pk, text)` edits."""
+    # The last edit of an id wins.
+    latest = {}
+    for index, raw_id, pk, text in chunk:
+        if pk in latest:
+            results[latest[pk][0]] = EditResult(latest[pk][1], STATUS_SUPERSEDED)
+        latest[pk] = (index, raw_id, text)
+
+    rows = Transcript.objects.select_for_update().filter(pk__in=list(latest)).only('id', 'transcript', 'project')
+    existing = {row.pk: row for row in rows}
+
+    changed = []
+    texts_by_project = defaultdict(lambda: ([], []))
+    for pk, (index, raw_id, text) in latest.items():
+        row = existing.get(pk)
+        if row is None:
+            results[index] = EditResult(raw_id, STATUS_NOT_FOUND)
+            continue
+        if (row.transcript or '') == text:
+            results[index] = EditResult(raw_id, STATUS_UNCHANGED)
+            continue
+        added, removed = texts_by_project[row.project_id]
+        added.append(text)
+        removed.append(row.transcript)
+        row.transcript = text
+        changed.append(row)
+        results[index] = EditResult(raw_id, STATUS_UPDATED)
+
+    Transcript.objects.bulk_update(changed, ['transcript'])
+    for project_id, (added, removed) in texts_by_project.items():
+        Project(pk=project_id).adjust_counters(**counter_deltas(added=added, removed=removed))
+
+
+def apply_edits(items, chunk_size=BATCH_SIZE):
+    """
+    Apply an iterable of `{id, text}` edits and return one EditResult per
+    edit, in order. Invalid and unknown edits are reported and skipped;
+    everything else is committed together.
+    """
+    results = []
+    chunk = []
+    with transaction.atomic():
+        for item in items:
+            raw_id, pk, text, error = _validate(item)
+            if error:
+                results.append(EditResult(None if raw_id is None else str(raw_id), STATUS_INVALID, error))
+                continue
+            results.append(None)
+            chunk.append((len(results) - 1, str(raw_id), pk, text))
+            if len(chunk) >= chunk_size:
+                _apply_chunk(chunk, results)
+                chunk = []
+        if chunk:
+            _apply_chunk(chunk, results)
+    return results
+
+
+def summarise(results):
+    """Count EditResults by status."""
+    counts = defaultdict(int)
+    for result in results:
+        counts[result.status] += 1
+    return dict(counts)
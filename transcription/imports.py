@@ -0,0 +1,406 @@
+"""
+The project import pipeline.
+
+An import is recorded as an ImportJob. `import_project` either runs the job
+inline or leaves it queued for the `run_import_worker` management command,
+which claims jobs from the database one at a time; no external broker is
+involved.
+
+Rows are committed in chunks together with the manifest byte offset they
+reach, so a job that fails part way through resumes from its last
+checkpoint instead of re-reading and re-probing everything.
+On PostgreSQL the rows of each chunk are streamed with COPY rather than
+inserted with bulk_create.
+
+An existing project can also be re-synced from an updated manifest with
+sync_project, which only writes the rows that changed.
+"""
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from Mozhi.settings import BATCH_SIZE, PROBE_WORKERS
+from .audio import probe_audio_file
+from .audio_index import AudioIndex, project_audio_dir
+from .manifest import iter_manifest
+from .models import ImportJob, Project, Transcript, counter_deltas
+
+logger = logging.getLogger(__name__)
+
+
+def probe_audio_files(executor, pending):
+    """
+    Probe the audio metadata of a batch of `(text, audio_rel_path, audio_full_path)`
+    tuples on `executor`. Results come back in the same order as `pending`.
+    """
+    infos = executor.map(probe_audio_file, [full_path for _, _, full_path in pending])
+    return [
+        (text, audio_rel_path, info)
+        for (text, audio_rel_path, _), info in zip(pending, infos)
+    ]
+
+
+def _copy_transcripts(transcripts):
+    """Stream `transcripts` into their table with PostgreSQL's COPY FROM STDIN."""
+    fields = Transcript._meta.concrete_fields
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    table = connection.ops.quote_name(Transcript._meta.db_table)
+    with connection.cursor() as cursor:
+        with cursor.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+            for transcript in transcripts:
+                # pre_save fills in created_at just as bulk_create would.
+                copy.write_row([field.pre_save(transcript, True) for field in fields])
+
+
+def _can_copy():
+    if connection.vendor != 'postgresql':
+        return False
+    # Only imported on PostgreSQL, where a psycopg driver is installed.
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    return is_psycopg3
+
+
+def insert_transcripts(transcripts):
+    """
+    Insert a batch of new Transcript instances. On PostgreSQL with psycopg 3
+    the rows are streamed with COPY, which is several times faster than a
+    multi-row INSERT; everywhere else this is bulk_create.
+    """
+    if _can_copy():
+        _copy_transcripts(transcripts)
+    else:
+        Transcript.objects.bulk_create(transcripts)
+
+
+def claim_next_job():
+    """
+    Atomically move the oldest queued job to running and return it, or
+    return None if the queue is empty. Safe to call from several workers.
+    """
+    while True:
+        job = ImportJob.objects.filter(status=ImportJob.STATUS_QUEUED).order_by('created_at').first()
+        if job is None:
+            return None
+        claimed = ImportJob.objects.filter(pk=job.pk, status=ImportJob.STATUS_QUEUED).update(
+            status=ImportJob.STATUS_RUNNING,
+            started_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def _record_progress(job, **fields):
+    for name, value in fields.items():
+        setattr(job, name, value)
+    job.save(update_fields=[*fields, 'updated_at'])
+
+
+def run_import_job(job):
+    """
+    Import the folder described by `job`, recording progress on the job row
+    as manifest entries are read. Any failure is stored on the job rather
+    than raised.
+    """
+    if job.status != ImportJob.STATUS_RUNNING:
+        _record_progress(job, status=ImportJob.STATUS_RUNNING, started_at=timezone.now())
+
+    try:
+        _import(job)
+    except Exception as e:
+        logger.exception(f"Import of {job.folder_name} failed")
+        _record_progress(
+            job,
+            status=ImportJob.STATUS_FAILED,
+            error=str(e),
+            finished_at=timezone.now(),
+        )
+    return job
+
+
+def _start_project(job):
+    """Create the job's project, or pick it up again when resuming."""
+    if job.project_id is not None:
+        return job.project
+
+    if Project.objects.filter(name=job.folder_name).exists():
+        raise ValueError(f'Project "{job.folder_name}" already exists.')
+
+    # Without a project there is nothing to resume from, so start over.
+    # The project and the job's link to it are written together: a project
+    # no job points at could be neither resumed nor imported again.
+    with transaction.atomic():
+        project = Project.objects.create(
+            name=job.folder_name,
+            folder_path=job.folder_path,
+            sample_rate=job.sample_rate,
+        )
+        _record_progress(
+            job,
+            project=project,
+            manifest_offset=0,
+            processed=0,
+            imported=0,
+            missing_count=0,
+            missing_files=[],
+            total_duration=0.0,
+        )
+    return project
+
+
+def _import(job):
+    full_target_dir = os.path.join(job.folder_path, job.folder_name)
+    json_path = os.path.join(full_target_dir, 'details.json')
+
+    project = _start_project(job)
+
+    user = job.user
+    if not user:
+        from django.contrib.auth.models import User
+        user = User.objects.filter(is_superuser=True).first() or User.objects.first()
+
+    processed = job.processed
+    manifest_offset = job.manifest_offset
+    pending = []
+    missing_files = []
+    audio_index = AudioIndex()
+
+    def checkpoint(executor):
+        """
+        Probe the pending files, then write their rows together with the
+        job's new manifest position in one short transaction.
+        """
+        probed = probe_audio_files(executor, pending)
+        batch = []
+        for text, audio_rel_path, info in probed:
+            transcript = Transcript(
+                project=project,
+                user=user,
+                transcript=text,
+                audio_file=os.path.basename(audio_rel_path),
+            )
+            transcript.set_audio_info(info)
+            batch.append(transcript)
+        duration = sum(info.duration for _, _, info in probed)
+
+        with transaction.atomic():
+            insert_transcripts(batch)
+            project.adjust_counters(duration=duration, **counter_deltas(added=[t.transcript for t in batch]))
+            _record_progress(
+                job,
+                manifest_offset=manifest_offset,
+                processed=processed,
+                imported=job.imported + len(batch),
+                missing_count=job.missing_count + len(missing_files),
+                missing_files=job.missing_files + missing_files,
+                total_duration=job.total_duration + duration,
+            )
+        pending.clear()
+        missing_files.clear()
+
+    # Each checkpoint covers BATCH_SIZE manifest entries. Audio is probed in a
+    # bounded pool before the transaction for that chunk is opened.
+    with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as executor:
+        for item, manifest_offset in iter_manifest(json_path, start_offset=job.manifest_offset):
+            processed += 1
+            if '_error' in item:
+                missing_files.append(item['_error'])
+            elif item.get('audio_filepath') is None:
+                missing_files.append("Missing 'audio_filepath' in JSON")
+            else:
+                audio_rel_path = item['audio_filepath']
+                audio_full_path = os.path.join(full_target_dir, audio_rel_path)
+                if audio_index.exists(audio_full_path):
+                    pending.append((item.get('text'), audio_rel_path, audio_full_path))
+                else:
+                    missing_files.append(audio_rel_path)
+
+            if processed - job.processed >= BATCH_SIZE:
+                checkpoint(executor)
+
+        # commit any remaining items
+        if processed != job.processed:
+            checkpoint(executor)
+
+    project.refresh_total_duration()
+    _record_progress(
+        job,
+        status=ImportJob.STATUS_SUCCEEDED,
+        total_duration=project.total_duration,
+        error='',
+        finished_at=timezone.now(),
+    )
+
+
+def resume_import_job(job):
+    """
+    Put a failed or stale job back in the queue so it continues from its
+    last checkpoint. Only the first of several concurrent resumes of the
+    same job re-queues it.
+    """
+    ImportJob.objects.filter(pk=job.pk, status=job.status, updated_at=job.updated_at).update(
+        status=ImportJob.STATUS_QUEUED,
+        error='',
+        finished_at=None,
+        updated_at=timezone.now(),
+    )
+    job.refresh_from_db()
+    return job
+
+
+class SyncResult(NamedTuple):
+    processed: int
+    created: int
+    updated: int
+    deleted: int
+    unchanged: int
+    missing_files: List[str]
+
+
+def _text_digest(text):
+    # Missing and empty text are the same thing in a manifest written by export.
+    return hashlib.blake2b((text or '').encode('utf-8'), digest_size=8).digest()
+
+
+def sync_project(project, user=None, delete=True):
+    """
+    Bring `project` in line with its `details.json`, matching manifest
+    entries to transcripts by audio file name.
+
+    New entries are probed and inserted, entries whose text changed are
+    updated, and transcripts no longer in the manifest are deleted, all in
+    BATCH_SIZE batches. Unchanged entries only cost a digest comparison:
+    they are neither written nor probed. Deletions are skipped when
+    `delete` is False or the manifest contains objects that could not be
+    parsed, since their audio files are unknown.
+
+    total_duration moves by the durations of the inserted and deleted rows
+    instead of being summed again, which would drop the rows that have no
+    stored duration.
+    """
+    full_target_dir = os.path.join(project.folder_path, project.name)
+    json_path = os.path.join(full_target_dir, 'details.json')
+    if not os.path.exists(json_path):
+        raise FileNotFoundError(f"details.json not found in {full_target_dir}")
+
+    if user is None:
+        from django.contrib.auth.models import User
+        user = User.objects.filter(is_superuser=True).first() or User.objects.first()
+
+    # audio_file -> [(id, digest, has_text, duration), ...]; a list because
+    # nothing stops a project from holding the same file name twice.
+    existing = {}
+    rows = (
+        project.transcripts.order_by('created_at', 'pk')
+        .values_list('audio_file', 'id', 'transcript', 'duration')
+    )
+    for audio_file, transcript_id, text, duration in rows.iterator(chunk_size=BATCH_SIZE):
+        existing.setdefault(audio_file, []).append((transcript_id, _text_digest(text), bool(text), duration))
+
+    processed = created = updated = unchanged = 0
+    missing_files = []
+    audio_index = AudioIndex()
+    malformed = False
+    pending = []
+    changed = []
+
+    def flush_inserts(executor):
+        nonlocal created
+        batch = []
+        for text, audio_rel_path, info in probe_audio_files(executor, pending):
+            transcript = Transcript(
+                project=project,
+                user=user,
+                transcript=text,
+                audio_file=os.path.basename(audio_rel_path),
+            )
+            transcript.set_audio_info(info)
+            batch.append(transcript)
+        with transaction.atomic():
+            insert_transcripts(batch)
+            project.adjust_counters(
+                duration=sum(t.duration or 0.0 for t in batch),
+                **counter_deltas(added=[t.transcript for t in batch]),
+            )
+        created += len(batch)
+        pending.clear()
+
+    def flush_updates():
+        nonlocal updated
+        # Only a change between empty and non-empty text moves the counters.
+        added = [transcript.transcript for transcript, _ in changed]
+        removed = [had_text for _, had_text in changed]
+        with transaction.atomic():
+            Transcript.objects.bulk_update([transcript for transcript, _ in changed], ['transcript'])
+            project.adjust_counters(**counter_deltas(added=added, removed=removed))
+        updated += len(changed)
+        changed.clear()
+
+    with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as executor:
+        for item, _ in iter_manifest(json_path):
+            processed += 1
+            if '_error' in item:
+                malformed = True
+                missing_files.append(item['_error'])
+                continue
+            audio_rel_path = item.get('audio_filepath')
+            if audio_rel_path is None:
+                malformed = True
+                missing_files.append("Missing 'audio_filepath' in JSON")
+                continue
+
+            text = item.get('text')
+            matches = existing.get(os.path.basename(audio_rel_path))
+            if matches:
+                transcript_id, digest, had_text, _ = matches.pop(0)
+                if digest == _text_digest(text):
+                    unchanged += 1
+                else:
+                    changed.append((Transcript(id=transcript_id, transcript=text), had_text))
+                    if len(changed) >= BATCH_SIZE:
+                        flush_updates()
+                continue
+
+            audio_full_path = os.path.join(full_target_dir, audio_rel_path)
+            if audio_index.exists(audio_full_path):
+                pending.append((text, audio_rel_path, audio_full_path))
+                if len(pending) >= BATCH_SIZE:
+                    flush_inserts(executor)
+            else:
+                missing_files.append(audio_rel_path)
+
+        if pending:
+            flush_inserts(executor)
+    if changed:
+        flush_updates()
+
+    deleted = 0
+    if malformed:
+        logger.warning(f"Not deleting transcripts of {project.name}: its manifest has malformed entries")
+    elif delete:
+        audio_dir = project_audio_dir(project)
+        stale = [
+            (transcript_id, has_text, duration,
+             audio_index.exists(os.path.join(audio_dir, os.path.basename(audio_file))))
+            for audio_file, matches in existing.items()
+            for transcript_id, _, has_text, duration in matches
+        ]
+        for i in range(0, len(stale), BATCH_SIZE):
+            batch = stale[i:i + BATCH_SIZE]
+            with transaction.atomic():
+                deleted += Transcript.objects.filter(pk__in=[transcript_id for transcript_id, _, _, _ in batch]).delete()[0]
+                project.adjust_counters(
+                    duration=-sum(duration or 0.0 for _, _, duration, _ in batch),
+                    **counter_deltas(
+                        removed=[has_text for _, has_text, _, _ in batch],
+                        missing_audio=-sum(1 for _, _, _, exists in batch if not exists),
+                    ),
+                )
+
+    return SyncResult(processed, created, updated, deleted, unchanged, missing_files)
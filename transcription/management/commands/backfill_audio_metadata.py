@@ -0,0 +1,73 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from Mozhi.settings import BATCH_SIZE, PROBE_WORKERS
+from transcription.audio import probe_audio_file
+from transcription.models import Project, Transcript
+
+
+class Command(BaseCommand):
+    help = (
+        "Read the audio header of every transcript that has no stored metadata "
+        "yet, save duration/sample rate/channels/size/mtime, and recompute each "
+        "project's total duration in SQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', action='append', default=[],
+                            help="Project name to backfill (repeatable). Defaults to every project.")
+        parser.add_argument('--all', action='store_true',
+                            help="Re-probe every transcript, not only those without metadata.")
+        parser.add_argument('--workers', type=int, default=PROBE_WORKERS,
+                            help="Number of files probed in parallel.")
+
+    def handle(self, *args, **options):
+        projects = Project.objects.all().order_by('created_at')
+        if options['project']:
+            projects = projects.filter(name__in=options['project'])
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for project in projects:
+                updated, missing = self.backfill_project(project, executor, options['all'])
+                project.refresh_total_duration()
+                self.stdout.write(
+                    f"{project.name}: updated {updated}, missing {missing}, "
+                    f"total duration {project.total_duration:.1f}s"
+                )
+
+    def backfill_project(self, project, executor, reprobe):
+        audio_dir = os.path.join(project.folder_path, project.name, 'audio')
+        transcripts = project.transcripts.only('id', 'audio_file')
+        if not reprobe:
+            transcripts = transcripts.filter(duration__isnull=True)
+
+        # Walk the rows in primary-key pages rather than holding a cursor open
+        # on the table that is being updated.
+        updated = 0
+        missing = 0
+        last_pk = None
+        while True:
+            page = transcripts.order_by('pk')
+            if last_pk is not None:
+                page = page.filter(pk__gt=last_pk)
+            batch = list(page[:BATCH_SIZE])
+            if not batch:
+                break
+            u, m = self.backfill_batch(batch, audio_dir, executor)
+            updated, missing = updated + u, missing + m
+            last_pk = batch[-1].pk
+        return updated, missing
+
+    def backfill_batch(self, batch, audio_dir, executor):
+        paths = [os.path.join(audio_dir, os.path.basename(t.audio_file)) for t in batch]
+        probed = []
+        for transcript, info in zip(batch, executor.map(probe_audio_file, paths)):
+            # Files that are gone stay unprobed so a later run can retry them.
+            if info.file_size is None:
+                continue
+            transcript.set_audio_info(info)
+            probed.append(transcript)
+        Transcript.objects.bulk_update(probed, Transcript.AUDIO_METADATA_FIELDS)
+        return len(probed), len(batch) - len(probed)
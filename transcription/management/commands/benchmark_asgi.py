@@ -0,0 +1,238 @@
+import asyncio
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import path
+
+from transcription import async_views, views
+from transcription.benchmarking import latency_summary
+from transcription.models import Project, Transcript
+
+
+class _Tracker:
+    """Counts streams in flight and records time to first byte and total time."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+        self.first_byte = []
+        self.durations = []
+        self.errors = 0
+        self.bytes = 0
+
+    def opened(self):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+
+    def closed(self, submitted, first_byte, status, size):
+        with self.lock:
+            self.in_flight -= 1
+            if status != 200:
+                self.errors += 1
+                return
+            self.first_byte.append(first_byte - submitted)
+            self.durations.append(time.perf_counter() - submitted)
+            self.bytes += size
+
+    def result(self, elapsed, streams):
+        return {
+            'streams': streams,
+            'seconds': round(elapsed, 2),
+            'peak_concurrent_streams': self.peak,
+            'streams_per_second': round(len(self.durations) / elapsed, 2),
+            'megabytes_per_second': round(self.bytes / elapsed / 1e6, 2),
+            'errors': self.errors,
+            'time_to_first_byte': latency_summary(self.first_byte),
+            'stream_time': latency_summary(self.durations),
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how many slow audio downloads one ASGI worker (the async "
+        "serve_audio on one event loop) sustains compared with one WSGI worker "
+        "(the sync view on a fixed number of threads). Clients are simulated in "
+        "process and read at --bandwidth bytes per second. A temporary project "
+        "and recording are created in the configured database and removed again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--streams', type=int, default=20,
+                            help="Concurrent downloads started at once.")
+        parser.add_argument('--seconds', type=float, default=10.0,
+                            help="Length of the served recording (16 kHz mono WAV).")
+        parser.add_argument('--bandwidth', type=int, default=512 * 1024,
+                            help="Bytes per second each client reads.")
+        parser.add_argument('--wsgi-threads', type=int, default=1,
+                            help="Threads of the WSGI worker (1 for a sync gunicorn worker).")
+        parser.add_argument('--mode', choices=['asgi', 'wsgi', 'both'], default='both')
+        parser.add_argument('--json', action='store_true',
+                            help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError("A superuser is needed to sign the benchmark requests in")
+
+        tmp_dir = tempfile.mkdtemp(prefix='mozhi-asgi-bench-')
+        project = Project.objects.create(name='benchmark', folder_path=tmp_dir, sample_rate=16000)
+        client = Client()
+        try:
+            audio_dir = os.path.join(tmp_dir, project.name, 'audio')
+            os.makedirs(audio_dir)
+            with wave.open(os.path.join(audio_dir, 'benchmark.wav'), 'wb') as wf:
+                wf.setnchannels(1)
+                wf.setsampwidth(2)
+                wf.setframerate(16000)
+                wf.writeframes(os.urandom(int(options['seconds'] * 16000) * 2))
+            transcript = Transcript.objects.create(project=project, user=user, audio_file='benchmark.wav')
+
+            client.force_login(user)
+            cookie = f"sessionid={client.cookies['sessionid'].value}"
+            url = f'/audio/{transcript.id}/'
+
+            modes = ['asgi', 'wsgi'] if options['mode'] == 'both' else [options['mode']]
+            results = {}
+            for mode in modes:
+                view = async_views.serve_audio if mode == 'asgi' else views.serve_audio
+                urlconf = types.ModuleType('benchmark_urls')
+                urlconf.urlpatterns = [path('audio/<uuid:transcript_id>/', view)]
+                with override_settings(ROOT_URLCONF=urlconf):
+                    if mode == 'asgi':
+                        results[mode] = asyncio.run(self.run_asgi(url, cookie, options))
+                    else:
+                        results[mode] = self.run_wsgi(url, cookie, options)
+        finally:
+            client.logout()
+            project.delete()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=4))
+            return
+        for mode, r in results.items():
+            self.stdout.write(
+                f"{mode}: {r['peak_concurrent_streams']} concurrent streams, {r['streams']} in {r['seconds']}s "
+                f"({r['streams_per_second']}/s, {r['megabytes_per_second']} MB/s), {r['errors']} errors; "
+                f"first byte p50 {r['time_to_first_byte'].get('p50_ms')} ms, "
+                f"p95 {r['time_to_first_byte'].get('p95_ms')} ms"
+            )
+
+    async def run_asgi(self, url, cookie, options):
+        app = ASGIHandler()
+        tracker = _Tracker()
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': url,
+            'raw_path': url.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0),
+            'server': ('localhost', 80),
+        }
+
+        async def download():
+            submitted = time.perf_counter()
+            finished = asyncio.Event()
+            state = {'status': None, 'first_byte': None, 'size': 0}
+            requested = False
+
+            async def receive():
+                nonlocal requested
+                if not requested:
+                    requested = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # The client stays connected until the whole body has arrived.
+                await finished.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    state['status'] = message['status']
+                    tracker.opened()
+                elif message['type'] == 'http.response.body':
+                    body = message.get('body', b'')
+                    if state['first_byte'] is None:
+                        state['first_byte'] = time.perf_counter()
+                    state['size'] += len(body)
+                    await asyncio.sleep(len(body) / options['bandwidth'])
+                    if not message.get('more_body', False):
+                        finished.set()
+
+            await app(dict(scope), receive, send)
+            finished.set()
+            tracker.closed(submitted, state['first_byte'] or time.perf_counter(), state['status'], state['size'])
+
+        started = time.perf_counter()
+        await asyncio.gather(*(download() for _ in range(options['streams'])))
+        return tracker.result(time.perf_counter() - started, options['streams'])
+
+    def run_wsgi(self, url, cookie, options):
+        app = WSGIHandler()
+        tracker = _Tracker()
+
+        def download(submitted):
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': url,
+                'SCRIPT_NAME': '',
+                'QUERY_STRING': '',
+                'SERVER_NAME': 'localhost',
+                'SERVER_PORT': '80',
+                'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': 'localhost',
+                'HTTP_COOKIE': cookie,
+                'wsgi.version': (1, 0),
+                'wsgi.url_scheme': 'http',
+                'wsgi.input': io.BytesIO(),
+                'wsgi.errors': sys.stderr,
+                'wsgi.multithread': True,
+                'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+            }
+            status = {}
+
+            def start_response(status_line, headers, exc_info=None):
+                status['code'] = int(status_line.split()[0])
+                tracker.opened()
+
+            response = app(environ, start_response)
+            first_byte = None
+            size = 0
+            try:
+                for body in response:
+                    if first_byte is None:
+                        first_byte = time.perf_counter()
+                    size += len(body)
+                    time.sleep(len(body) / options['bandwidth'])
+            finally:
+                response.close()
+            tracker.closed(submitted, first_byte or time.perf_counter(), status.get('code'), size)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['wsgi_threads']) as worker:
+            for future in [worker.submit(download, started) for _ in range(options['streams'])]:
+                future.result()
+        return tracker.result(time.perf_counter() - started, options['streams'])
@@ -0,0 +1,197 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+
+from Mozhi.settings import BATCH_SIZE, SQLITE_PRODUCTION_OPTIONS
+from transcription.benchmarking import latency_summary
+from transcription.models import Project, Transcript
+from transcription.pagination import keyset_page
+
+MODES = {
+    # What Django does out of the box: rollback journal, deferred transactions.
+    'default': {},
+    'production': SQLITE_PRODUCTION_OPTIONS,
+}
+
+
+def _summary(latencies, errors, elapsed):
+    summary = {**latency_summary(latencies), 'errors': errors}
+    if latencies:
+        summary['per_second'] = round(len(latencies) / elapsed, 1)
+    return summary
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure page reads and transcript edits while a bulk import runs, on "
+        "a scratch SQLite database, with Django's default SQLite settings and "
+        "with SQLITE_PRODUCTION_OPTIONS. The configured database is not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000,
+                            help="Rows inserted by the import.")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help="Rows per import transaction.")
+        parser.add_argument('--readers', type=int, default=2,
+                            help="Threads loading the first project page in a loop.")
+        parser.add_argument('--editors', type=int, default=2,
+                            help="Threads editing random transcripts in a loop.")
+        parser.add_argument('--mode', choices=[*MODES, 'both'], default='both')
+        parser.add_argument('--json', action='store_true',
+                            help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        modes = list(MODES) if options['mode'] == 'both' else [options['mode']]
+        results = {}
+        for mode in modes:
+            tmp_dir = tempfile.mkdtemp(prefix='mozhi-bench-')
+            try:
+                results[mode] = self.run_mode(mode, os.path.join(tmp_dir, 'bench.sqlite3'), options)
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=4))
+            return
+        for mode, result in results.items():
+            self.stdout.write(f"{mode}: import {result['import']['rows_per_second']} rows/s "
+                              f"in {result['import']['seconds']}s, {result['import']['errors']} failed batches")
+            for name in ('reads', 'edits'):
+                r = result[name]
+                if not r['count']:
+                    self.stdout.write(f"  {name}: none completed, {r['errors']} errors")
+                    continue
+                self.stdout.write(
+                    f"  {name}: {r['count']} ({r['per_second']}/s), p50 {r['p50_ms']} ms, "
+                    f"p95 {r['p95_ms']} ms, max {r['max_ms']} ms, {r['errors']} errors"
+                )
+
+    def run_mode(self, mode, path, options):
+        alias = f'benchmark_{mode}'
+        # The default database's settings already carry every key Django fills in.
+        connections.settings[alias] = dict(connections.settings['default'],
+                                           ENGINE='django.db.backends.sqlite3', NAME=path,
+                                           OPTIONS=dict(MODES[mode]), CONN_MAX_AGE=0,
+                                           CONN_HEALTH_CHECKS=False)
+        try:
+            call_command('migrate', database=alias, verbosity=0, interactive=False)
+            return self.measure(alias, options)
+        finally:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+
+    def measure(self, alias, options):
+        from django.contrib.auth.models import User
+
+        user = User.objects.using(alias).first()
+        project = Project.objects.using(alias).create(name='benchmark')
+        # A few rows for the editors to work on before the import starts.
+        seeded = Transcript.objects.using(alias).bulk_create([
+            Transcript(project=project, user=user, audio_file=f'seed{i}.wav', transcript=f'seed {i}')
+            for i in range(1000)
+        ])
+        seed_ids = [t.pk for t in seeded]
+        importing = threading.Event()
+        importing.set()
+        stats = {'import': [], 'import_errors': 0, 'reads': [], 'reads_errors': 0, 'edits': [], 'edits_errors': 0}
+        lock = threading.Lock()
+
+        def record(name, started, failed=False):
+            with lock:
+                if failed:
+                    stats[f'{name}_errors'] += 1
+                else:
+                    stats[name].append(time.perf_counter() - started)
+
+        def importer():
+            try:
+                for start in range(0, options['rows'], options['batch_size']):
+                    size = min(options['batch_size'], options['rows'] - start)
+                    batch = [
+                        Transcript(project=project, user=user, audio_file=f'{start + i}.wav',
+                                   transcript=f'imported transcript {start + i}', duration=1.0)
+                        for i in range(size)
+                    ]
+                    started = time.perf_counter()
+                    try:
+                        # The same writes as an import checkpoint.
+                        with transaction.atomic(using=alias):
+                            Transcript.objects.using(alias).bulk_create(batch)
+                            Project.objects.using(alias).filter(pk=project.pk).update(
+                                transcript_count=F('transcript_count') + size,
+                                transcribed_count=F('transcribed_count') + size,
+                                total_duration=F('total_duration') + size,
+                            )
+                    except OperationalError:
+                        record('import', started, failed=True)
+                    else:
+                        record('import', started)
+            finally:
+                importing.clear()
+                connections[alias].close()
+
+        def reader():
+            queryset = Transcript.objects.using(alias).filter(project=project)
+            try:
+                while importing.is_set():
+                    started = time.perf_counter()
+                    try:
+                        Project.objects.using(alias).get(pk=project.pk)
+                        list(keyset_page(queryset, per_page=25))
+                    except OperationalError:
+                        record('reads', started, failed=True)
+                    else:
+                        record('reads', started)
+            finally:
+                connections[alias].close()
+
+        def editor(seed):
+            rng = random.Random(seed)
+            try:
+                while importing.is_set():
+                    started = time.perf_counter()
+                    try:
+                        with transaction.atomic(using=alias):
+                            Transcript.objects.using(alias).filter(pk=rng.choice(seed_ids)).update(
+                                transcript=f'edited {rng.random()}'
+                            )
+                    except OperationalError:
+                        record('edits', started, failed=True)
+                    else:
+                        record('edits', started)
+                    time.sleep(0.01)
+            finally:
+                connections[alias].close()
+
+        threads = [threading.Thread(target=importer)]
+        threads += [threading.Thread(target=reader) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=editor, args=(i,)) for i in range(options['editors'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            'import': {
+                'rows': options['rows'],
+                'seconds': round(elapsed, 2),
+                'rows_per_second': round(options['rows'] / elapsed),
+                'errors': stats['import_errors'],
+                'batches': _summary(stats['import'], stats['import_errors'], elapsed),
+            },
+            'reads': _summary(stats['reads'], stats['reads_errors'], elapsed),
+            'edits': _summary(stats['edits'], stats['edits_errors'], elapsed),
+        }
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import uuid
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from transcription.benchmarking import latency_summary
+from transcription.imports import run_import_job
+from transcription.manifest import iter_objects_from_file
+from transcription.models import ImportJob, Project, Transcript
+from transcription.pagination import encode_cursor
+from transcription.synthetic import generate_dataset
+
+
+def _throughput(rows, elapsed, **extra):
+    return {'seconds': round(elapsed, 3), 'rows_per_second': round(rows / elapsed), **extra}
+
+
+def _read_body(response):
+    """Consume a (possibly async) streaming response and return its bytes."""
+    if not response.streaming:
+        return response.content
+    if response.is_async:
+        async def drain():
+            return b''.join([chunk async for chunk in response.streaming_content])
+        return asyncio.run(drain())
+    return b''.join(response.streaming_content)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the manifest parser, a project import, the details.json export, "
+        "project page loads and audio serving on synthetic projects of each "
+        "--sizes rows, and report the results as JSON for comparing releases. "
+        "The projects are created in the configured database and removed again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000],
+                            help="Rows of each synthetic project.")
+        parser.add_argument('--seconds', type=float, default=1.0,
+                            help="Length of each recording.")
+        parser.add_argument('--repeat', type=int, default=20,
+                            help="Requests per page load and audio measurement.")
+        parser.add_argument('--json5', action='store_true',
+                            help="Generate manifests with json5 quirks and NBSPs.")
+        parser.add_argument('--output', help="Write the results to this JSON file.")
+        parser.add_argument('--json', action='store_true',
+                            help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError("A superuser is needed to sign the benchmark requests in")
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'platform': platform.platform(),
+            'options': {name: options[name] for name in ('sizes', 'seconds', 'repeat', 'json5')},
+            'results': {},
+        }
+        for size in options['sizes']:
+            report['results'][str(size)] = self.run_size(size, user, options)
+            if not options['json']:
+                self.print_result(size, report['results'][str(size)])
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=4)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=4))
+
+    def run_size(self, size, user, options):
+        tmp_dir = tempfile.mkdtemp(prefix='mozhi-suite-')
+        name = f'benchmark-{size}-{uuid.uuid4().hex[:8]}'
+        job = None
+        client = Client()
+        client.force_login(user)
+        try:
+            result = {}
+            started = time.perf_counter()
+            info = generate_dataset(os.path.join(tmp_dir, name), size, seconds=options['seconds'],
+                                    json5_quirks=options['json5'], nbsp=options['json5'], link_audio=True)
+            result['generate'] = _throughput(size, time.perf_counter() - started,
+                                             manifest_bytes=info.manifest_bytes)
+
+            started = time.perf_counter()
+            parsed = sum(1 for obj in iter_objects_from_file(info.manifest_path) if '_error' not in obj)
+            elapsed = time.perf_counter() - started
+            result['parse'] = _throughput(parsed, elapsed,
+                                          megabytes_per_second=round(info.manifest_bytes / elapsed / 1e6, 1))
+
+            job = ImportJob.objects.create(folder_name=name, folder_path=tmp_dir, sample_rate=16000, user=user)
+            started = time.perf_counter()
+            run_import_job(job)
+            elapsed = time.perf_counter() - started
+            if job.status != ImportJob.STATUS_SUCCEEDED:
+                raise CommandError(f"Import of {size} rows failed: {job.error}")
+            result['import'] = _throughput(job.imported, elapsed)
+            project = job.project
+
+            started = time.perf_counter()
+            response = client.post(reverse('export:export_project_json', args=[project.id]))
+            last = json.loads(_read_body(response).decode().splitlines()[-1])
+            elapsed = time.perf_counter() - started
+            if last['type'] != 'success':
+                raise CommandError(f"Export of {size} rows failed: {last.get('error')}")
+            result['export'] = _throughput(size, elapsed)
+
+            result['project_detail'] = self.measure_pages(client, project, options['repeat'])
+            result['serve_audio'] = self.measure_audio(client, project, options['repeat'])
+            return result
+        finally:
+            client.logout()
+            if job is not None:
+                ImportJob.objects.filter(pk=job.pk).delete()
+                Project.objects.filter(name=name).delete()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def measure_pages(self, client, project, repeat):
+        """First, middle and last page of the project listing."""
+        url = reverse('project_detail', args=[project.id])
+        middle = (
+            Transcript.objects.filter(project=project)
+            .order_by('-created_at', '-id')[project.transcript_count // 2]
+        )
+        pages = {'first': {}, 'middle': {'after': encode_cursor(middle)}, 'last': {'last': '1'}}
+        results = {}
+        for page, params in pages.items():
+            latencies = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                response = client.get(url, params)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise CommandError(f"The {page} page of {project.name} returned {response.status_code}")
+            results[page] = latency_summary(latencies)
+        return results
+
+    def measure_audio(self, client, project, repeat):
+        """A whole recording, then its first kilobyte as a range request."""
+        transcript = Transcript.objects.filter(project=project).first()
+        url = reverse('serve_audio', args=[transcript.id])
+        results = {}
+        for kind, headers in (('full', {}), ('range', {'Range': 'bytes=0-1023'})):
+            latencies = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                response = client.get(url, headers=headers)
+                _read_body(response)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code not in (200, 206):
+                    raise CommandError(f"serve_audio returned {response.status_code}")
+            results[kind] = latency_summary(latencies)
+        return results
+
+    def print_result(self, size, result):
+        self.stdout.write(f"{size} rows:")
+        for name in ('generate', 'parse', 'import', 'export'):
+            self.stdout.write(f"  {name}: {result[name]['rows_per_second']} rows/s "
+                              f"in {result[name]['seconds']}s")
+        for name in ('project_detail', 'serve_audio'):
+            for kind, r in result[name].items():
+                self.stdout.write(f"  {name} {kind}: p50 {r['p50_ms']} ms, p95 {r['p95_ms']} ms, "
+                                  f"max {r['max_ms']} ms")
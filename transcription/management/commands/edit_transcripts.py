@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Mozhi.settings import BATCH_SIZE
+from transcription.edits import STATUS_UNCHANGED, STATUS_UPDATED, apply_edits, parse_edits, summarise
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply a batch of transcript text edits from a file of "
+        '{"id": ..., "text": ...} objects, as a JSON array or NDJSON. All '
+        "edits are committed together; invalid and unknown ids are listed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help="File with the edits, or - to read standard input.")
+        parser.add_argument('--chunk-size', type=int, default=BATCH_SIZE,
+                            help="Edits written per bulk update.")
+
+    def handle(self, *args, **options):
+        if options['file'] == '-':
+            data = sys.stdin.buffer.read()
+        else:
+            try:
+                with open(options['file'], 'rb') as f:
+                    data = f.read()
+            except OSError as e:
+                raise CommandError(str(e))
+
+        results = apply_edits(parse_edits(data), chunk_size=options['chunk_size'])
+        counts = summarise(results)
+        self.stdout.write(", ".join(f"{status} {count}" for status, count in sorted(counts.items())) or "No edits")
+        for index, result in enumerate(results, 1):
+            if result.status not in (STATUS_UPDATED, STATUS_UNCHANGED):
+                detail = f": {result.error}" if result.error else ""
+                self.stdout.write(f"  #{index} {result.id}: {result.status}{detail}")
@@ -0,0 +1,54 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Mozhi.settings import SAVE_DIR
+from transcription.synthetic import generate_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Write a synthetic project folder (WAV recordings plus a details.json "
+        "manifest) that can be imported like a real one, for benchmarks and "
+        "load tests."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help="Folder name of the project.")
+        parser.add_argument('--rows', type=int, default=1000,
+                            help="Number of recordings and manifest entries.")
+        parser.add_argument('--seconds', type=float, default=1.0,
+                            help="Length of each recording.")
+        parser.add_argument('--sample-rate', type=int, default=16000)
+        parser.add_argument('--folder', default=SAVE_DIR,
+                            help="Directory the project folder is created in (default SAVE_DIR).")
+        parser.add_argument('--jsonl', action='store_true',
+                            help="Write one manifest object per line instead of a JSON array.")
+        parser.add_argument('--json5', action='store_true',
+                            help="Write some entries with json5 quirks and add comments.")
+        parser.add_argument('--nbsp', action='store_true',
+                            help="Separate some words of the texts with non-breaking spaces.")
+        parser.add_argument('--link-audio', action='store_true',
+                            help="Hard-link every recording to the first one to save space.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        directory = os.path.join(options['folder'], options['name'])
+        if os.path.exists(os.path.join(directory, 'details.json')):
+            raise CommandError(f"{directory} already holds a details.json")
+
+        info = generate_dataset(
+            directory,
+            options['rows'],
+            seconds=options['seconds'],
+            sample_rate=options['sample_rate'],
+            jsonl=options['jsonl'],
+            json5_quirks=options['json5'],
+            nbsp=options['nbsp'],
+            link_audio=options['link_audio'],
+            seed=options['seed'],
+        )
+        self.stdout.write(
+            f"Wrote {info.rows} recordings ({info.audio_bytes / 1e6:.1f} MB of audio) and a "
+            f"{info.manifest_bytes / 1e6:.1f} MB manifest to {info.directory}"
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from transcription.search import install_sqlite_triggers
+
+
+class Command(BaseCommand):
+    help = (
+        "Recreate the SQLite triggers that keep the full-text index of "
+        "transcript text current, rebuild the index from the transcripts "
+        "table and merge its segments. Needed after a VACUUM, which can "
+        "renumber the rowids the index is keyed on; migrate already does this "
+        "when a migration rebuilt the transcript table and dropped the "
+        "triggers. On PostgreSQL the search column is generated by the "
+        "database and never needs this."
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write(f"Nothing to do on {connection.vendor}")
+            return
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            install_sqlite_triggers(cursor)
+            cursor.execute(
+                "INSERT INTO transcription_transcript_fts(transcription_transcript_fts) VALUES ('rebuild')"
+            )
+            cursor.execute(
+                "INSERT INTO transcription_transcript_fts(transcription_transcript_fts) VALUES ('optimize')"
+            )
+            cursor.execute("SELECT COUNT(*) FROM transcription_transcript_fts")
+            count, = cursor.fetchone()
+        self.stdout.write(f"Indexed {count} transcripts")
@@ -0,0 +1,77 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Mozhi.settings import BATCH_SIZE
+from transcription.audio_index import AudioIndex, project_audio_dir
+from transcription.models import Project
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount each project's transcripts, transcribed and empty texts and "
+        "missing audio files, and overwrite the stored counters where they "
+        "have drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', action='append', default=[],
+                            help="Project name to reconcile (repeatable). Defaults to every project.")
+        parser.add_argument('--skip-audio', action='store_true',
+                            help="Leave missing_audio_count alone instead of listing the audio folders.")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Report drift without writing anything.")
+
+    def handle(self, *args, **options):
+        projects = Project.objects.all().order_by('created_at')
+        if options['project']:
+            projects = projects.filter(name__in=options['project'])
+
+        drifted = 0
+        for project in projects:
+            missing_audio = None if options['skip_audio'] else self.count_missing_audio(project)
+            changes = self.reconcile_project(project, missing_audio, options['dry_run'])
+            if changes:
+                drifted += 1
+                details = ', '.join(f"{name} {old} -> {new}" for name, (old, new) in changes.items())
+                self.stdout.write(f"{project.name}: {details}")
+            else:
+                self.stdout.write(f"{project.name}: ok")
+
+        verb = "would be fixed" if options['dry_run'] else "fixed"
+        self.stdout.write(f"{drifted} project(s) {verb}")
+
+    def count_missing_audio(self, project):
+        audio_dir = project_audio_dir(project)
+        audio_index = AudioIndex()
+        files = project.transcripts.values_list('audio_file', flat=True).iterator(chunk_size=BATCH_SIZE)
+        return sum(
+            1 for audio_file in files
+            if not audio_index.exists(os.path.join(audio_dir, os.path.basename(audio_file)))
+        )
+
+    def reconcile_project(self, project, missing_audio, dry_run):
+        """
+        Return `{field: (stored, actual)}` for every counter that drifted,
+        writing the actual values unless `dry_run` is set.
+        """
+        # Locking the project row makes concurrent writers, which update it
+        # after touching the transcripts, wait until the recount is stored;
+        # their own F() increments then apply on top of it.
+        with transaction.atomic():
+            locked = Project.objects.select_for_update().get(pk=project.pk)
+            actual = project.count_transcripts()
+            if missing_audio is not None:
+                actual['missing_audio_count'] = missing_audio
+
+            changes = {
+                name: (getattr(locked, name), value)
+                for name, value in actual.items()
+                if getattr(locked, name) != value
+            }
+            if changes and not dry_run:
+                Project.objects.filter(pk=project.pk).update(
+                    **{name: value for name, (_, value) in changes.items()}
+                )
+        return changes
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Mozhi.settings import IMPORT_POLL_INTERVAL
+from transcription.imports import claim_next_job, run_import_job
+from transcription.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued project imports. Polls the ImportJob table and runs one job "
+        "at a time; start several workers to run imports in parallel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Exit once the queue is empty instead of waiting for new jobs.")
+        parser.add_argument('--interval', type=float, default=IMPORT_POLL_INTERVAL,
+                            help="Seconds to wait between polls of an empty queue.")
+        parser.add_argument('--requeue-running', action='store_true',
+                            help="Re-queue jobs left running by a worker that crashed, so they "
+                                 "resume from their last checkpoint. Only use when no other worker is running.")
+
+    def handle(self, *args, **options):
+        if options['requeue_running']:
+            requeued = ImportJob.objects.filter(status=ImportJob.STATUS_RUNNING).update(
+                status=ImportJob.STATUS_QUEUED
+            )
+            self.stdout.write(f"Re-queued {requeued} interrupted job(s)")
+
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+                continue
+
+            self.stdout.write(f"Importing {job.folder_name} (job {job.id})")
+            run_import_job(job)
+            if job.status == ImportJob.STATUS_SUCCEEDED:
+                self.stdout.write(
+                    f"Imported {job.imported} items into {job.folder_name}, "
+                    f"{job.missing_count} missing"
+                )
+            else:
+                self.stderr.write(f"Import of {job.folder_name} failed: {job.error}")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from transcription.imports import sync_project
+from transcription.models import Project
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-sync existing projects from the details.json in their folders: insert "
+        "new entries, update changed text and delete transcripts no longer listed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('project', nargs='+', help="Name of a project to sync.")
+        parser.add_argument('--keep-missing', action='store_true',
+                            help="Do not delete transcripts that are no longer in the manifest.")
+
+    def handle(self, *args, **options):
+        for name in options['project']:
+            project = Project.objects.filter(name=name).first()
+            if project is None:
+                raise CommandError(f'Project "{name}" does not exist')
+            try:
+                result = sync_project(project, delete=not options['keep_missing'])
+            except FileNotFoundError as e:
+                raise CommandError(str(e))
+            self.stdout.write(
+                f"{project.name}: added {result.created}, updated {result.updated}, "
+                f"deleted {result.deleted}, unchanged {result.unchanged}, "
+                f"skipped {len(result.missing_files)}"
+            )
+            for missing in result.missing_files:
+                self.stdout.write(f"  missing: {missing}")
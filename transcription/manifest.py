@@ -0,0 +1,362 @@
+"""
+Streaming reader for `details.json` manifests.
+
+A manifest is either a JSON array of objects or one object per line
+(JSONL), possibly with json5 quirks such as trailing commas, comments or
+unquoted keys. Objects are decoded with the C-accelerated
+`json.JSONDecoder.raw_decode`; only objects that fail strict parsing are
+handed to json5.
+
+Very large manifests can also be memory-mapped, split into byte ranges
+and parsed on a process pool (see iter_objects_parallel).
+
+Both readers can report the byte offset just past each object, and can
+start from such an offset, so an interrupted import can pick up where it
+left off.
+
+ManifestWriter writes a manifest one entry at a time and only replaces the
+target file once every entry has been written.
+"""
+import codecs
+import json
+import logging
+import mmap
+import os
+import re
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import json5
+
+from Mozhi.settings import (
+    MANIFEST_BLOCK_SIZE,
+    MANIFEST_CHUNK_SIZE,
+    MANIFEST_PARALLEL_THRESHOLD,
+    MANIFEST_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+_decoder = json.JSONDecoder()
+
+NBSP = '\u00a0'
+
+# Outside a string only braces and quotes matter; inside a string only an
+# unescaped closing quote does.
+_STRUCTURAL = re.compile(r'[{}"]')
+_STRING_TAIL = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+
+TRUNCATED_OBJECT_ERROR = "Malformed JSON object: unexpected end of file"
+
+
+def find_object_end(text: str, start: int) -> int:
+    """
+    Return the index just past the '}' that closes the object opening at
+    `text[start]`, or -1 if the object is not complete within `text`.
+
+    Strings are delimited by double quotes and a backslash escapes the next
+    character inside a string, exactly as the original character scanner did.
+    """
+    depth = 0
+    pos = start
+    while True:
+        match = _STRUCTURAL.search(text, pos)
+        if match is None:
+            return -1
+        char = match.group()
+        pos = match.end()
+        if char == '"':
+            tail = _STRING_TAIL.match(text, pos)
+            if tail is None:
+                return -1
+            pos = tail.end()
+        elif char == '{':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return pos
+
+
+def _parse_json5(text: str):
+    try:
+        return json5.loads(text)
+    except Exception as e:
+        return {'_error': f"Malformed JSON object: {e}"}
+
+
+def parse_object(text: str):
+    """Parse one manifest object, trying strict JSON before json5."""
+    try:
+        obj, end = _decoder.raw_decode(text)
+        if not text[end:].strip():
+            return obj
+    except ValueError:
+        pass
+    return _parse_json5(text)
+
+
+def _next_object(buffer: str, pos: int):
+    """
+    Decode the next top-level object at or after `pos`.
+
+    Returns `(obj, start, end)`. `start` is -1 if no object opens in the
+    buffer, and `end` is -1 if the object opening at `start` is incomplete.
+    Non-breaking spaces are turned into plain spaces, as the original
+    line-based reader did, since they also trip up json5.
+    """
+    start = buffer.find('{', pos)
+    if start == -1:
+        return None, -1, -1
+    try:
+        obj, end = _decoder.raw_decode(buffer, start)
+    except ValueError:
+        end = find_object_end(buffer, start)
+        if end == -1:
+            return None, start, -1
+        obj = parse_object(buffer[start:end].replace(NBSP, ' '))
+    else:
+        if buffer.find(NBSP, start, end) != -1:
+            obj = parse_object(buffer[start:end].replace(NBSP, ' '))
+    return obj, start, end
+
+
+def _log_error(obj, snippet=''):
+    logger.warning(f"Skipping malformed object: {obj['_error']}\n{snippet[:100]}")
+
+
+def _byte_length(text: str, start: int, end: int, is_ascii: bool) -> int:
+    return end - start if is_ascii else len(text[start:end].encode('utf-8'))
+
+
+def _iter_objects(filepath: str, block_size: int, start_offset: int):
+    """Yield `(obj, end_offset)` for every object from `start_offset` on."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    is_ascii = True
+    pos = 0
+    # `offset` is the byte offset in the file of `buffer[cursor]`.
+    offset = start_offset
+    cursor = 0
+    eof = False
+
+    with open(filepath, 'rb') as f:
+        f.seek(start_offset)
+        while True:
+            obj, start, end = _next_object(buffer, pos)
+            if end != -1:
+                offset += _byte_length(buffer, cursor, end, is_ascii)
+                cursor = pos = end
+                if '_error' in obj:
+                    _log_error(obj, buffer[start:end])
+                yield obj, offset
+                continue
+
+            if start != -1 and eof:
+                obj = {'_error': TRUNCATED_OBJECT_ERROR}
+                _log_error(obj, buffer[start:])
+                yield obj, offset + _byte_length(buffer, cursor, len(buffer), is_ascii)
+                return
+
+            # Drop everything before the incomplete object, or the whole
+            # buffer if it only holds separators, brackets or comments.
+            keep = len(buffer) if start == -1 else start
+            offset += _byte_length(buffer, cursor, keep, is_ascii)
+            buffer, cursor, pos = buffer[keep:], 0, 0
+
+            if eof:
+                return
+            data = f.read(block_size)
+            if offset == 0 and data.startswith(codecs.BOM_UTF8):
+                data = data[len(codecs.BOM_UTF8):]
+                offset = len(codecs.BOM_UTF8)
+            eof = not data
+            buffer += decoder.decode(data, final=eof)
+            is_ascii = buffer.isascii()
+
+
+def iter_objects_from_file(filepath: str, block_size: int = MANIFEST_BLOCK_SIZE,
+                           start_offset: int = 0, with_offsets: bool = False):
+    """
+    Yield every top-level object of a manifest as a dict, reading
+    `block_size` bytes at a time. Never holds more than one block plus
+    one object in memory. Objects that cannot be parsed are yielded as
+    `{'_error': ...}` so the caller can report them.
+
+    With `with_offsets`, yields `(obj, end_offset)` pairs instead, where
+    `end_offset` is the byte offset just past the object; passing it back
+    as `start_offset` resumes with the next object.
+    """
+    objects = _iter_objects(filepath, block_size, start_offset)
+    if with_offsets:
+        return objects
+    return (obj for obj, _ in objects)
+
+
+# A '{' that follows the '}' of a previous object, optionally separated by a
+# comma and whitespace, is where a manifest can most likely be split.
+_SPLIT_CANDIDATE = re.compile(rb'\}\s*,?\s*\{')
+
+
+def split_manifest(filepath: str, chunk_size: int = MANIFEST_CHUNK_SIZE, start_offset: int = 0):
+    """
+    Return `(start, stop)` byte ranges of roughly `chunk_size` bytes covering
+    the manifest from `start_offset` to the end. Every range but the first
+    starts on a '{' that looks like the start of a top-level object;
+    iter_objects_parallel checks that guess before trusting a range.
+    """
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= start_offset:
+            return []
+        bounds = [start_offset]
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            target = start_offset + chunk_size
+            while target < size:
+                match = _SPLIT_CANDIDATE.search(mm, target)
+                if match is None:
+                    break
+                bounds.append(match.end() - 1)
+                target = bounds[-1] + chunk_size
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def parse_manifest_range(filepath: str, start: int, stop: int):
+    """
+    Parse the objects that open in bytes `[start, stop)` of a manifest, with
+    the same rules as iter_objects_from_file.
+
+    Returns `(items, resume)`. `items` is a list of `(obj, end_offset)`
+    pairs; `resume` is `stop` if the range ended between objects, otherwise
+    the byte offset of the object left incomplete at the end of the range.
+    Nothing is logged here, since a range may turn out to have started
+    inside an object and be discarded.
+    """
+    with open(filepath, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            data = mm[start:stop]
+
+    offset = start
+    if start == 0 and data.startswith(codecs.BOM_UTF8):
+        data = data[len(codecs.BOM_UTF8):]
+        offset = len(codecs.BOM_UTF8)
+    text = data.decode('utf-8')
+    is_ascii = text.isascii()
+
+    items = []
+    cursor = pos = 0
+    while True:
+        obj, begin, end = _next_object(text, pos)
+        if end != -1:
+            offset += _byte_length(text, cursor, end, is_ascii)
+            cursor = pos = end
+            items.append((obj, offset))
+            continue
+        if begin == -1:
+            return items, stop
+        if stop >= size:
+            items.append(({'_error': TRUNCATED_OBJECT_ERROR}, size))
+            return items, stop
+        return items, offset + _byte_length(text, cursor, begin, is_ascii)
+
+
+def iter_objects_parallel(filepath: str, workers: int = MANIFEST_WORKERS,
+                          chunk_size: int = MANIFEST_CHUNK_SIZE,
+                          start_offset: int = 0, with_offsets: bool = False):
+    """
+    Yield the same objects as iter_objects_from_file, in the same order, but
+    parse `chunk_size` byte ranges of the manifest on a pool of `workers`
+    processes. At most two ranges per worker are in flight at once.
+
+    A range is only trusted if the previous range ended exactly where it
+    starts; otherwise its split point fell inside an object, and the bytes
+    from the last real boundary are re-parsed here instead.
+    """
+    ranges = split_manifest(filepath, chunk_size, start_offset)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        submitted = 0
+        pos = start_offset
+        for start, stop in ranges:
+            while submitted < len(ranges) and len(in_flight) < workers * 2:
+                in_flight.append(executor.submit(parse_manifest_range, filepath, *ranges[submitted]))
+                submitted += 1
+
+            future = in_flight.popleft()
+            if start == pos:
+                items, pos = future.result()
+            else:
+                future.cancel()
+                items, pos = parse_manifest_range(filepath, pos, stop)
+            for obj, end_offset in items:
+                if '_error' in obj:
+                    _log_error(obj)
+                yield (obj, end_offset) if with_offsets else obj
+
+
+def iter_manifest(filepath: str, start_offset: int = 0):
+    """
+    Yield `(obj, end_offset)` for every object of a manifest from
+    `start_offset` on, switching to the process pool once the file is at
+    least MANIFEST_PARALLEL_THRESHOLD bytes.
+    """
+    if MANIFEST_WORKERS > 1 and os.path.getsize(filepath) >= MANIFEST_PARALLEL_THRESHOLD:
+        return iter_objects_parallel(filepath, start_offset=start_offset, with_offsets=True)
+    return iter_objects_from_file(filepath, start_offset=start_offset, with_offsets=True)
+
+
+class ManifestWriter:
+    """
+    Write manifest entries incrementally to a temporary file next to
+    `filepath`, then atomically rename it over `filepath` when the block
+    exits cleanly. On error the temporary file is removed and any existing
+    manifest is left untouched.
+
+    With `jsonl=False` the output is byte-for-byte what
+    `json.dump(entries, f, indent=4)` would write; with `jsonl=True` it is
+    one compact object per line.
+
+        with ManifestWriter(path) as writer:
+            for entry in entries:
+                writer.write(entry)
+    """
+
+    def __init__(self, filepath: str, jsonl: bool = False):
+        self.filepath = filepath
+        self.jsonl = jsonl
+        self.count = 0
+        self._tmp_path = f"{filepath}.{uuid.uuid4().hex}.tmp"
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self._tmp_path, 'x', encoding='utf-8')
+        return self
+
+    def write(self, entry: dict):
+        if self.jsonl:
+            self._file.write(json.dumps(entry) + '\n')
+        else:
+            # Strings never contain a raw newline once encoded, so re-indenting
+            # the object by one level only touches its own line breaks.
+            self._file.write(('[\n    ' if self.count == 0 else ',\n    ')
+                             + json.dumps(entry, indent=4).replace('\n', '\n    '))
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                if not self.jsonl:
+                    self._file.write('\n]' if self.count else '[]')
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            self._file.close()
+            if exc_type is None:
+                os.replace(self._tmp_path, self.filepath)
+        finally:
+            if os.path.exists(self._tmp_path):
+                os.remove(self._tmp_path)
+        return False
@@ -0,0 +1,253 @@
+"""
+Per-request performance metrics.
+
+RequestMetricsMiddleware (transcription/middleware.py) gives every request
+a RequestStats and makes it current in a context variable. While it is
+current, each SQL query (through a database execute wrapper) and each
+filesystem probe (functions decorated with `fs_probe`) adds its count and
+time to it. Context variables follow the request into sync_to_async and
+asyncio.to_thread, so the async views are measured the same way.
+
+When the response is complete the stats are added to histograms,
+labelled by view name, that `render_prometheus` formats for /metrics/.
+Each is exposed twice: as a Prometheus histogram counting every request
+since the process started, which only ever grows as rate() expects, and
+as a rolling `*_window` gauge of the bucket counts over the last
+METRICS_WINDOW seconds, for reading recent latency without a query. The
+window is kept in WINDOW_SLOTS slots; a slot older than the window is
+reset the next time it is written to.
+
+Recording a request costs a few counter updates under one lock, and a
+query or probe outside a request only a context variable lookup, so the
+middleware is cheap enough to leave on in production.
+"""
+import bisect
+import contextvars
+import functools
+import os
+import threading
+import time
+
+from Mozhi.settings import METRICS_WINDOW
+
+WINDOW_SLOTS = 10
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+# Name, help text, buckets and the RequestStats value of each histogram.
+HISTOGRAMS = (
+    ('mozhi_request_duration_seconds', "Time until the view returned its response.",
+     DURATION_BUCKETS, lambda s: s.duration),
+    ('mozhi_request_sql_queries', "SQL queries per request.",
+     COUNT_BUCKETS, lambda s: s.sql_queries),
+    ('mozhi_request_sql_seconds', "Time spent in SQL queries per request.",
+     DURATION_BUCKETS, lambda s: s.sql_time),
+    ('mozhi_request_fs_probes', "Filesystem probes (stats, listings, header reads) per request.",
+     COUNT_BUCKETS, lambda s: s.fs_probes),
+    ('mozhi_request_fs_seconds', "Time spent in filesystem probes per request.",
+     DURATION_BUCKETS, lambda s: s.fs_time),
+    ('mozhi_response_bytes', "Response body size.",
+     BYTES_BUCKETS, lambda s: s.response_bytes),
+)
+
+_current = contextvars.ContextVar('mozhi_request_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = ('started', 'duration', 'sql_queries', 'sql_time', 'fs_probes', 'fs_time',
+                 'fs_depth', 'response_bytes')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.sql_queries = 0
+        self.sql_time = 0.0
+        self.fs_probes = 0
+        self.fs_time = 0.0
+        self.fs_depth = 0
+        self.response_bytes = 0
+
+    def activate(self):
+        """Make these the current stats; returns a token for `deactivate`."""
+        return _current.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current.reset(token)
+
+    def server_timing(self):
+        """The stats so far as a Server-Timing header value."""
+        app = max(0.0, self.duration - self.sql_time - self.fs_time)
+        return (
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.sql_queries} queries", '
+            f'fs;dur={self.fs_time * 1000:.1f};desc="{self.fs_probes} probes", '
+            f'app;dur={app * 1000:.1f}, '
+            f'total;dur={self.duration * 1000:.1f}'
+        )
+
+
+def record_sql(execute, sql, params, many, context):
+    """Database execute wrapper counting the queries of the current request."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.sql_queries += 1
+        stats.sql_time += time.perf_counter() - started
+
+
+def install_sql_probe(sender, connection, **kwargs):
+    """connection_created receiver adding record_sql to every new connection."""
+    if record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_sql)
+
+
+def fs_probe(func):
+    """
+    Count each call of `func` as one filesystem probe of the current
+    request. Probes made inside another probe are part of the outer one.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stats = _current.get()
+        if stats is None or stats.fs_depth:
+            return func(*args, **kwargs)
+        stats.fs_depth = 1
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats.fs_depth = 0
+            stats.fs_probes += 1
+            stats.fs_time += time.perf_counter() - started
+    return wrapper
+
+
+# os.stat counted as a probe, for the stats taken while serving a request.
+stat = fs_probe(os.stat)
+
+
+def _cumulative(counts):
+    counts = list(counts)
+    for i in range(1, len(counts)):
+        counts[i] += counts[i - 1]
+    return counts
+
+
+class _Histogram:
+    """
+    Bucket counts and sum of one label since the process started, and
+    bucket counts over WINDOW_SLOTS rotating slots.
+    """
+    __slots__ = ('buckets', 'total_counts', 'total_sum', 'epochs', 'counts')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One count per bucket plus +Inf, not cumulative.
+        self.total_counts = [0] * (len(buckets) + 1)
+        self.total_sum = 0.0
+        self.epochs = [-1] * WINDOW_SLOTS
+        self.counts = [[0] * (len(buckets) + 1) for _ in range(WINDOW_SLOTS)]
+
+    def observe(self, value, epoch):
+        bucket = bisect.bisect_left(self.buckets, value)
+        self.total_counts[bucket] += 1
+        self.total_sum += value
+        slot = epoch % WINDOW_SLOTS
+        if self.epochs[slot] != epoch:
+            self.epochs[slot] = epoch
+            self.counts[slot] = [0] * (len(self.buckets) + 1)
+        self.counts[slot][bucket] += 1
+
+    def snapshot(self, epoch):
+        """
+        Return `(cumulative bucket counts, sum)` since the process started
+        and the cumulative bucket counts over the live slots.
+        """
+        window = [0] * (len(self.buckets) + 1)
+        for slot in range(WINDOW_SLOTS):
+            if epoch - WINDOW_SLOTS < self.epochs[slot] <= epoch:
+                for i, count in enumerate(self.counts[slot]):
+                    window[i] += count
+        return (_cumulative(self.total_counts), self.total_sum), _cumulative(window)
+
+
+class MetricsRegistry:
+    def __init__(self, window=METRICS_WINDOW):
+        self.slot_seconds = max(window / WINDOW_SLOTS, 1e-3)
+        self.window = window
+        self._lock = threading.Lock()
+        self._histograms = {}
+        # Requests by view and status code since the process started.
+        self._requests = {}
+
+    def _epoch(self):
+        return int(time.monotonic() / self.slot_seconds)
+
+    def record(self, view, status, stats):
+        epoch = self._epoch()
+        with self._lock:
+            key = (view, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            for name, _, buckets, value in HISTOGRAMS:
+                histogram = self._histograms.get((name, view))
+                if histogram is None:
+                    histogram = self._histograms[(name, view)] = _Histogram(buckets)
+                histogram.observe(value(stats), epoch)
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        epoch = self._epoch()
+        with self._lock:
+            requests = sorted(self._requests.items())
+            snapshots = {key: histogram.snapshot(epoch) for key, histogram in self._histograms.items()}
+
+        lines = [
+            '# HELP mozhi_requests_total Requests by view and status code since the process started.',
+            '# TYPE mozhi_requests_total counter',
+        ]
+        for (view, status), count in requests:
+            lines.append(f'mozhi_requests_total{{view="{_escape(view)}",code="{status}"}} {count}')
+
+        for name, help_text, buckets, _ in HISTOGRAMS:
+            families = sorted((view, snapshot) for (metric, view), snapshot in snapshots.items() if metric == name)
+            bounds = [_format_bound(bound) for bound in buckets] + ['+Inf']
+
+            lines.append(f'# HELP {name} {help_text} Since the process started.')
+            lines.append(f'# TYPE {name} histogram')
+            for view, ((counts, total), _) in families:
+                label = f'view="{_escape(view)}"'
+                for bound, count in zip(bounds, counts):
+                    lines.append(f'{name}_bucket{{{label},le="{bound}"}} {count}')
+                lines.append(f'{name}_sum{{{label}}} {total:g}')
+                lines.append(f'{name}_count{{{label}}} {counts[-1]}')
+
+            lines.append(f'# HELP {name}_window {help_text} Requests up to each bucket bound '
+                         f'over the last {self.window} seconds.')
+            lines.append(f'# TYPE {name}_window gauge')
+            for view, (_, window) in families:
+                label = f'view="{_escape(view)}"'
+                for bound, count in zip(bounds, window):
+                    lines.append(f'{name}_window{{{label},le="{bound}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._requests.clear()
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bound(bound):
+    return str(int(bound)) if float(bound).is_integer() else repr(bound)
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,113 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.exceptions import MiddlewareNotUsed
+
+from Mozhi.settings import REQUEST_METRICS, SERVER_TIMING
+from .metrics import RequestStats, registry
+
+
+class RequestMetricsMiddleware:
+    """
+    Record the latency, SQL queries, filesystem probes and response size of
+    each request (see transcription/metrics.py), and send them back in a
+    Server-Timing header.
+
+    Latency is the time until the view returned its response. For a
+    streaming response the queries, probes and bytes of the body are
+    counted as it is sent and the request is recorded once it is complete;
+    its Server-Timing header only covers the view.
+    A FileResponse is left untouched so the server can still send it with
+    sendfile, and is recorded straight away with its Content-Length.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = stats.activate()
+        try:
+            response = self.get_response(request)
+        finally:
+            stats.deactivate(token)
+        return self.process(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = stats.activate()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stats.deactivate(token)
+        return self.process(request, response, stats)
+
+    def process(self, request, response, stats):
+        stats.duration = time.perf_counter() - stats.started
+        if SERVER_TIMING:
+            response['Server-Timing'] = stats.server_timing()
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else 'unmatched'
+
+        def finish():
+            registry.record(view, response.status_code, stats)
+
+        if not response.streaming:
+            stats.response_bytes = len(response.content)
+            finish()
+        elif getattr(response, 'file_to_stream', None) is not None:
+            # Replacing a FileResponse's content would drop file_to_stream and
+            # with it the server's sendfile (wsgi.file_wrapper); the file is
+            # sent as is, so its Content-Length is the body size.
+            stats.response_bytes = int(response.get('Content-Length', 0))
+            finish()
+        elif response.is_async:
+            response.streaming_content = self._astream(response.streaming_content, stats, finish)
+        else:
+            response.streaming_content = self._stream(response.streaming_content, stats, finish)
+        return response
+
+    @staticmethod
+    def _stream(content, stats, finish):
+        try:
+            iterator = iter(content)
+            while True:
+                # The body is produced after __call__ has returned, so make
+                # the stats current again while each chunk is generated.
+                token = stats.activate()
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    stats.deactivate(token)
+                stats.response_bytes += len(chunk)
+                yield chunk
+        finally:
+            finish()
+
+    @staticmethod
+    async def _astream(content, stats, finish):
+        try:
+            iterator = aiter(content)
+            while True:
+                token = stats.activate()
+                try:
+                    chunk = await anext(iterator)
+                except StopAsyncIteration:
+                    break
+                finally:
+                    stats.deactivate(token)
+                stats.response_bytes += len(chunk)
+                yield chunk
+        finally:
+            finish()
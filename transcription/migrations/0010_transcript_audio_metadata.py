@@ -0,0 +1,38 @@
+# Generated by Django 5.2.11 on 2026-10-18 04:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0009_project_total_duration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transcript',
+            name='channels',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transcript',
+            name='duration',
+            field=models.FloatField(blank=True, help_text='Audio duration in seconds', null=True),
+        ),
+        migrations.AddField(
+            model_name='transcript',
+            name='file_mtime',
+            field=models.FloatField(blank=True, help_text='Audio file modification time (Unix timestamp)', null=True),
+        ),
+        migrations.AddField(
+            model_name='transcript',
+            name='file_size',
+            field=models.BigIntegerField(blank=True, help_text='Audio file size in bytes', null=True),
+        ),
+        migrations.AddField(
+            model_name='transcript',
+            name='sample_rate',
+            field=models.IntegerField(blank=True, help_text='Sample rate in Hz', null=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.11 on 2026-10-18 04:38
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0010_transcript_audio_metadata'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('folder_name', models.CharField(max_length=50)),
+                ('folder_path', models.CharField(help_text='Base folder that contains the project folder', max_length=255)),
+                ('sample_rate', models.IntegerField(choices=[(8000, '8000 Hz'), (16000, '16000 Hz'), (22050, '22050 Hz'), (44100, '44100 Hz'), (48000, '48000 Hz')], default=44100)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], db_index=True, default='queued', max_length=16)),
+                ('processed', models.IntegerField(default=0, help_text='Manifest entries read so far')),
+                ('imported', models.IntegerField(default=0)),
+                ('missing_count', models.IntegerField(default=0)),
+                ('missing_files', models.JSONField(blank=True, default=list)),
+                ('total_duration', models.FloatField(default=0.0, help_text='Audio duration probed so far, in seconds')),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('project', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_jobs', to='transcription.project')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
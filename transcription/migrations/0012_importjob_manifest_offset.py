@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-18 04:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0011_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='manifest_offset',
+            field=models.BigIntegerField(default=0, help_text='Byte offset in details.json reached so far'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.11 on 2026-10-18 05:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0012_importjob_manifest_offset'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transcript',
+            index=models.Index(fields=['project', 'created_at', 'id'], name='transcript_project_created'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.11 on 2026-10-18 05:10
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_counters(apps, schema_editor):
+    # Missing audio needs the filesystem; `manage.py reconcile_counters` fills it in.
+    Project = apps.get_model('transcription', 'Project')
+    projects = Project.objects.using(schema_editor.connection.alias)
+    empty = Q(transcripts__transcript__isnull=True) | Q(transcripts__transcript='')
+    counts = projects.annotate(
+        total=Count('transcripts'),
+        empty_text=Count('transcripts', filter=empty),
+    ).values_list('pk', 'total', 'empty_text')
+    for pk, total, empty_text in counts:
+        projects.filter(pk=pk).update(
+            transcript_count=total,
+            transcribed_count=total - empty_text,
+            empty_text_count=empty_text,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0013_transcript_project_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='empty_text_count',
+            field=models.IntegerField(default=0, help_text='Transcripts with missing or empty text'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='missing_audio_count',
+            field=models.IntegerField(default=0, help_text='Transcripts whose audio file is not on disk'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='transcribed_count',
+            field=models.IntegerField(default=0, help_text='Transcripts with non-empty text'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='transcript_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
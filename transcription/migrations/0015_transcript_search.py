@@ -0,0 +1,83 @@
+from django.db import migrations
+
+# SQLite: an external-content FTS5 table over transcription_transcript,
+# kept in step by triggers so that every write path, bulk or not, updates
+# it in the same statement. transcription.search.SQLITE_TRIGGERS holds the
+# same triggers for reinstalling them after a table remake; this migration
+# keeps its own copy so that it never changes with the app code.
+# Combining marks (M*) and format characters such as ZWJ/ZWNJ (Cf) are
+# token characters, so Malayalam words are not split at their vowel signs,
+# viramas or chillu joiners.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE transcription_transcript_fts USING fts5(
+        transcript,
+        content='transcription_transcript',
+        content_rowid='rowid',
+        tokenize="unicode61 remove_diacritics 2 categories 'L* N* Co M* Cf'"
+    )
+    """,
+    """
+    CREATE TRIGGER transcription_transcript_fts_insert AFTER INSERT ON transcription_transcript BEGIN
+        INSERT INTO transcription_transcript_fts(rowid, transcript) VALUES (new.rowid, new.transcript);
+    END
+    """,
+    """
+    CREATE TRIGGER transcription_transcript_fts_delete AFTER DELETE ON transcription_transcript BEGIN
+        INSERT INTO transcription_transcript_fts(transcription_transcript_fts, rowid, transcript)
+        VALUES ('delete', old.rowid, old.transcript);
+    END
+    """,
+    """
+    CREATE TRIGGER transcription_transcript_fts_update AFTER UPDATE OF transcript ON transcription_transcript BEGIN
+        INSERT INTO transcription_transcript_fts(transcription_transcript_fts, rowid, transcript)
+        VALUES ('delete', old.rowid, old.transcript);
+        INSERT INTO transcription_transcript_fts(rowid, transcript) VALUES (new.rowid, new.transcript);
+    END
+    """,
+    "INSERT INTO transcription_transcript_fts(transcription_transcript_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS transcription_transcript_fts_update",
+    "DROP TRIGGER IF EXISTS transcription_transcript_fts_delete",
+    "DROP TRIGGER IF EXISTS transcription_transcript_fts_insert",
+    "DROP TABLE IF EXISTS transcription_transcript_fts",
+]
+
+# PostgreSQL: a generated tsvector column, maintained by the database on
+# every insert and update, with a GIN index. The 'simple' configuration
+# only lower-cases, which suits Malayalam as well as English.
+POSTGRESQL_FORWARD = [
+    """
+    ALTER TABLE transcription_transcript ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', coalesce(transcript, ''))) STORED
+    """,
+    "CREATE INDEX transcript_search_vector ON transcription_transcript USING GIN (search_vector)",
+]
+
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS transcript_search_vector",
+    "ALTER TABLE transcription_transcript DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0014_project_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            _run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD}),
+        ),
+    ]
@@ -1,8 +1,32 @@
+import datetime
 import uuid
 from django.db import models
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.contrib.auth.models import User
+from django.utils import timezone
+from Mozhi.settings import IMPORT_STALE_AFTER
 
 
+# Transcripts whose text is missing or empty; everything else counts as transcribed.
+EMPTY_TEXT = Q(transcript__isnull=True) | Q(transcript='')
+
+
+def counter_deltas(added=(), removed=(), missing_audio=0):
+    """
+    Return the Project counter changes for transcripts with texts `added`
+    being created and texts `removed` being deleted, as keyword arguments
+    for Project.adjust_counters. An edit is one of each. Only the
+    truthiness of each text matters.
+    """
+    added_transcribed = sum(1 for text in added if text)
+    removed_transcribed = sum(1 for text in removed if text)
+    return {
+        'transcript_count': len(added) - len(removed),
+        'transcribed_count': added_transcribed - removed_transcribed,
+        'empty_text_count': (len(added) - added_transcribed) - (len(removed) - removed_transcribed),
+        'missing_audio_count': missing_audio,
+    }
 
 
 class Project(models.Model):
@@ -20,9 +44,57 @@ class Project(models.Model):
     total_duration = models.FloatField(default=0.0, help_text="Total audio duration in seconds")
     folder_path = models.CharField(max_length=255, default='./', blank=True, null=True, help_text="Select a base folder. Subfolders for the project and audio will be created automatically.")
 
+    # Denormalized counts, kept in step with the transcripts table by every
+    # write path (see adjust_counters) and repaired by `manage.py reconcile_counters`.
+    transcript_count = models.IntegerField(default=0)
+    transcribed_count = models.IntegerField(default=0, help_text="Transcripts with non-empty text")
+    empty_text_count = models.IntegerField(default=0, help_text="Transcripts with missing or empty text")
+    missing_audio_count = models.IntegerField(default=0, help_text="Transcripts whose audio file is not on disk")
+
+    COUNTER_FIELDS = ['transcript_count', 'transcribed_count', 'empty_text_count', 'missing_audio_count']
+
     def __str__(self):
         return self.name
 
+    def adjust_counters(self, duration=0.0, **deltas):
+        """
+        Atomically add the given deltas (may be negative) to the counter
+        fields, e.g. `adjust_counters(transcript_count=1)`, and `duration`
+        seconds to total_duration, all in one UPDATE and never going below zero.
+        """
+        changes = {
+            name: Greatest(F(name) + delta, Value(0))
+            for name, delta in deltas.items() if delta
+        }
+        if duration:
+            changes['total_duration'] = Greatest(F('total_duration') + duration, Value(0.0))
+        if not changes:
+            return
+        Project.objects.filter(pk=self.pk).update(**changes)
+        self.refresh_from_db(fields=list(changes))
+
+    def count_transcripts(self):
+        """Count the project's transcripts, transcribed and not, in one query."""
+        return self.transcripts.aggregate(
+            transcript_count=Count('pk'),
+            transcribed_count=Count('pk', filter=~EMPTY_TEXT),
+            empty_text_count=Count('pk', filter=EMPTY_TEXT),
+        )
+
+    def refresh_total_duration(self):
+        """Recompute total_duration in SQL from the stored per-transcript durations."""
+        durations = (
+            Transcript.objects
+            .filter(project=OuterRef('pk'))
+            .values('project')
+            .annotate(total=Sum('duration'))
+            .values('total')
+        )
+        Project.objects.filter(pk=self.pk).update(
+            total_duration=Coalesce(Subquery(durations), Value(0.0))
+        )
+        self.refresh_from_db(fields=['total_duration'])
+
 class Transcript(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     audio_file = models.CharField(max_length=255)
@@ -34,5 +106,126 @@ class Transcript(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Audio metadata, filled from the file header at import/record time.
+    # A null duration means the file has not been probed yet.
+    duration = models.FloatField(blank=True, null=True, help_text="Audio duration in seconds")
+    sample_rate = models.IntegerField(blank=True, null=True, help_text="Sample rate in Hz")
+    channels = models.PositiveSmallIntegerField(blank=True, null=True)
+    file_size = models.BigIntegerField(blank=True, null=True, help_text="Audio file size in bytes")
+    file_mtime = models.FloatField(blank=True, null=True, help_text="Audio file modification time (Unix timestamp)")
+
+    AUDIO_METADATA_FIELDS = ['duration', 'sample_rate', 'channels', 'file_size', 'file_mtime']
+
+    class Meta:
+        indexes = [
+            # Serves the keyset-paginated listings (see transcription.pagination).
+            models.Index(fields=['project', 'created_at', 'id'], name='transcript_project_created'),
+        ]
+
+    def __str__(self):
+        return f"Transcript {self.id} for {self.project.name}"
+
+    def set_audio_info(self, info):
+        """Copy an AudioFileInfo (see transcription.audio) onto the metadata fields."""
+        self.duration = info.duration
+        self.sample_rate = info.sample_rate or None
+        self.channels = info.channels or None
+        self.file_size = info.file_size
+        self.file_mtime = info.file_mtime
+
+
+class ImportJob(models.Model):
+    """A project import queued from the UI and run by the import worker."""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    folder_name = models.CharField(max_length=50)
+    folder_path = models.CharField(max_length=255, help_text="Base folder that contains the project folder")
+    sample_rate = models.IntegerField(choices=Project.SAMPLE_RATE_CHOICES, default=44100)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True)
+    project = models.ForeignKey(Project, on_delete=models.SET_NULL, blank=True, null=True, related_name='import_jobs')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+
+    # Progress, committed together with each chunk of imported rows so a
+    # failed job can resume from its last checkpoint.
+    manifest_offset = models.BigIntegerField(default=0, help_text="Byte offset in details.json reached so far")
+    processed = models.IntegerField(default=0, help_text="Manifest entries read so far")
+    imported = models.IntegerField(default=0)
+    missing_count = models.IntegerField(default=0)
+    missing_files = models.JSONField(default=list, blank=True)
+    total_duration = models.FloatField(default=0.0, help_text="Audio duration probed so far, in seconds")
+    error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Import of {self.folder_name} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
+
+    @property
+    def is_stale(self):
+        """
+        A running job that has not checkpointed for IMPORT_STALE_AFTER
+        seconds: its process died without marking it failed.
+        """
+        cutoff = timezone.now() - datetime.timedelta(seconds=IMPORT_STALE_AFTER)
+        return self.status == self.STATUS_RUNNING and self.updated_at < cutoff
+
+    @property
+    def can_resume(self):
+        return self.project_id is not None and (self.status == self.STATUS_FAILED or self.is_stale)
+
+    def progress_message(self):
+        """Return the job state as one NDJSON message, in the shape the export stream uses."""
+        if self.status == self.STATUS_SUCCEEDED:
+            return {
+                "type": "success",
+                "message": f"Imported {self.imported} items",
+                "missing_files": self.missing_files,
+            }
+        if self.status == self.STATUS_FAILED:
+            return {"type": "error", "error": self.error}
+        return {
+            "type": "progress",
+            "status": self.status,
+            "current": self.processed,
+            "offset": self.manifest_offset,
+            "imported": self.imported,
+            "missing": self.missing_count,
+            "duration": self.total_duration,
+        }
+
+
+class Upload(models.Model):
+    """
+    A recording being uploaded in chunks. The bytes received so far live in
+    a part file next to the project's audio (see transcription.uploads);
+    finalizing turns it into a Transcript with the same id.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='uploads')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    transcript = models.TextField(blank=True, null=True)
+    size = models.BigIntegerField(blank=True, null=True, help_text="Total size in bytes announced by the client")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
     def __str__(self):
-        return f"Transcript {self.id} for {self.project.name}"
\ No newline at end of file
+        return f"Upload {self.id} to {self.project.name}"
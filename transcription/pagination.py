@@ -0,0 +1,168 @@
+"""
+Keyset pagination for transcript listings.
+
+Pages are addressed by the (created_at, id) key of a row on the
+neighbouring page rather than by page number, so every page, however
+deep, is an index range scan on (project, created_at, id) instead of an
+OFFSET over everything before it. Listings are newest first.
+
+Counting every transcript of a large project on each render is itself a
+full scan; with APPROXIMATE_COUNTS the header uses the planner's
+estimate on PostgreSQL, or a briefly cached exact count elsewhere.
+"""
+import datetime
+import json
+import uuid
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from Mozhi.settings import APPROXIMATE_COUNTS, COUNT_CACHE_TIMEOUT, PAGE_NUM
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+# Below this many estimated rows an exact count is cheap enough to run.
+EXACT_COUNT_THRESHOLD = 10000
+
+
+def encode_cursor(obj):
+    """Return the URL-safe cursor for a row: `<microseconds since epoch>.<uuid hex>`."""
+    created_at = obj.created_at
+    if timezone.is_naive(created_at):
+        created_at = timezone.make_aware(created_at, datetime.timezone.utc)
+    return f"{(created_at - _EPOCH) // _MICROSECOND}.{obj.pk.hex}"
+
+
+def decode_cursor(cursor):
+    """Return `(created_at, pk)` for a cursor, or None if it is malformed."""
+    try:
+        micros, pk = cursor.split('.')
+        return _EPOCH + int(micros) * _MICROSECOND, uuid.UUID(hex=pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+# The OR alone is only a filter over the project's whole index range; the
+# redundant bound on created_at lets the database seek straight to the key.
+def _before_key(created_at, pk):
+    return Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+
+
+def _after_key(created_at, pk):
+    return Q(created_at__gte=created_at) & (Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated listing. Iterates like a Paginator page
+    and exposes the cursors for the neighbouring pages.
+    """
+
+    def __init__(self, object_list, has_previous, has_next):
+        self.object_list = object_list
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.object_list[0]) if self.object_list else None
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.object_list[-1]) if self.object_list else None
+
+
+def keyset_page(queryset, after=None, before=None, last=False, per_page=PAGE_NUM):
+    """
+    Return a KeysetPage of `queryset`, newest first.
+
+    `after` is the cursor of the last row of the previous page, `before`
+    the cursor of the first row of the next page, and `last` asks for the
+    oldest rows. Malformed cursors are ignored and give the first page.
+    """
+    newest_first = ('-created_at', '-pk')
+    oldest_first = ('created_at', 'pk')
+
+    after = decode_cursor(after) if after else None
+    before = decode_cursor(before) if before else None
+
+    if after is not None:
+        created_at, pk = after
+        rows = list(
+            queryset.filter(_before_key(created_at, pk))
+            .order_by(*newest_first)[:per_page + 1]
+        )
+        return KeysetPage(rows[:per_page], has_previous=True, has_next=len(rows) > per_page)
+
+    if before is not None or last:
+        if before is not None:
+            created_at, pk = before
+            queryset = queryset.filter(_after_key(created_at, pk))
+        rows = list(queryset.order_by(*oldest_first)[:per_page + 1])
+        page = rows[:per_page]
+        page.reverse()
+        return KeysetPage(page, has_previous=len(rows) > per_page, has_next=before is not None)
+
+    rows = list(queryset.order_by(*newest_first)[:per_page + 1])
+    return KeysetPage(rows[:per_page], has_previous=False, has_next=len(rows) > per_page)
+
+
+def page_from_request(request, queryset, per_page=PAGE_NUM):
+    """Build the KeysetPage selected by the `after`, `before` and `last` query parameters."""
+    return keyset_page(
+        queryset,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        last=request.GET.get('last') == '1',
+        per_page=per_page,
+    )
+
+
+def _planner_estimate(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def approximate_count(queryset, cache_key):
+    """
+    Return `(count, is_exact)` for `queryset`. Without APPROXIMATE_COUNTS
+    this is a plain COUNT(*).
+    """
+    if not APPROXIMATE_COUNTS:
+        return queryset.count(), True
+
+    if connections[queryset.db].vendor == 'postgresql':
+        estimate = _planner_estimate(queryset)
+        if estimate >= EXACT_COUNT_THRESHOLD:
+            return estimate, False
+        return queryset.count(), True
+
+    count = cache.get(cache_key)
+    if count is None:
+        count = queryset.count()
+        cache.set(cache_key, count, COUNT_CACHE_TIMEOUT)
+        return count, True
+    return count, False
@@ -0,0 +1,186 @@
+"""
+Precomputed waveform peaks.
+
+The players on the project pages draw a waveform of a few hundred bars.
+Rather than having every browser download and decode each file to draw
+it, the min/max envelope is computed here once per file with NumPy,
+block by block, quantised to int8 and cached in a sidecar file next to
+the audio:
+
+    <project>/audio/.peaks/<audio_file>.peaks
+
+The sidecar header records the size and mtime of the audio it was built
+from, so re-recording or replacing a file invalidates it automatically.
+"""
+import logging
+import os
+import struct
+import uuid
+
+import numpy as np
+
+from Mozhi.settings import PEAKS_BINS
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+PEAKS_DIR = '.peaks'
+PEAKS_MAGIC = b'MZPK'
+PEAKS_VERSION = 1
+# Frames decoded at a time.
+BLOCK_FRAMES = 64 * 1024
+
+# magic, version, source size, source mtime_ns, requested bins, duration
+_HEADER = struct.Struct('<4sB3xQqId')
+
+
+class PeaksError(ValueError):
+    """Raised when an audio file cannot be decoded to compute its peaks."""
+
+
+def peaks_cache_path(audio_path: str) -> str:
+    directory, name = os.path.split(audio_path)
+    return os.path.join(directory, PEAKS_DIR, name + '.peaks')
+
+
+def _read_with_librosa(audio_path):
+    """Return `(samples, sample_rate)` with samples as int16, shape (frames, 1)."""
+    try:
+        import librosa
+        samples, sample_rate = librosa.load(audio_path, sr=None, mono=True)
+    except Exception as e:
+        raise PeaksError(f"Could not decode {audio_path}: {e}") from e
+    samples = np.clip(samples * 32767, -32768, 32767).astype(np.int16)
+    return samples[:, np.newaxis], sample_rate
+
+
+class _Envelope:
+    """The per-bin min/max of `frames` frames, fed a block of frames at a time."""
+
+    def __init__(self, frames, bins):
+        self.frames = frames
+        self.bins = min(bins, frames)
+        self.starts = (np.arange(self.bins, dtype=np.int64) * frames) // self.bins
+        self.lows = np.full(self.bins, np.iinfo(np.int16).max, dtype=np.int16)
+        self.highs = np.full(self.bins, np.iinfo(np.int16).min, dtype=np.int16)
+        self.offset = 0
+
+    def add(self, block):
+        count = min(len(block), self.frames - self.offset)
+        if count <= 0:
+            return
+        block = block[:count]
+        # The bins this block overlaps, and where each starts within it.
+        first, last = np.searchsorted(self.starts, [self.offset, self.offset + count - 1], side='right') - 1
+        cuts = np.concatenate(([0], self.starts[first + 1:last + 1] - self.offset))
+        window = slice(first, last + 1)
+        np.minimum(self.lows[window], np.minimum.reduceat(block.min(axis=1), cuts), out=self.lows[window])
+        np.maximum(self.highs[window], np.maximum.reduceat(block.max(axis=1), cuts), out=self.highs[window])
+        self.offset += count
+
+    def peaks(self):
+        # Bins a short read never reached are silent.
+        unread = self.lows > self.highs
+        self.lows[unread] = 0
+        self.highs[unread] = 0
+        peaks = np.empty(self.bins * 2, dtype=np.int8)
+        # Keep the top byte; -128 is folded to -127 so the range is symmetric.
+        peaks[0::2] = np.maximum(self.lows >> 8, -127)
+        peaks[1::2] = self.highs >> 8
+        return peaks
+
+
+def compute_peaks(audio_path: str, bins: int = PEAKS_BINS):
+    """
+    Return `(peaks, duration)` for an audio file. `peaks` is an int8 array
+    of interleaved `[min, max, min, max, ...]` pairs, one pair per bin,
+    covering every channel. Files shorter than `bins` frames get one bin
+    per frame.
+
+    The file is decoded BLOCK_FRAMES at a time, so a long recording never
+    has to fit in memory; only files soundfile cannot read are loaded
+    whole through librosa.
+    """
+    try:
+        import soundfile
+        with soundfile.SoundFile(audio_path) as f:
+            frames, sample_rate = f.frames, f.samplerate
+            if frames == 0:
+                return np.zeros(0, dtype=np.int8), 0.0
+            envelope = _Envelope(frames, bins)
+            for block in f.blocks(BLOCK_FRAMES, dtype='int16', always_2d=True):
+                envelope.add(block)
+        return envelope.peaks(), envelope.offset / sample_rate
+    except Exception as e:
+        logger.info(f"Falling back to librosa for peaks of {audio_path}: {e}")
+
+    samples, sample_rate = _read_with_librosa(audio_path)
+    frames = len(samples)
+    duration = frames / sample_rate if sample_rate else 0.0
+    if frames == 0:
+        return np.zeros(0, dtype=np.int8), duration
+    envelope = _Envelope(frames, bins)
+    envelope.add(samples)
+    return envelope.peaks(), duration
+
+
+def _load_cached(cache_path, st, bins):
+    try:
+        with open(cache_path, 'rb') as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return None
+            magic, version, size, mtime_ns, cached_bins, duration = _HEADER.unpack(header)
+            if (magic, version, size, mtime_ns) != (PEAKS_MAGIC, PEAKS_VERSION, st.st_size, st.st_mtime_ns):
+                return None
+            peaks = np.frombuffer(f.read(), dtype=np.int8)
+    except OSError:
+        return None
+    # `cached_bins` is the resolution asked for, not the number of pairs
+    # stored, which is smaller for very short files.
+    if cached_bins != bins:
+        return None
+    return peaks, duration
+
+
+def _store(cache_path, st, bins, peaks, duration):
+    tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(PEAKS_MAGIC, PEAKS_VERSION, st.st_size, st.st_mtime_ns, bins, duration))
+            f.write(peaks.tobytes())
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        # A read-only project folder only costs a recomputation next time.
+        logger.warning(f"Could not cache peaks at {cache_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def get_peaks(audio_path: str, bins: int = PEAKS_BINS, st=None):
+    """
+    Return `(peaks, duration)` for `audio_path`, from the sidecar cache if
+    it matches the file's current size and mtime, otherwise computing and
+    caching them. Raises OSError if the file does not exist and PeaksError
+    if it cannot be decoded.
+    """
+    if st is None:
+        st = metrics.stat(audio_path)
+    cache_path = peaks_cache_path(audio_path)
+
+    cached = _load_cached(cache_path, st, bins)
+    if cached is not None:
+        return cached
+
+    peaks, duration = compute_peaks(audio_path, bins)
+    _store(cache_path, st, bins, peaks, duration)
+    return peaks, duration
+
+
+def remove_peaks(audio_path: str):
+    """Delete the cached peaks of `audio_path`, if any."""
+    try:
+        os.remove(peaks_cache_path(audio_path))
+    except FileNotFoundError:
+        pass
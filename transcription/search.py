@@ -0,0 +1,153 @@
+"""
+Full-text search over transcript text.
+
+On SQLite the text is indexed by the `transcription_transcript_fts` FTS5
+table and on PostgreSQL by the generated `search_vector` column, both
+created in migration 0015 and kept current by the database itself, so
+bulk imports, recordings, edits and deletes need no extra work here.
+
+A search only narrows a transcript queryset, so results are ordered and
+keyset-paginated exactly like the listings (see transcription.pagination).
+Every word of the query must match the start of a word in the text, which
+also finds Malayalam words carrying case or verb suffixes.
+
+A migration that rebuilds the transcript table on SQLite drops the
+triggers; `migrate` notices the missing triggers afterwards and restores
+them and the index (see restore_sqlite_index). After a VACUUM, which can
+renumber the rowids the index is keyed on, run
+`manage.py rebuild_search_index`.
+"""
+import hashlib
+import unicodedata
+
+from django.db import connections, transaction
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+
+from .pagination import approximate_count
+
+SQLITE_MATCH = (
+    '"transcription_transcript"."rowid" IN ('
+    'SELECT rowid FROM transcription_transcript_fts WHERE transcription_transcript_fts MATCH %s)'
+)
+POSTGRESQL_MATCH = '"transcription_transcript"."search_vector" @@ to_tsquery(\'simple\', %s)'
+
+# The triggers keeping the SQLite index in step with every write. They live
+# on transcription_transcript itself, so SQLite drops them whenever Django
+# remakes that table to alter or add a column; install_sqlite_triggers puts
+# them back.
+SQLITE_TRIGGERS = {
+    'transcription_transcript_fts_insert': """
+    CREATE TRIGGER transcription_transcript_fts_insert AFTER INSERT ON transcription_transcript BEGIN
+        INSERT INTO transcription_transcript_fts(rowid, transcript) VALUES (new.rowid, new.transcript);
+    END
+    """,
+    'transcription_transcript_fts_delete': """
+    CREATE TRIGGER transcription_transcript_fts_delete AFTER DELETE ON transcription_transcript BEGIN
+        INSERT INTO transcription_transcript_fts(transcription_transcript_fts, rowid, transcript)
+        VALUES ('delete', old.rowid, old.transcript);
+    END
+    """,
+    'transcription_transcript_fts_update': """
+    CREATE TRIGGER transcription_transcript_fts_update AFTER UPDATE OF transcript ON transcription_transcript BEGIN
+        INSERT INTO transcription_transcript_fts(transcription_transcript_fts, rowid, transcript)
+        VALUES ('delete', old.rowid, old.transcript);
+        INSERT INTO transcription_transcript_fts(rowid, transcript) VALUES (new.rowid, new.transcript);
+    END
+    """,
+}
+
+# Letters, digits, combining marks, private use and format characters (for
+# ZWJ/ZWNJ); the same token characters as the FTS5 tokenizer.
+_WORD_CATEGORIES = ('L', 'N', 'M', 'Co', 'Cf')
+
+
+def search_terms(query):
+    """Split a search query into its words, dropping punctuation and operators."""
+    terms = []
+    word = []
+    for char in unicodedata.normalize('NFC', query):
+        category = unicodedata.category(char)
+        if category[0] in _WORD_CATEGORIES or category in _WORD_CATEGORIES:
+            word.append(char)
+        elif word:
+            terms.append(''.join(word))
+            word = []
+    if word:
+        terms.append(''.join(word))
+    return terms
+
+
+def _fts5_query(terms):
+    return ' '.join('"' + term.replace('"', '""') + '"*' for term in terms)
+
+
+def _tsquery(terms):
+    return ' & '.join("'" + term.replace("'", "''") + "':*" for term in terms)
+
+
+def drop_sqlite_triggers(cursor):
+    for name in reversed(list(SQLITE_TRIGGERS)):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def install_sqlite_triggers(cursor):
+    """(Re)create the triggers that keep the SQLite search index current."""
+    drop_sqlite_triggers(cursor)
+    for sql in SQLITE_TRIGGERS.values():
+        cursor.execute(sql)
+
+
+def restore_sqlite_index(connection):
+    """
+    Reinstall the triggers and rebuild the SQLite index if any trigger is
+    missing, as after a migration that remade the transcript table.
+    Returns True if it did.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                       "AND name = 'transcription_transcript_fts'")
+        if cursor.fetchone() is None:
+            # Migrated back to before the index existed.
+            return False
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                       "AND tbl_name = 'transcription_transcript'")
+        if set(SQLITE_TRIGGERS) <= {name for name, in cursor.fetchall()}:
+            return False
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        install_sqlite_triggers(cursor)
+        cursor.execute("INSERT INTO transcription_transcript_fts(transcription_transcript_fts) VALUES ('rebuild')")
+    return True
+
+
+def search_transcripts(queryset, query):
+    """
+    Narrow a Transcript queryset to the rows whose text contains every word
+    of `query`. A query without any words matches nothing.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        condition = RawSQL(SQLITE_MATCH, [_fts5_query(terms)], output_field=BooleanField())
+    elif vendor == 'postgresql':
+        condition = RawSQL(POSTGRESQL_MATCH, [_tsquery(terms)], output_field=BooleanField())
+    else:
+        # No index on other backends; still correct, just a scan.
+        for term in terms:
+            queryset = queryset.filter(transcript__icontains=term)
+        return queryset
+    return queryset.filter(condition)
+
+
+def count_matches(queryset, query, scope):
+    """
+    Count the results of a search for the page header, as
+    `(count, is_exact)`. `scope` tells apart searches of different
+    projects in the count cache.
+    """
+    digest = hashlib.blake2b(query.encode('utf-8'), digest_size=8).hexdigest()
+    return approximate_count(queryset, f'search_count:{scope}:{digest}')
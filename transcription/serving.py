@@ -0,0 +1,278 @@
+"""
+Serving audio files with HTTP caching and range support.
+
+Responses carry an ETag and Last-Modified built from the file's size and
+mtime, so a player that already has the file gets a 304, and honour a
+single `Range: bytes=...` request with a 206 so seeking does not
+re-download the whole file.
+
+With AUDIO_SENDFILE_MODE set, Django only authorizes the request and
+hands the transfer to the front-end server:
+
+* "x-accel-redirect" (nginx): files under SAVE_DIR are redirected to
+  AUDIO_SENDFILE_PREFIX + their path relative to SAVE_DIR, which must be
+  an `internal` location aliased to SAVE_DIR, e.g.
+
+      location /protected-audio/ {
+          internal;
+          alias /srv/mozhi/Projects/;
+      }
+
+* "x-sendfile" (Apache mod_xsendfile, lighttpd): the absolute path is
+  sent in an X-Sendfile header.
+
+Either way the server then handles ranges itself.
+
+Files are sent as stored, typed by their extension. serve_as_wav decodes
+a FLAC (or any other) file to WAV on the fly for clients that need it;
+that response has no ranges.
+
+aserve_file and aserve_as_wav do the same for the async views, with the
+file reads moved to worker threads.
+"""
+import asyncio
+import os
+import re
+from urllib.parse import quote
+
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from Mozhi.settings import AUDIO_SENDFILE_MODE, AUDIO_SENDFILE_PREFIX, SAVE_DIR
+from . import metrics
+from .transcode import TranscodeError, wav_stream
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+AUDIO_CONTENT_TYPES = {
+    '.wav': 'audio/wav',
+    '.flac': 'audio/flac',
+    '.ogg': 'audio/ogg',
+    '.opus': 'audio/ogg',
+    '.mp3': 'audio/mpeg',
+}
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def audio_content_type(path):
+    """Return the Content-Type for an audio file, from its extension."""
+    return AUDIO_CONTENT_TYPES.get(os.path.splitext(path)[1].lower(), 'application/octet-stream')
+
+
+def file_etag(st):
+    """Build a strong validator from a stat result's size and mtime."""
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """
+    Parse a `Range` header against a file of `size` bytes.
+
+    Returns `(start, end)` with `end` inclusive, `None` if the header
+    should be ignored (absent, malformed, ending before it starts or
+    several ranges, in which case the whole file is sent), or `False` if
+    it cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the last N bytes.
+        length = int(last)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        # Not a valid byte range at all (RFC 9110 14.1.1), so not a 416.
+        return None
+    if start >= size:
+        return False
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+def _if_range_matches(request, etag, mtime):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    last_modified = parse_http_date_safe(if_range)
+    return last_modified == int(mtime)
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(STREAM_CHUNK_SIZE, length))
+            if not data:
+                return
+            length -= len(data)
+            yield data
+
+
+def _sendfile_response(path, content_type):
+    if AUDIO_SENDFILE_MODE == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+        return response
+
+    relative = os.path.relpath(path, os.path.abspath(SAVE_DIR))
+    if relative.startswith(os.pardir):
+        # nginx can only reach files under SAVE_DIR; serve anything else here.
+        return None
+    response = HttpResponse(content_type=content_type)
+    response['X-Accel-Redirect'] = AUDIO_SENDFILE_PREFIX.rstrip('/') + '/' + quote(relative.replace(os.sep, '/'))
+    return response
+
+
+def _file_response(request, path, st, content_type, read_range=None):
+    """
+    Build the response for the file at `path`, whose stat result is `st`.
+    Bodies are read by `read_range(path, start, length)`; without one the
+    whole file goes out as a FileResponse, which WSGI servers can sendfile.
+    """
+    etag = file_etag(st)
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(st.st_mtime))
+    if response is None and AUDIO_SENDFILE_MODE:
+        response = _sendfile_response(os.path.abspath(path), content_type)
+
+    if response is None:
+        byte_range = None
+        if _if_range_matches(request, etag, st.st_mtime):
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), st.st_size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{st.st_size}'
+        elif byte_range is None and read_range is None:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        elif byte_range is None:
+            response = StreamingHttpResponse(read_range(path, 0, st.st_size), content_type=content_type)
+            response['Content-Length'] = str(st.st_size)
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse((read_range or _read_range)(path, start, length),
+                                             status=206, content_type=content_type)
+            response['Content-Length'] = str(length)
+            response['Content-Range'] = f'bytes {start}-{end}/{st.st_size}'
+
+    response['Accept-Ranges'] = 'bytes'
+    _set_validators(response, etag, st)
+    return response
+
+
+def _set_validators(response, etag, st):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(st.st_mtime)
+    # Re-recording replaces the file behind the same URL, so always revalidate.
+    response['Cache-Control'] = 'private, no-cache'
+
+
+def serve_file(request, path, content_type):
+    """
+    Return a response for the file at `path`, honouring conditional and
+    range requests, or a JSON 404 if it does not exist.
+    """
+    try:
+        st = metrics.stat(path)
+    except OSError:
+        return JsonResponse({'error': 'File not found'}, status=404)
+    return _file_response(request, path, st, content_type)
+
+
+def _wav_response(st, etag, response=None, length=0, chunks=()):
+    """Finish a decoded-WAV response: a 304 `response`, or a stream of `chunks`."""
+    if response is None:
+        response = StreamingHttpResponse(chunks, content_type='audio/wav')
+        response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'none'
+    _set_validators(response, etag, st)
+    return response
+
+
+def serve_as_wav(request, path):
+    """
+    Return the audio file at `path` decoded to PCM WAV, honouring
+    conditional requests, or a JSON 404 if it does not exist.
+    """
+    try:
+        st = metrics.stat(path)
+    except OSError:
+        return JsonResponse({'error': 'File not found'}, status=404)
+
+    etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}-wav"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(st.st_mtime))
+    if response is not None:
+        return _wav_response(st, etag, response)
+    try:
+        length, chunks = wav_stream(path)
+    except TranscodeError as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    return _wav_response(st, etag, length=length, chunks=chunks)
+
+
+# Async versions for the ASGI views. Every filesystem call runs in a worker
+# thread, so a slow client holds a coroutine rather than a server thread.
+
+async def _aread_range(path, start, length):
+    f = await asyncio.to_thread(open, path, 'rb')
+    try:
+        await asyncio.to_thread(f.seek, start)
+        while length > 0:
+            data = await asyncio.to_thread(f.read, min(STREAM_CHUNK_SIZE, length))
+            if not data:
+                return
+            length -= len(data)
+            yield data
+    finally:
+        f.close()
+
+
+async def aiterate_in_thread(iterator):
+    """Run a blocking iterator one step at a time in a worker thread."""
+    done = object()
+    try:
+        while (item := await asyncio.to_thread(next, iterator, done)) is not done:
+            yield item
+    finally:
+        if hasattr(iterator, 'close'):
+            iterator.close()
+
+
+async def aserve_file(request, path, content_type):
+    """Async serve_file."""
+    try:
+        st = await asyncio.to_thread(metrics.stat, path)
+    except OSError:
+        return JsonResponse({'error': 'File not found'}, status=404)
+    return _file_response(request, path, st, content_type, read_range=_aread_range)
+
+
+async def aserve_as_wav(request, path):
+    """Async serve_as_wav."""
+    try:
+        st = await asyncio.to_thread(metrics.stat, path)
+    except OSError:
+        return JsonResponse({'error': 'File not found'}, status=404)
+
+    etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}-wav"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(st.st_mtime))
+    if response is not None:
+        return _wav_response(st, etag, response)
+    try:
+        length, chunks = await asyncio.to_thread(wav_stream, path)
+    except TranscodeError as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    return _wav_response(st, etag, length=length, chunks=aiterate_in_thread(chunks))
@@ -1,7 +1,46 @@
 
+// ── Waveform peaks ────────────────────────────────────────────────────
+// audio_peaks returns base64 int8 [min, max] pairs; turn them into bar heights.
+function fetchPeaks(peaksUrl) {
+    return fetch(peaksUrl)
+        .then(r => {
+            if (!r.ok) throw Object.assign(new Error(`HTTP ${r.status}`), { httpStatus: r.status });
+            return r.json();
+        })
+        .then(data => {
+            const pairs = new Int8Array(Uint8Array.from(atob(data.peaks), c => c.charCodeAt(0)).buffer);
+            const peaks = [];
+            for (let i = 0; i < pairs.length; i += 2) peaks.push(Math.max(-pairs[i], pairs[i + 1]) / 127);
+            return { peaks: normalisePeaks(peaks), duration: data.duration };
+        });
+}
+
+// Decode audio in the browser and build peak data (used for unsaved recordings).
+function decodePeaks(src) {
+    return fetch(src)
+        .then(r => r.arrayBuffer())
+        .then(buf => new (window.AudioContext || window.webkitAudioContext)().decodeAudioData(buf))
+        .then(decoded => {
+            const raw = decoded.getChannelData(0);
+            const samples = 800; // resolution
+            const chunk = Math.floor(raw.length / samples);
+            const peaks = Array.from({ length: samples }, (_, i) => {
+                let max = 0;
+                for (let j = 0; j < chunk; j++) max = Math.max(max, Math.abs(raw[i * chunk + j]));
+                return max;
+            });
+            return { peaks: normalisePeaks(peaks), duration: decoded.duration };
+        });
+}
+
+function normalisePeaks(peaks) {
+    const maxPeak = Math.max(...peaks, 0.001);
+    return peaks.map(p => p / maxPeak);
+}
+
 // ── Canvas Fallback Player ────────────────────────────────────────────
-// Uses Web Audio API (decodeAudioData) + HTMLAudioElement — zero CDN.
-function initFallbackPlayer(id, src) {
+// Draws precomputed peaks on a canvas + HTMLAudioElement — zero CDN.
+function initFallbackPlayer(id, src, peaksUrl) {
     const wrapper = document.getElementById('waveform-' + id);
     const playBtn = document.querySelector('.play-pause-btn[data-id="' + id + '"]');
     const currentEl = document.getElementById('current-' + id);
@@ -53,33 +92,21 @@ function initFallbackPlayer(id, src) {
         }
     }
 
-    // Decode audio and build peak data
-    fetch(src)
-        .then(r => r.arrayBuffer())
-        .then(buf => new (window.AudioContext || window.webkitAudioContext)().decodeAudioData(buf))
-        .then(decoded => {
-            duration = decoded.duration;
+    // Server-side peaks are a few KB; only a fresh recording (no peaksUrl)
+    // is decoded here.
+    (peaksUrl ? fetchPeaks(peaksUrl) : decodePeaks(src))
+        .then(result => {
+            peaks = result.peaks;
+            duration = result.duration;
             totalEl.textContent = formatTime(duration);
-
-            const raw = decoded.getChannelData(0);
-            const samples = 800; // resolution
-            const chunk = Math.floor(raw.length / samples);
-            peaks = Array.from({ length: samples }, (_, i) => {
-                let max = 0;
-                for (let j = 0; j < chunk; j++) max = Math.max(max, Math.abs(raw[i * chunk + j]));
-                return max;
-            });
-
-            // Normalise
-            const maxPeak = Math.max(...peaks, 0.001);
-            peaks = peaks.map(p => p / maxPeak);
-
             drawWaveform(0);
         })
         .catch(() => drawWaveform(0));
 
-    // HTMLAudioElement for playback
-    const audio = new Audio(src);
+    // HTMLAudioElement for playback; nothing is downloaded until play is pressed.
+    const audio = new Audio();
+    audio.preload = 'none';
+    audio.src = src;
     let rafId = null;
     const syncIcons = wirePlayPause(playBtn, () => !audio.paused, () => audio.paused ? audio.play() : audio.pause());
 
@@ -106,37 +133,91 @@ function initFallbackPlayer(id, src) {
     });
 
     // Redraw on resize
-    window.addEventListener('resize', () => drawWaveform(duration ? audio.currentTime / duration : 0));
+    const onResize = () => drawWaveform(duration ? audio.currentTime / duration : 0);
+    window.addEventListener('resize', onResize);
+
+    return {
+        isPlaying: () => !audio.paused,
+        // Stop playback and drop the canvas, the peaks and any buffered audio.
+        destroy() {
+            cancelAnimationFrame(rafId);
+            audio.pause();
+            audio.removeAttribute('src');
+            audio.load();
+            peaks = [];
+            window.removeEventListener('resize', onResize);
+            syncIcons.unwire();
+            wrapper.innerHTML = '';
+            currentEl.textContent = '0:00';
+        },
+    };
 }
 
 // ── WaveSurfer Player ─────────────────────────────────────────────────
-function initWaveSurferPlayer(id, src) {
+function initWaveSurferPlayer(id, src, peaksUrl) {
     const container = document.getElementById('waveform-' + id);
     const playBtn = document.querySelector('.play-pause-btn[data-id="' + id + '"]');
     const currentEl = document.getElementById('current-' + id);
     const totalEl = document.getElementById('total-' + id);
-    const syncIcons = wirePlayPause(playBtn, null, () => ws.playPause());
-
-    const ws = WaveSurfer.create({
-        container: container,
-        waveColor: '#b0bec5',
-        progressColor: '#1a1a2e',
-        cursorColor: '#139b06',
-        cursorWidth: 2,
-        height: 64,
-        barWidth: 2,
-        barGap: 1.5,
-        barRadius: 2,
-        normalize: true,
-        url: src,
-    });
+    let ws = null;
+    let media = null;
+    let destroyed = false;
+    const syncIcons = wirePlayPause(playBtn, null, () => ws && ws.playPause());
+
+    function create(extra) {
+        if (destroyed) return;
+        ws = WaveSurfer.create({
+            container: container,
+            waveColor: '#b0bec5',
+            progressColor: '#1a1a2e',
+            cursorColor: '#139b06',
+            cursorWidth: 2,
+            height: 64,
+            barWidth: 2,
+            barGap: 1.5,
+            barRadius: 2,
+            normalize: true,
+            url: src,
+            ...extra,
+        });
+
+        ws.on('ready', () => totalEl.textContent = formatTime(ws.getDuration()));
+        ws.on('audioprocess', () => currentEl.textContent = formatTime(ws.getCurrentTime()));
+        ws.on('seeking', () => currentEl.textContent = formatTime(ws.getCurrentTime()));
+        ws.on('play', () => syncIcons(true));
+        ws.on('pause', () => syncIcons(false));
+        ws.on('finish', () => syncIcons(false));
+    }
 
-    ws.on('ready', () => totalEl.textContent = formatTime(ws.getDuration()));
-    ws.on('audioprocess', () => currentEl.textContent = formatTime(ws.getCurrentTime()));
-    ws.on('seeking', () => currentEl.textContent = formatTime(ws.getCurrentTime()));
-    ws.on('play', () => syncIcons(true));
-    ws.on('pause', () => syncIcons(false));
-    ws.on('finish', () => syncIcons(false));
+    // With peaks and a duration WaveSurfer skips decoding, and a media
+    // element with preload="none" only downloads the audio on play.
+    if (!peaksUrl) {
+        create({});
+    } else {
+        fetchPeaks(peaksUrl)
+            .then(({ peaks, duration }) => {
+                media = new Audio();
+                media.preload = 'none';
+                create({ media: media, peaks: [peaks], duration: duration });
+            })
+            .catch(() => create({}));
+    }
+
+    return {
+        isPlaying: () => !!ws && ws.isPlaying(),
+        // Tear down WaveSurfer's canvases and decoded audio.
+        destroy() {
+            destroyed = true;
+            if (ws) ws.destroy();
+            if (media) {
+                media.removeAttribute('src');
+                media.load();
+            }
+            ws = media = null;
+            syncIcons.unwire();
+            currentEl.textContent = '0:00';
+        },
+    };
 }
 
 // ── Init all players ──────────────────────────────────────────────────
@@ -294,6 +375,7 @@ let targetSampleRate = window.sampleRate;
 let timerInterval;
 let startTime;
 let isRecording = false;
+let recordedSamples = null;
 
 recordBtn.onclick = () => {
     recordingModal.style.display = 'block';
@@ -390,6 +472,7 @@ recordCircleBtn.onclick = async () => {
             finalSamples = resample(samples, hardwareSampleRate, targetSampleRate);
         }
 
+        recordedSamples = finalSamples;
         const wavBuffer = encodeWav(finalSamples, targetSampleRate);
         const audioBlob = new Blob([wavBuffer], { type: 'audio/wav' });
         const blobUrl = URL.createObjectURL(audioBlob);
@@ -461,6 +544,65 @@ function writeString(view, offset, string) {
     }
 }
 
+// Upload a recording in chunks, resuming from the server's offset after a
+// failed chunk instead of starting the whole file again.
+async function uploadRecording(blob, transcript) {
+    const formData = new FormData();
+    formData.append('project_id', window.projectId);
+    formData.append('transcript', transcript);
+    formData.append('size', blob.size);
+    formData.append('csrfmiddlewaretoken', window.csrfToken);
+
+    const started = await fetch(window.startUploadUrl, { method: 'POST', body: formData }).then(r => r.json());
+    if (started.status !== 'success') {
+        return started;
+    }
+
+    const chunkUrl = window.uploadChunkUrlTemplate.replace('00000000-0000-0000-0000-000000000000', started.upload_id);
+    const finishUrl = window.finishUploadUrlTemplate.replace('00000000-0000-0000-0000-000000000000', started.upload_id);
+    const headers = { 'X-CSRFToken': window.csrfToken };
+    let offset = 0;
+    let failures = 0;
+
+    while (offset < blob.size) {
+        saveRecordBtn.textContent = `Saving... ${Math.floor(offset * 100 / blob.size)}%`;
+        try {
+            const response = await fetch(chunkUrl, {
+                method: 'PUT',
+                headers: { ...headers, 'Upload-Offset': String(offset) },
+                body: blob.slice(offset, offset + started.chunk_size)
+            });
+            const data = await response.json();
+            if (data.status === 'success' || response.status === 409) {
+                offset = data.offset;
+                failures = 0;
+                continue;
+            }
+            if (response.status < 500) {
+                return data;
+            }
+        } catch (err) {
+            console.warn("Chunk upload failed, retrying:", err);
+        }
+
+        if (++failures > 5) {
+            return { status: 'error', error: 'Upload keeps failing; check your connection and save again.' };
+        }
+        await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+        // Ask where to resume: the failed chunk may have partly arrived.
+        try {
+            const data = await fetch(chunkUrl, { headers }).then(r => r.json());
+            if (data.status === 'success') {
+                offset = data.offset;
+            }
+        } catch (err) {
+            console.warn("Could not fetch upload offset:", err);
+        }
+    }
+
+    return fetch(finishUrl, { method: 'POST', headers }).then(r => r.json());
+}
+
 saveRecordBtn.onclick = async () => {
     if (!recordedTranscript.value.trim()) {
         alert("Please enter a transcript.");
@@ -470,20 +612,13 @@ saveRecordBtn.onclick = async () => {
     saveRecordBtn.disabled = true;
     saveRecordBtn.textContent = "Saving...";
 
-    const audioBlob = await fetch(audioPlayback.src).then(r => r.blob());
-
-    const formData = new FormData();
-    formData.append('audio', audioBlob, 'record.wav');
-    formData.append('transcript', recordedTranscript.value);
-    formData.append('project_id', window.projectId);
-    formData.append('csrfmiddlewaretoken', window.csrfToken);
+    // The preview plays the WAV; FLAC halves what is uploaded and stored.
+    const audioBlob = window.uploadFormat === 'flac'
+        ? new Blob([encodeFlac(recordedSamples, targetSampleRate)], { type: 'audio/flac' })
+        : await fetch(audioPlayback.src).then(r => r.blob());
 
     try {
-        const response = await fetch(window.saveRecordUrl, {
-            method: 'POST',
-            body: formData
-        });
-        const data = await response.json();
+        const data = await uploadRecording(audioBlob, recordedTranscript.value);
 
         if (data.status === 'success') {
             location.reload();
@@ -519,14 +654,53 @@ function wirePlayPause(playBtn, isPlayingFn, toggleFn) {
     const iconPlay = playBtn.querySelector('.icon-play');
     const iconPause = playBtn.querySelector('.icon-pause');
     playBtn.addEventListener('click', toggleFn);
-    return function syncIcons(playing) {
+    function syncIcons(playing) {
         iconPlay.style.display = playing ? 'none' : 'block';
         iconPause.style.display = playing ? 'block' : 'none';
+    }
+    // Detach the button again when the player is destroyed.
+    syncIcons.unwire = () => {
+        playBtn.removeEventListener('click', toggleFn);
+        syncIcons(false);
     };
+    return syncIcons;
 }
 
-document.querySelectorAll('.audio-src').forEach(function (el) {
+// Players are only built when their row comes near the viewport, and are
+// torn down again once it scrolls away (unless still playing), so a page
+// of hundreds of clips only ever holds the players and audio in view.
+const players = new Map();
+
+function createPlayer(el) {
     const id = el.dataset.id;
     const src = el.dataset.src;
-    useWaveSurfer ? initWaveSurferPlayer(id, src) : initFallbackPlayer(id, src);
-});
\ No newline at end of file
+    const peaksUrl = el.dataset.peaks;
+    return useWaveSurfer ? initWaveSurferPlayer(id, src, peaksUrl) : initFallbackPlayer(id, src, peaksUrl);
+}
+
+if ('IntersectionObserver' in window) {
+    const sources = new Map();
+    const observer = new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+            const el = sources.get(entry.target);
+            const player = players.get(el.dataset.id);
+            if (entry.isIntersecting) {
+                if (!player) players.set(el.dataset.id, createPlayer(el));
+            } else if (player && !player.isPlaying()) {
+                player.destroy();
+                players.delete(el.dataset.id);
+            }
+        });
+    }, { rootMargin: '400px 0px' });
+
+    document.querySelectorAll('.audio-src').forEach(function (el) {
+        // The .audio-src span itself is hidden, so watch the visible player.
+        const playerEl = document.getElementById('player-' + el.dataset.id);
+        sources.set(playerEl, el);
+        observer.observe(playerEl);
+    });
+} else {
+    document.querySelectorAll('.audio-src').forEach(function (el) {
+        players.set(el.dataset.id, createPlayer(el));
+    });
+}
\ No newline at end of file
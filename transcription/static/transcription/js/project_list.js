@@ -81,6 +81,47 @@ confirmDeleteBtn.onclick = async () => {
 };
 
 
+// Re-sync a project from the details.json in its folder
+document.querySelectorAll('.sync-project-btn').forEach(btn => {
+    btn.addEventListener('click', async (e) => {
+        e.preventDefault();
+        e.stopPropagation();
+
+        const name = btn.getAttribute('data-name');
+        if (!confirm(`Sync "${name}" with its details.json? Transcripts missing from the file will be deleted.`)) return;
+
+        btn.disabled = true;
+        btn.textContent = 'Syncing...';
+
+        const formData = new FormData();
+        formData.append('csrfmiddlewaretoken', window.csrfToken);
+
+        try {
+            const response = await fetch(`/projects/${btn.getAttribute('data-id')}/sync/`, {
+                method: 'POST',
+                body: formData
+            });
+            const data = await response.json();
+
+            if (data.status === 'success') {
+                let message = `${data.message} (${data.unchanged} unchanged).`;
+                if (data.missing_files.length > 0) {
+                    message += `\n${data.missing_files.length} entries were skipped:\n` + data.missing_files.slice(0, 20).join('\n');
+                }
+                alert(message);
+                location.reload();
+            } else {
+                alert('Error: ' + data.error);
+            }
+        } catch (err) {
+            alert('Failed to sync project.');
+        } finally {
+            btn.disabled = false;
+            btn.textContent = 'Sync';
+        }
+    });
+});
+
 // Add to Modal Logic
 if (openImportModalBtn) {
     openImportModalBtn.onclick = () => {
@@ -108,6 +149,99 @@ const importStatusText = document.getElementById('importStatusText');
 const importProgressBar = document.getElementById('importProgressBar');
 const closeImportModalBtn = document.getElementById('closeImportModalBtn');
 
+function showImportResult(missingFiles) {
+    importProgressBar.style.width = '100%';
+
+    if (missingFiles && missingFiles.length > 0) {
+        importStatusText.textContent = `Import Complete! However, ${missingFiles.length} audio files were missing.`;
+        importStatusText.style.color = '#c0392b';
+
+        const logContainer = document.createElement('div');
+        logContainer.style.marginTop = '15px';
+        logContainer.style.textAlign = 'center';
+
+        const downloadBtn = document.createElement('button');
+        downloadBtn.className = 'btn btn-secondary';
+        downloadBtn.textContent = 'Download Error Log';
+        downloadBtn.onclick = () => {
+            const blob = new Blob([missingFiles.join('\n')], { type: 'text/plain' });
+            const url = URL.createObjectURL(blob);
+            const a = document.createElement('a');
+            a.href = url;
+            a.download = `import_errors_${Date.now()}.txt`;
+            a.click();
+            URL.revokeObjectURL(url);
+        };
+
+        logContainer.appendChild(downloadBtn);
+        importStatusText.parentNode.insertBefore(logContainer, importStatusText.nextSibling);
+
+        closeImportModalBtn.style.display = 'block';
+        closeImportModalBtn.onclick = () => location.reload();
+    } else {
+        importProgressBar.classList.add('success');
+        importStatusText.textContent = "Import Complete!";
+        closeImportModalBtn.style.display = 'block';
+        setTimeout(() => location.reload(), 1000);
+    }
+}
+
+const IMPORT_STATUS_POLL_MS = 2000;
+
+// Show one import job message; returns it once the job has finished.
+function handleImportMessage(msg) {
+    if (msg.type === 'progress') {
+        importStatusText.textContent = msg.status === 'queued'
+            ? "Waiting for the import worker..."
+            : `Processed ${msg.current} entries (${msg.missing} missing)...`;
+    }
+    return msg.type === 'success' || msg.type === 'error' ? msg : null;
+}
+
+function importResult(msg) {
+    if (msg.type === 'error') throw new Error(msg.error || "Import failed");
+    return msg;
+}
+
+// Follow a queued import job's NDJSON progress stream. The server closes
+// the stream after a while (and a proxy may drop it), so once it ends
+// without a result the job is polled through its status URL instead.
+async function followImportJob(progressUrl, statusUrl) {
+    try {
+        const response = await fetch(progressUrl);
+        if (!response.ok) throw new Error(`Server error: ${response.status}`);
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                const final = handleImportMessage(JSON.parse(line));
+                if (final) return importResult(final);
+            }
+        }
+    } catch (error) {
+        if (!statusUrl) throw error;
+    }
+
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, IMPORT_STATUS_POLL_MS));
+        const response = await fetch(statusUrl);
+        if (!response.ok) throw new Error(`Server error: ${response.status}`);
+        const final = handleImportMessage(await response.json());
+        if (final) return importResult(final);
+    }
+}
+
 if (importProjectForm) {
     importProjectForm.onsubmit = async (e) => {
         e.preventDefault();
@@ -138,41 +272,11 @@ if (importProjectForm) {
 
             const result = await response.json();
 
-            if (response.ok && result.status === 'success') {
-                importProgressBar.style.width = '100%';
-
-                if (result.missing_files && result.missing_files.length > 0) {
-                    importStatusText.textContent = `Import Complete! However, ${result.missing_files.length} audio files were missing.`;
-                    importStatusText.style.color = '#c0392b';
-
-                    const logContainer = document.createElement('div');
-                    logContainer.style.marginTop = '15px';
-                    logContainer.style.textAlign = 'center';
-
-                    const downloadBtn = document.createElement('button');
-                    downloadBtn.className = 'btn btn-secondary';
-                    downloadBtn.textContent = 'Download Error Log';
-                    downloadBtn.onclick = () => {
-                        const blob = new Blob([result.missing_files.join('\n')], { type: 'text/plain' });
-                        const url = URL.createObjectURL(blob);
-                        const a = document.createElement('a');
-                        a.href = url;
-                        a.download = `import_errors_${Date.now()}.txt`;
-                        a.click();
-                        URL.revokeObjectURL(url);
-                    };
-
-                    logContainer.appendChild(downloadBtn);
-                    importStatusText.parentNode.insertBefore(logContainer, importStatusText.nextSibling);
-
-                    closeImportModalBtn.style.display = 'block';
-                    closeImportModalBtn.onclick = () => location.reload();
-                } else {
-                    importProgressBar.classList.add('success');
-                    importStatusText.textContent = "Import Complete!";
-                    closeImportModalBtn.style.display = 'block';
-                    setTimeout(() => location.reload(), 1000);
-                }
+            if (response.ok && result.status === 'queued') {
+                const final = await followImportJob(result.progress_url, result.status_url);
+                showImportResult(final.missing_files);
+            } else if (response.ok && result.status === 'success') {
+                showImportResult(result.missing_files);
             } else {
                 throw new Error(result.error || "Import failed");
             }
@@ -185,4 +289,4 @@ if (importProjectForm) {
             importProgressBar.classList.add('error');
         }
     };
-}
\ No newline at end of file
+}
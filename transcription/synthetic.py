@@ -0,0 +1,121 @@
+"""
+Synthetic projects for benchmarks and load tests.
+
+generate_dataset writes a project folder the way import_project expects
+it: `audio/` with one WAV file per row and a `details.json` manifest
+(JSON array or JSONL) whose texts are random Malayalam and English words.
+The manifest can also be written with the json5 quirks and non-breaking
+spaces seen in hand-edited manifests, to exercise the slow parsing path.
+
+Every recording holds the same tone, so its bytes are built once; with
+`link_audio` the files are hard links to the first one, which makes a
+million-row project cheap in disk space and time.
+"""
+import io
+import json
+import math
+import os
+import random
+import struct
+import wave
+from typing import NamedTuple
+
+from .manifest import NBSP
+
+WORDS = [
+    'മലയാളം', 'വാക്യം', 'ശബ്ദം', 'പുസ്തകം', 'വീട്', 'മഴ', 'കടൽ', 'നദി', 'പൂവ്', 'ആകാശം',
+    'ഇന്ന്', 'നാളെ', 'ഒന്ന്', 'രണ്ട്', 'മൂന്ന്', 'കുട്ടി', 'അമ്മ', 'വെള്ളം', 'ചോറ്', 'സ്കൂൾ',
+    'the', 'record', 'speech', 'model', 'data', 'audio', 'test', 'river', 'rain', 'book',
+]
+
+
+class DatasetInfo(NamedTuple):
+    directory: str
+    manifest_path: str
+    rows: int
+    manifest_bytes: int
+    audio_bytes: int
+
+
+def tone_wav(seconds, sample_rate):
+    """Return a 16-bit mono WAV file of a quiet 440 Hz tone, as bytes."""
+    frames = int(seconds * sample_rate)
+    step = 2 * math.pi * 440 / sample_rate
+    samples = struct.pack(f'<{frames}h', *(int(3000 * math.sin(i * step)) for i in range(frames)))
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(samples)
+    return buffer.getvalue()
+
+
+def random_text(rng, nbsp=False):
+    """A sentence of 3-12 random words, some joined by NBSPs if `nbsp`."""
+    words = rng.choices(WORDS, k=rng.randint(3, 12))
+    if not nbsp:
+        return ' '.join(words)
+    return ''.join(word + (NBSP if rng.random() < 0.3 else ' ') for word in words).rstrip()
+
+
+def _json5_entry(entry):
+    """`entry` as json5: unquoted keys, single-quoted strings and a trailing comma."""
+    fields = []
+    for key, value in entry.items():
+        if isinstance(value, str):
+            value = "'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'"
+        fields.append(f'{key}: {value}')
+    return '{' + ', '.join(fields) + ',}'
+
+
+def generate_dataset(directory, rows, seconds=1.0, sample_rate=16000, jsonl=False,
+                     json5_quirks=False, nbsp=False, link_audio=False, seed=0):
+    """
+    Write a synthetic project of `rows` recordings of `seconds` each into
+    `directory` (created if needed). With `json5_quirks`, every tenth
+    manifest entry is written as json5 and comments are sprinkled between
+    entries; with `nbsp`, some words are separated by NBSPs.
+    Returns a DatasetInfo.
+    """
+    rng = random.Random(seed)
+    audio_dir = os.path.join(directory, 'audio')
+    os.makedirs(audio_dir, exist_ok=True)
+    audio = tone_wav(seconds, sample_rate)
+    duration = int(seconds * sample_rate) / sample_rate
+    width = len(str(max(rows - 1, 0)))
+    first_path = None
+    audio_bytes = 0
+
+    manifest_path = os.path.join(directory, 'details.json')
+    with open(manifest_path, 'w', encoding='utf-8') as manifest:
+        if not jsonl:
+            manifest.write('[\n')
+        for i in range(rows):
+            name = f'{i:0{width}d}.wav'
+            path = os.path.join(audio_dir, name)
+            if link_audio and first_path is not None:
+                os.link(first_path, path)
+            else:
+                with open(path, 'wb') as f:
+                    f.write(audio)
+                audio_bytes += len(audio)
+                first_path = path
+
+            entry = {'audio_filepath': f'audio/{name}', 'text': random_text(rng, nbsp), 'duration': duration}
+            if json5_quirks and i % 10 == 0:
+                line = _json5_entry(entry)
+            else:
+                line = json.dumps(entry, ensure_ascii=False)
+            if json5_quirks and i % 100 == 50:
+                manifest.write(f'// entry {i}\n')
+            if jsonl:
+                manifest.write(line + '\n')
+            else:
+                # json5 also allows a comma after the last entry.
+                last = i == rows - 1 and not json5_quirks
+                manifest.write('    ' + line + ('\n' if last else ',\n'))
+        if not jsonl:
+            manifest.write(']\n')
+
+    return DatasetInfo(directory, manifest_path, rows, os.path.getsize(manifest_path), audio_bytes)
@@ -1,21 +1,36 @@
 import os
 import shutil
+import struct
 import tempfile
-from django.test import TestCase, Client, override_settings
+import wave
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, Client, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth.models import User
-from .models import Project, Transcript
+from .models import Project, Transcript, ImportJob, Upload
+from .audio import AudioFormatError, parse_audio_header, read_audio_metadata
+from .manifest import iter_objects_from_file, iter_objects_parallel
+from . import audio_index, peaks
 from django.conf import settings
 
 # Create a temporary directory for media files during tests
 TEST_MEDIA_ROOT = tempfile.mkdtemp()
 
+
+def write_wav(path, seconds, sample_rate=16000):
+    """Write a silent 16-bit mono WAV file of the given length."""
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(b'\x00\x00' * int(seconds * sample_rate))
+
 @override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
 class TranscriptionTests(TestCase):
     def setUp(self):
         self.client = Client()
         self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.force_login(self.user)
         self.project = Project.objects.create(
             name="TestProject",
             sample_rate=16000,
@@ -129,6 +144,232 @@ class TranscriptionTests(TestCase):
         self.assertEqual(response['Content-Type'], 'audio/wav')
         self.assertEqual(b"".join(response.streaming_content), b"test audio data")
 
+    def _write_served_audio(self, data):
+        audio_dir = os.path.join(self.project.folder_path, self.project.name, 'audio')
+        os.makedirs(audio_dir, exist_ok=True)
+        with open(os.path.join(audio_dir, self.transcript.audio_file), 'wb') as f:
+            f.write(data)
+        return reverse('serve_audio', args=[self.transcript.id])
+
+    def test_serve_audio_range_requests(self):
+        url = self._write_served_audio(b"0123456789")
+
+        response = self.client.get(url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(response['Content-Length'], '4')
+        self.assertEqual(b"".join(response.streaming_content), b"2345")
+
+        response = self.client.get(url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b"".join(response.streaming_content), b"789")
+
+        response = self.client.get(url, HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+        # A range ending before it starts is invalid, not unsatisfiable.
+        response = self.client.get(url, HTTP_RANGE='bytes=5-3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+
+        # A stale If-Range falls back to the whole file.
+        response = self.client.get(url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_serve_audio_conditional_get(self):
+        url = self._write_served_audio(b"0123456789")
+        response = self.client.get(url)
+        etag = response['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Re-recording changes the size/mtime and so the validator.
+        self._write_served_audio(b"a longer recording")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_serve_audio_sendfile_modes(self):
+        from unittest.mock import patch
+        url = self._write_served_audio(b"0123456789")
+        audio_path = os.path.join(self.project.folder_path, self.project.name, 'audio', self.transcript.audio_file)
+
+        with patch('transcription.serving.AUDIO_SENDFILE_MODE', 'x-accel-redirect'), \
+                patch('transcription.serving.SAVE_DIR', TEST_MEDIA_ROOT):
+            response = self.client.get(url)
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            f'/protected-audio/{self.project.name}/audio/{self.transcript.audio_file}',
+        )
+        self.assertEqual(response.content, b"")
+
+        with patch('transcription.serving.AUDIO_SENDFILE_MODE', 'x-sendfile'):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Sendfile'], os.path.abspath(audio_path))
+
+    def test_request_metrics(self):
+        from .metrics import registry
+        registry.clear()
+        url = self._write_served_audio(b"0123456789")
+
+        response = self.client.get(reverse('project_detail', args=[self.project.id]))
+        timing = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        self.assertRegex(timing['db'], r'^dur=[\d.]+;desc="[1-9]\d* queries"$')
+        self.assertIn('total', timing)
+
+        # The stat of a streamed file is counted; its size once the body has been read.
+        response = self.client.get(url)
+        self.assertIn('desc="1 probes"', response['Server-Timing'])
+        b"".join(response.streaming_content)
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        text = response.content.decode()
+        self.assertIn('mozhi_requests_total{view="project_detail",code="200"} 1', text)
+        self.assertIn('mozhi_request_fs_probes_bucket{view="serve_audio",le="0"} 0', text)
+        self.assertIn('mozhi_request_fs_probes_bucket{view="serve_audio",le="1"} 1', text)
+        self.assertIn('mozhi_response_bytes_sum{view="serve_audio"} 10', text)
+        self.assertIn('# TYPE mozhi_request_sql_seconds histogram', text)
+
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 302)
+
+    def test_request_metrics_keep_file_responses_sendable(self):
+        from django.http import FileResponse
+        from django.test import RequestFactory
+        from .metrics import registry
+        from .middleware import RequestMetricsMiddleware
+        registry.clear()
+        path = os.path.join(TEST_MEDIA_ROOT, 'sendfile.wav')
+        with open(path, 'wb') as f:
+            f.write(b"0123456789")
+
+        response = RequestMetricsMiddleware(lambda request: FileResponse(open(path, 'rb')))(RequestFactory().get('/'))
+        try:
+            # The server's wsgi.file_wrapper needs the file object.
+            self.assertIsNotNone(response.file_to_stream)
+        finally:
+            response.close()
+        self.assertIn('mozhi_response_bytes_sum{view="unmatched"} 10', registry.render_prometheus())
+
+    def test_audio_peaks_view(self):
+        import base64
+        audio_dir = os.path.join(self.project.folder_path, self.project.name, 'audio')
+        os.makedirs(audio_dir, exist_ok=True)
+        write_wav(os.path.join(audio_dir, self.transcript.audio_file), seconds=2)
+        url = reverse('audio_peaks', args=[self.transcript.id])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertAlmostEqual(data['duration'], 2.0)
+        self.assertEqual(data['bins'], settings.PEAKS_BINS)
+        self.assertEqual(len(base64.b64decode(data['peaks'])), 2 * settings.PEAKS_BINS)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.post(reverse('delete_transcript', args=[self.transcript.id]), {'delete_files': 'true'})
+        self.assertFalse(os.path.exists(os.path.join(audio_dir, '.peaks', self.transcript.audio_file + '.peaks')))
+
+    def test_project_detail_keyset_pagination(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .pagination import keyset_page
+        self.transcript.delete()
+        now = timezone.now()
+        # Two rows share each timestamp so the id tie-break is exercised.
+        for i in range(7):
+            t = Transcript.objects.create(project=self.project, user=self.user, audio_file=f'{i}.wav')
+            Transcript.objects.filter(pk=t.pk).update(created_at=now - timedelta(seconds=i // 2))
+        expected = list(self.project.transcripts.order_by('-created_at', '-pk'))
+        queryset = self.project.transcripts.all()
+
+        pages = [keyset_page(queryset, per_page=3)]
+        while pages[-1].has_next():
+            pages.append(keyset_page(queryset, after=pages[-1].next_cursor, per_page=3))
+        self.assertEqual([t for page in pages for t in page], expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+
+        previous = keyset_page(queryset, before=pages[2].previous_cursor, per_page=3)
+        self.assertEqual(list(previous), expected[3:6])
+        self.assertTrue(previous.has_previous())
+        self.assertEqual(list(keyset_page(queryset, last=True, per_page=3)), expected[4:])
+        self.assertEqual(list(keyset_page(queryset, after='garbage', per_page=3)), expected[:3])
+
+        # The rows above bypass the write paths, so set the counter by hand.
+        Project.objects.filter(pk=self.project.pk).update(transcript_count=7)
+        from unittest.mock import patch
+        with patch('transcription.views.PAGE_NUM', new=3):
+            response = self.client.get(reverse('project_detail', args=[self.project.id]),
+                                       {'after': pages[0].next_cursor})
+        self.assertEqual(list(response.context['page_obj']), expected[3:6])
+        self.assertEqual(response.context['transcripts_count'], 7)
+
+    def test_approximate_transcript_count_is_cached(self):
+        from unittest.mock import patch
+        from django.core.cache import cache
+        from .pagination import approximate_count
+        cache.clear()
+        queryset = self.project.transcripts.all()
+        with patch('transcription.pagination.APPROXIMATE_COUNTS', new=True):
+            self.assertEqual(approximate_count(queryset, 'count-test'), (1, True))
+            Transcript.objects.create(project=self.project, user=self.user, audio_file='more.wav')
+            self.assertEqual(approximate_count(queryset, 'count-test'), (1, False))
+        cache.clear()
+
+    def test_search_follows_every_write_path(self):
+        from unittest.mock import patch
+        from .search import search_transcripts
+
+        def found(query, queryset=None):
+            queryset = queryset if queryset is not None else Transcript.objects.all()
+            return sorted(search_transcripts(queryset, query).values_list('transcript', flat=True))
+
+        self.assertEqual(found('test transcr'), ['This is a test transcription.'])
+
+        self.client.post(reverse('save_record'), {
+            'project_id': str(self.project.id),
+            'transcript': 'എന്റെ രാജ്യമാണ് ഇന്ത്യ',
+            'audio': SimpleUploadedFile("recorded.wav", b"dummy", content_type="audio/wav"),
+        })
+        # Words match by prefix, so a stem finds its suffixed forms.
+        self.assertEqual(found('രാജ്യ'), ['എന്റെ രാജ്യമാണ് ഇന്ത്യ'])
+
+        self.client.post(reverse('edit_transcript', args=[self.transcript.id]), {'text': 'Edited words'})
+        self.assertEqual(found('transcription'), [])
+        self.assertEqual(found('EDITED'), ['Edited words'])
+
+        self.client.post(reverse('delete_transcript', args=[self.transcript.id]), {'delete_files': 'false'})
+        self.assertEqual(found('edited'), [])
+
+        other = Project.objects.create(name="Other", folder_path=TEST_MEDIA_ROOT)
+        Transcript.objects.bulk_create([
+            Transcript(project=other, user=self.user, audio_file=f'{i}.wav', transcript=f'ഇന്ത്യ {i}')
+            for i in range(3)
+        ])
+        self.assertEqual(len(found('ഇന്ത്യ')), 4)
+        self.assertEqual(len(found('ഇന്ത്യ', self.project.transcripts.all())), 1)
+        # Operators and punctuation are not passed through to the index.
+        self.assertEqual(found('"AND (*'), [])
+        self.assertEqual(found('?!'), [])
+
+        with patch('transcription.views.PAGE_NUM', new=2):
+            response = self.client.get(reverse('search'), {'q': 'ഇന്ത്യ'})
+            self.assertEqual(response.context['transcripts_count'], 4)
+            first = list(response.context['page_obj'])
+            response = self.client.get(reverse('search'), {
+                'q': 'ഇന്ത്യ', 'after': response.context['page_obj'].next_cursor,
+            })
+            self.assertEqual(len(first + list(response.context['page_obj'])), 4)
+
+        response = self.client.get(reverse('project_detail', args=[other.id]), {'q': 'ഇന്ത്യ 1'})
+        self.assertEqual([t.transcript for t in response.context['page_obj']], ['ഇന്ത്യ 1'])
+        response = self.client.get(reverse('search'), {'q': 'ഇന്ത്യ', 'project': str(self.project.id)})
+        self.assertEqual(response.context['transcripts_count'], 1)
+
     def test_wrong_url_redirects_to_project_list(self):
         """Test that a non-existent URL redirects to the project list."""
         response = self.client.get('/this-is-a-wrong-url/')
@@ -156,6 +397,65 @@ class TranscriptionTests(TestCase):
         self.transcript.refresh_from_db()
         self.assertEqual(self.transcript.transcript, 'Updated transcript text.')
 
+    def test_edit_transcripts_batch_view(self):
+        import json
+        import uuid
+        from transcription.search import search_transcripts
+        Project.objects.filter(pk=self.project.pk).update(transcript_count=2, transcribed_count=1, empty_text_count=1)
+        empty = Transcript.objects.create(project=self.project, audio_file="b.wav", transcript="", user=self.user)
+        edits = [
+            {"id": str(self.transcript.id), "text": "first"},
+            {"id": str(empty.id), "text": "  filled in  "},
+            {"id": str(self.transcript.id), "text": ""},
+            {"id": str(uuid.uuid4()), "text": "nobody"},
+            {"id": "not-a-uuid", "text": "x"},
+            {"id": str(empty.id)},
+        ]
+
+        response = self.client.post(reverse('edit_transcripts'), json.dumps(edits), content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([r['status'] for r in data['results']],
+                         ['superseded', 'updated', 'updated', 'not_found', 'invalid', 'invalid'])
+        self.assertEqual(data['counts'], {'superseded': 1, 'updated': 2, 'not_found': 1, 'invalid': 2})
+        self.transcript.refresh_from_db()
+        empty.refresh_from_db()
+        self.assertEqual(self.transcript.transcript, "")
+        self.assertEqual(empty.transcript, "filled in")
+        self.assertEqual(self._counters()[:3], (2, 1, 1))
+        self.assertEqual(list(search_transcripts(Transcript.objects.all(), "filled")), [empty])
+
+    def test_edit_transcripts_batch_view_rejects_malformed_bodies(self):
+        import json
+        original = self.transcript.transcript
+        ndjson = json.dumps({"id": str(self.transcript.id), "text": "applied?"}) + "\n{broken\n"
+        for body in [ndjson, '[{"id": "x", "text": ', b'\xff\xfe[']:
+            with self.subTest(body=body):
+                response = self.client.post(reverse('edit_transcripts'), body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('Malformed JSON', response.json()['error'])
+        self.transcript.refresh_from_db()
+        self.assertEqual(self.transcript.transcript, original)
+
+    def test_edit_transcripts_command_reads_ndjson(self):
+        import json
+        from io import StringIO
+        from django.core.management import call_command
+        path = os.path.join(TEST_MEDIA_ROOT, 'edits.ndjson')
+        with open(path, 'w') as f:
+            f.write(json.dumps({"id": str(self.transcript.id), "text": "from a file"}) + "\n")
+            f.write("{broken\n")
+            f.write(json.dumps({"id": str(self.transcript.id), "text": "from a file"}) + "\n")
+
+        out = StringIO()
+        call_command('edit_transcripts', path, '--chunk-size', '1', stdout=out)
+
+        self.transcript.refresh_from_db()
+        self.assertEqual(self.transcript.transcript, "from a file")
+        self.assertIn("invalid 1, unchanged 1, updated 1", out.getvalue())
+        self.assertIn("#2 None: invalid: Malformed JSON line", out.getvalue())
+
     def test_delete_project_with_files(self):
         target_dir = os.path.join(self.project.folder_path, self.project.name)
         os.makedirs(target_dir, exist_ok=True)
@@ -206,3 +506,1206 @@ class TranscriptionTests(TestCase):
         self.assertEqual(data['status'], 'success')
         self.assertIn('audio/test2.wav', data['missing_files'])
         self.assertTrue(Project.objects.filter(name='ImportTestProject').exists())
+
+    @patch('transcription.views.SAVE_DIR', new=TEST_MEDIA_ROOT)
+    @patch('transcription.imports.BATCH_SIZE', new=2)
+    def test_import_project_probes_durations_in_manifest_order(self):
+        import json
+        import_dir = os.path.join(TEST_MEDIA_ROOT, 'ParallelImport')
+        os.makedirs(os.path.join(import_dir, 'audio'), exist_ok=True)
+
+        details_data = []
+        for i in range(5):
+            write_wav(os.path.join(import_dir, 'audio', f'clip{i}.wav'), seconds=i + 1)
+            details_data.append({"audio_filepath": f"audio/clip{i}.wav", "text": f"Clip {i}"})
+        with open(os.path.join(import_dir, 'details.json'), 'w') as f:
+            json.dump(details_data, f)
+
+        response = self.client.post(reverse('import_project'), {
+            'folder_name': 'ParallelImport',
+            'sample_rate': 16000
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['message'], 'Imported 5 items')
+        project = Project.objects.get(name='ParallelImport')
+        self.assertAlmostEqual(project.total_duration, 15.0, places=3)
+        texts = dict(project.transcripts.values_list('audio_file', 'transcript'))
+        self.assertEqual(texts, {f'clip{i}.wav': f'Clip {i}' for i in range(5)})
+        self.assertEqual((project.transcript_count, project.transcribed_count), (5, 5))
+
+
+    def test_insert_transcripts_streams_copy_on_postgresql(self):
+        from unittest.mock import MagicMock, patch
+        from . import imports
+        rows = []
+        fake = MagicMock(vendor='postgresql')
+        fake.ops.quote_name = lambda name: f'"{name}"'
+        copy = fake.cursor.return_value.__enter__.return_value.copy
+        copy.return_value.__enter__.return_value.write_row.side_effect = rows.append
+        batch = [Transcript(project=self.project, user=self.user, audio_file='a.wav', transcript='A', duration=1.5)]
+
+        with patch('transcription.imports.connection', fake), \
+                patch('transcription.imports._can_copy', return_value=True):
+            imports.insert_transcripts(batch)
+
+        sql = copy.call_args[0][0]
+        self.assertTrue(sql.startswith('COPY "transcription_transcript" ("id", "audio_file", "transcript", "project_id"'))
+        self.assertTrue(sql.endswith('FROM STDIN'))
+        self.assertEqual(rows[0][:5], [batch[0].id, 'a.wav', 'A', self.project.id, self.user.id])
+        # created_at is filled in as bulk_create would.
+        self.assertIsNotNone(batch[0].created_at)
+        self.assertEqual(rows[0][5], batch[0].created_at)
+        self.assertEqual(rows[0][6], 1.5)
+
+    def test_save_record_stores_audio_metadata(self):
+        wav_path = os.path.join(TEST_MEDIA_ROOT, 'upload.wav')
+        write_wav(wav_path, seconds=1.5, sample_rate=16000)
+        with open(wav_path, 'rb') as f:
+            audio_file = SimpleUploadedFile("recorded.wav", f.read(), content_type="audio/wav")
+
+        response = self.client.post(reverse('save_record'), {
+            'project_id': str(self.project.id),
+            'transcript': 'With metadata',
+            'audio': audio_file
+        })
+
+        self.assertEqual(response.status_code, 200)
+        new_transcript = Transcript.objects.get(transcript='With metadata')
+        self.assertAlmostEqual(new_transcript.duration, 1.5)
+        self.assertEqual(new_transcript.sample_rate, 16000)
+        self.assertEqual(new_transcript.channels, 1)
+        self.assertEqual(new_transcript.file_size, os.path.getsize(wav_path))
+        self.project.refresh_from_db()
+        self.assertAlmostEqual(self.project.total_duration, 1.5)
+
+    def test_chunked_upload_resumes_and_registers_transcript(self):
+        wav_path = os.path.join(TEST_MEDIA_ROOT, 'long.wav')
+        write_wav(wav_path, seconds=2, sample_rate=16000)
+        with open(wav_path, 'rb') as f:
+            data = f.read()
+
+        response = self.client.post(reverse('start_upload'), {
+            'project_id': str(self.project.id),
+            'transcript': 'Long recording',
+            'size': len(data),
+        })
+        self.assertEqual(response.status_code, 200)
+        upload_id = response.json()['upload_id']
+        chunk_url = reverse('upload_chunk', args=[upload_id])
+        finish_url = reverse('finish_upload', args=[upload_id])
+
+        def put(offset, body):
+            return self.client.put(chunk_url, body, content_type='application/octet-stream',
+                                   HTTP_UPLOAD_OFFSET=str(offset))
+
+        self.assertEqual(put(0, data[:20000]).json()['offset'], 20000)
+        # A gap is refused with the offset to resume from.
+        response = put(30000, data[30000:40000])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 20000)
+        # Finishing early is refused and keeps the upload.
+        self.assertEqual(self.client.post(finish_url).status_code, 400)
+        # A retried chunk overwrites from its offset.
+        self.assertEqual(put(10000, data[10000:30000]).json()['offset'], 30000)
+        self.assertEqual(self.client.get(chunk_url).json()['offset'], 30000)
+        self.assertEqual(put(30000, data[30000:]).json()['offset'], len(data))
+
+        response = self.client.post(finish_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['transcript_id'], upload_id)
+        transcript = Transcript.objects.get(id=upload_id)
+        self.assertEqual(transcript.transcript, 'Long recording')
+        self.assertAlmostEqual(transcript.duration, 2.0, places=3)
+        audio_dir = os.path.join(TEST_MEDIA_ROOT, self.project.name, 'audio')
+        with open(os.path.join(audio_dir, f'{upload_id}.wav'), 'rb') as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(os.listdir(audio_dir), [f'{upload_id}.wav'])
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.transcript_count, 1)
+        # Finishing again after a lost response reports the same transcript.
+        self.assertEqual(self.client.post(finish_url).json()['transcript_id'], upload_id)
+
+    def test_start_upload_rejects_a_malformed_project_id(self):
+        response = self.client.post(reverse('start_upload'), {'project_id': 'not-a-uuid'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Invalid project id')
+
+    def test_chunked_upload_rejects_invalid_audio(self):
+        response = self.client.post(reverse('start_upload'), {'project_id': str(self.project.id)})
+        upload_id = response.json()['upload_id']
+        self.client.put(reverse('upload_chunk', args=[upload_id]), b'not a wav file',
+                        content_type='application/octet-stream', HTTP_UPLOAD_OFFSET='0')
+
+        response = self.client.post(reverse('finish_upload', args=[upload_id]))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Not a valid WAV or FLAC file', response.json()['error'])
+        self.assertFalse(Transcript.objects.filter(id=upload_id).exists())
+        response = self.client.delete(reverse('upload_chunk', args=[upload_id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(os.listdir(os.path.join(TEST_MEDIA_ROOT, self.project.name, 'audio')), [])
+
+    def test_finished_upload_and_its_transcript_never_coexist(self):
+        from unittest.mock import patch
+        wav_path = os.path.join(TEST_MEDIA_ROOT, 'take.wav')
+        write_wav(wav_path, seconds=1)
+        with open(wav_path, 'rb') as f:
+            data = f.read()
+        response = self.client.post(reverse('start_upload'), {'project_id': str(self.project.id)})
+        upload_id = response.json()['upload_id']
+        self.client.put(reverse('upload_chunk', args=[upload_id]), data,
+                        content_type='application/octet-stream', HTTP_UPLOAD_OFFSET='0')
+
+        # Failing to drop the upload rolls the transcript back with it.
+        with patch.object(Upload, 'delete', side_effect=OSError("database went away")):
+            response = self.client.post(reverse('finish_upload', args=[upload_id]))
+        self.assertEqual(response.status_code, 500)
+        self.assertTrue(Upload.objects.filter(id=upload_id).exists())
+        self.assertFalse(Transcript.objects.filter(id=upload_id).exists())
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.transcript_count, 0)
+
+        # A finish that lost the race to a concurrent one, which has moved
+        # the part file away and saved the transcript, reports that transcript.
+        audio_dir = os.path.join(TEST_MEDIA_ROOT, self.project.name, 'audio')
+        os.replace(os.path.join(audio_dir, f'.{upload_id}.upload.part'),
+                   os.path.join(audio_dir, f'{upload_id}.wav'))
+        Transcript.objects.create(id=upload_id, project=self.project, user=self.user,
+                                  audio_file=f'{upload_id}.wav')
+        response = self.client.post(reverse('finish_upload', args=[upload_id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['transcript_id'], upload_id)
+
+    def test_failed_finish_keeps_the_upload_for_a_retry(self):
+        from unittest.mock import patch
+        wav_path = os.path.join(TEST_MEDIA_ROOT, 'take.wav')
+        write_wav(wav_path, seconds=1)
+        with open(wav_path, 'rb') as f:
+            data = f.read()
+        response = self.client.post(reverse('start_upload'), {
+            'project_id': str(self.project.id),
+            'size': len(data),
+        })
+        upload_id = response.json()['upload_id']
+        self.client.put(reverse('upload_chunk', args=[upload_id]), data,
+                        content_type='application/octet-stream', HTTP_UPLOAD_OFFSET='0')
+        finish_url = reverse('finish_upload', args=[upload_id])
+
+        with patch.object(Project, 'adjust_counters', side_effect=OSError("database went away")):
+            self.assertEqual(self.client.post(finish_url).status_code, 500)
+        self.assertFalse(Transcript.objects.filter(id=upload_id).exists())
+
+        response = self.client.post(finish_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['transcript_id'], upload_id)
+        audio_dir = os.path.join(TEST_MEDIA_ROOT, self.project.name, 'audio')
+        self.assertEqual(os.listdir(audio_dir), [f'{upload_id}.wav'])
+        with open(os.path.join(audio_dir, f'{upload_id}.wav'), 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_flac_recordings_are_validated_served_and_exported(self):
+        import json
+        import numpy as np
+        import soundfile
+        audio_dir = os.path.join(self.project.folder_path, self.project.name, 'audio')
+        samples = (np.sin(np.arange(24000) / 5) * 8000).astype(np.int16)
+        flac_path = os.path.join(TEST_MEDIA_ROOT, 'take.flac')
+        soundfile.write(flac_path, samples, 16000, subtype='PCM_16', format='FLAC')
+        with open(flac_path, 'rb') as f:
+            data = f.read()
+
+        # A FLAC stream cut short is refused and leaves nothing behind.
+        response = self.client.post(reverse('save_record'), {
+            'project_id': str(self.project.id),
+            'transcript': 'Cut',
+            'audio': SimpleUploadedFile("take.flac", data[:len(data) // 2], content_type="audio/flac"),
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(os.listdir(audio_dir), [])
+
+        response = self.client.post(reverse('save_record'), {
+            'project_id': str(self.project.id),
+            'transcript': 'Lossless',
+            'audio': SimpleUploadedFile("take.flac", data, content_type="audio/flac"),
+        })
+        self.assertEqual(response.status_code, 200)
+        transcript = Transcript.objects.get(id=response.json()['transcript_id'])
+        self.assertEqual(transcript.audio_file, f"{transcript.id}.flac")
+        self.assertAlmostEqual(transcript.duration, 1.5, places=3)
+
+        response = self.client.get(reverse('serve_audio', args=[transcript.id]))
+        self.assertEqual(response['Content-Type'], 'audio/flac')
+        self.assertEqual(b''.join(response.streaming_content), data)
+
+        response = self.client.get(reverse('serve_audio', args=[transcript.id]), {'format': 'wav'})
+        self.assertEqual(response['Content-Type'], 'audio/wav')
+        body = b''.join(response.streaming_content)
+        self.assertEqual(int(response['Content-Length']), len(body))
+        wav_path = os.path.join(TEST_MEDIA_ROOT, 'decoded.wav')
+        with open(wav_path, 'wb') as f:
+            f.write(body)
+        self.assertEqual(parse_audio_header(wav_path).format, 'wav')
+        np.testing.assert_array_equal(soundfile.read(wav_path, dtype='int16')[0], samples)
+
+        response = self.client.post(reverse('export:export_project_json', args=[self.project.id]))
+        b''.join(response.streaming_content)
+        with open(os.path.join(self.project.folder_path, self.project.name, 'details.json')) as f:
+            self.assertEqual([e['audio_filepath'] for e in json.load(f)], [f"audio/{transcript.id}.flac"])
+
+    def test_wav_recordings_can_be_stored_as_flac(self):
+        from unittest.mock import patch
+        import soundfile
+        wav_path = os.path.join(TEST_MEDIA_ROOT, 'take.wav')
+        write_wav(wav_path, seconds=1)
+        with open(wav_path, 'rb') as f:
+            data = f.read()
+
+        with patch('transcription.uploads.AUDIO_STORAGE_FORMAT', new='flac'):
+            response = self.client.post(reverse('save_record'), {
+                'project_id': str(self.project.id),
+                'transcript': 'Compressed',
+                'audio': SimpleUploadedFile("take.wav", data, content_type="audio/wav"),
+            })
+
+        self.assertEqual(response.status_code, 200)
+        transcript = Transcript.objects.get(id=response.json()['transcript_id'])
+        stored = os.path.join(self.project.folder_path, self.project.name, 'audio', transcript.audio_file)
+        self.assertTrue(stored.endswith('.flac'))
+        self.assertLess(os.path.getsize(stored), len(data) // 2)
+        self.assertEqual(transcript.file_size, os.path.getsize(stored))
+        self.assertEqual(soundfile.read(stored, dtype='int16')[0].tolist(), soundfile.read(wav_path, dtype='int16')[0].tolist())
+
+    def test_save_record_leaves_no_partial_files(self):
+        from unittest.mock import patch
+        audio_dir = os.path.join(self.project.folder_path, self.project.name, 'audio')
+        wav_path = os.path.join(TEST_MEDIA_ROOT, 'upload.wav')
+        write_wav(wav_path, seconds=1)
+        with open(wav_path, 'rb') as f:
+            data = f.read()
+
+        for _ in range(2):
+            response = self.client.post(reverse('save_record'), {
+                'project_id': str(self.project.id),
+                'transcript': 'Take',
+                'audio': SimpleUploadedFile("recorded.wav", data, content_type="audio/wav"),
+            })
+            self.assertEqual(response.status_code, 200)
+        saved = {f"{pk}.wav" for pk in Transcript.objects.filter(transcript='Take').values_list('pk', flat=True)}
+        self.assertEqual(set(os.listdir(audio_dir)), saved)
+        self.project.refresh_from_db()
+        self.assertAlmostEqual(self.project.total_duration, 2.0)
+        self.assertEqual(self.project.transcript_count, 2)
+
+        # A failed insert removes the file it had already put in place.
+        with patch('transcription.views.Transcript.save', side_effect=RuntimeError("db down")):
+            response = self.client.post(reverse('save_record'), {
+                'project_id': str(self.project.id),
+                'transcript': 'Lost',
+                'audio': SimpleUploadedFile("recorded.wav", data, content_type="audio/wav"),
+            })
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(set(os.listdir(audio_dir)), saved)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.transcript_count, 2)
+
+    def test_delete_transcript_subtracts_stored_duration(self):
+        self.transcript.duration = 4.0
+        self.transcript.save()
+        self.project.total_duration = 10.0
+        self.project.save()
+
+        response = self.client.post(reverse('delete_transcript', args=[self.transcript.id]), {
+            'delete_files': 'false'
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.project.refresh_from_db()
+        self.assertAlmostEqual(self.project.total_duration, 6.0)
+
+    def test_backfill_audio_metadata_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        audio_dir = os.path.join(TEST_MEDIA_ROOT, self.project.name, 'audio')
+        os.makedirs(audio_dir, exist_ok=True)
+        write_wav(os.path.join(audio_dir, self.transcript.audio_file), seconds=2)
+        Transcript.objects.create(project=self.project, user=self.user, audio_file='gone.wav')
+
+        call_command('backfill_audio_metadata', stdout=StringIO())
+
+        self.transcript.refresh_from_db()
+        self.assertAlmostEqual(self.transcript.duration, 2.0)
+        self.assertEqual(self.transcript.sample_rate, 16000)
+        self.assertIsNone(Transcript.objects.get(audio_file='gone.wav').duration)
+        self.project.refresh_from_db()
+        self.assertAlmostEqual(self.project.total_duration, 2.0)
+
+    def _counters(self):
+        self.project.refresh_from_db()
+        return tuple(getattr(self.project, name) for name in Project.COUNTER_FIELDS)
+
+    def test_write_paths_maintain_project_counters(self):
+        from io import StringIO
+        from django.core.management import call_command
+        # The setUp transcript was created directly and has no audio file.
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self._counters(), (1, 1, 0, 1))
+
+        audio_file = SimpleUploadedFile("recorded.wav", b"dummy", content_type="audio/wav")
+        response = self.client.post(reverse('save_record'), {
+            'project_id': str(self.project.id),
+            'transcript': '',
+            'audio': audio_file
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._counters(), (2, 1, 1, 1))
+
+        self.client.post(reverse('edit_transcript', args=[self.transcript.id]), {'text': '  '})
+        self.assertEqual(self._counters(), (2, 0, 2, 1))
+
+        self.client.post(reverse('delete_transcript', args=[self.transcript.id]), {'delete_files': 'false'})
+        self.assertEqual(self._counters(), (1, 0, 1, 0))
+
+        recorded = Transcript.objects.get(project=self.project)
+        self.client.post(reverse('export:delete_transcript', args=[recorded.id]), {'delete_files': 'true'})
+        self.assertEqual(self._counters(), (0, 0, 0, 0))
+
+    def test_concurrent_edits_and_deletes_count_once(self):
+        from io import StringIO
+        from unittest.mock import patch
+        from django.core.management import call_command
+        call_command('reconcile_counters', stdout=StringIO())
+        self.project.adjust_counters(duration=2.0)
+        Transcript.objects.filter(pk=self.transcript.pk).update(duration=2.0)
+        # What a request that read the row before the others wrote sees.
+        stale = Transcript.objects.get(pk=self.transcript.pk)
+
+        self.client.post(reverse('edit_transcript', args=[self.transcript.id]), {'text': ''})
+        with patch('transcription.views.get_object_or_404', return_value=stale):
+            self.client.post(reverse('edit_transcript', args=[self.transcript.id]), {'text': ''})
+        self.assertEqual(self._counters(), (1, 0, 1, 1))
+
+        for url in ['delete_transcript', 'export:delete_transcript']:
+            view = 'export.views' if url.startswith('export') else 'transcription.views'
+            with patch(f'{view}.get_object_or_404', return_value=stale):
+                response = self.client.post(reverse(url, args=[self.transcript.id]), {'delete_files': 'false'})
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._counters(), (0, 0, 0, 0))
+        self.assertAlmostEqual(self.project.total_duration, 0.0)
+
+    def test_reconcile_counters_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        Project.objects.filter(pk=self.project.pk).update(transcript_count=5, transcribed_count=5)
+
+        out = StringIO()
+        call_command('reconcile_counters', '--dry-run', stdout=out)
+        self.assertIn("transcript_count 5 -> 1", out.getvalue())
+        self.assertEqual(self._counters(), (5, 5, 0, 0))
+
+        call_command('reconcile_counters', '--skip-audio', stdout=StringIO())
+        self.assertEqual(self._counters(), (1, 1, 0, 0))
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self._counters(), (1, 1, 0, 1))
+
+    @patch('transcription.views.IMPORT_PROGRESS_STREAM_SECONDS', new=0)
+    def test_import_progress_stream_hands_over_to_polling(self):
+        import json
+        job = ImportJob.objects.create(folder_name='Waiting', folder_path=TEST_MEDIA_ROOT, sample_rate=16000)
+
+        # With no worker the job never finishes; the stream still ends.
+        response = self.client.get(reverse('import_job_progress', args=[job.id]))
+        lines = [json.loads(l) for l in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([line['type'] for line in lines], ['init', 'progress'])
+
+        response = self.client.get(reverse('import_job_status', args=[job.id]))
+        self.assertEqual(response.json()['status'], ImportJob.STATUS_QUEUED)
+
+    @patch('transcription.views.SAVE_DIR', new=TEST_MEDIA_ROOT)
+    @patch('transcription.views.BACKGROUND_IMPORTS', new=True)
+    def test_background_import_job(self):
+        import json
+        from io import StringIO
+        from django.core.management import call_command
+        import_dir = os.path.join(TEST_MEDIA_ROOT, 'QueuedImport')
+        os.makedirs(os.path.join(import_dir, 'audio'), exist_ok=True)
+        write_wav(os.path.join(import_dir, 'audio', 'a.wav'), seconds=2)
+        with open(os.path.join(import_dir, 'details.json'), 'w') as f:
+            json.dump([
+                {"audio_filepath": "audio/a.wav", "text": "A"},
+                {"audio_filepath": "audio/b.wav", "text": "B"},
+            ], f)
+
+        response = self.client.post(reverse('import_project'), {
+            'folder_name': 'QueuedImport',
+            'sample_rate': 16000
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['status'], 'queued')
+        self.assertFalse(Project.objects.filter(name='QueuedImport').exists())
+
+        call_command('run_import_worker', '--once', stdout=StringIO())
+
+        job = ImportJob.objects.get(id=data['job_id'])
+        self.assertEqual(job.status, ImportJob.STATUS_SUCCEEDED)
+        self.assertEqual((job.processed, job.imported, job.missing_count), (2, 1, 1))
+        self.assertAlmostEqual(job.total_duration, 2.0)
+        self.assertEqual(job.project.name, 'QueuedImport')
+
+        response = self.client.get(data['progress_url'])
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(l) for l in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(lines[0]['type'], 'init')
+        self.assertEqual(lines[-1], {
+            'type': 'success',
+            'message': 'Imported 1 items',
+            'missing_files': ['audio/b.wav'],
+        })
+
+    def test_import_never_leaves_a_project_without_its_job(self):
+        from unittest.mock import patch
+        from . import imports
+        os.makedirs(os.path.join(TEST_MEDIA_ROOT, 'OrphanImport'), exist_ok=True)
+        job = ImportJob.objects.create(folder_name='OrphanImport', folder_path=TEST_MEDIA_ROOT, sample_rate=16000)
+        real_record = imports._record_progress
+
+        def dying_record(job, **fields):
+            if 'project' in fields:
+                raise OSError("worker killed")
+            return real_record(job, **fields)
+
+        with patch('transcription.imports._record_progress', side_effect=dying_record):
+            imports.run_import_job(job)
+
+        self.assertFalse(Project.objects.filter(name='OrphanImport').exists())
+        self.assertEqual(ImportJob.objects.get(pk=job.pk).status, ImportJob.STATUS_FAILED)
+
+    @patch('transcription.views.SAVE_DIR', new=TEST_MEDIA_ROOT)
+    @patch('transcription.imports.BATCH_SIZE', new=2)
+    def test_failed_import_resumes_from_checkpoint(self):
+        import json
+        from unittest.mock import patch
+        from . import imports
+        import_dir = os.path.join(TEST_MEDIA_ROOT, 'ResumedImport')
+        os.makedirs(os.path.join(import_dir, 'audio'), exist_ok=True)
+        for i in range(5):
+            write_wav(os.path.join(import_dir, 'audio', f'{i}.wav'), seconds=1)
+        with open(os.path.join(import_dir, 'details.json'), 'w') as f:
+            json.dump([{"audio_filepath": f"audio/{i}.wav", "text": str(i)} for i in range(5)], f)
+
+        probed = []
+        real_probe = imports.probe_audio_files
+
+        def flaky_probe(executor, pending):
+            probed.extend(rel_path for _, rel_path, _ in pending)
+            if len(probed) == 4:
+                raise OSError("disk went away")
+            return real_probe(executor, pending)
+
+        with patch('transcription.imports.probe_audio_files', side_effect=flaky_probe):
+            response = self.client.post(reverse('import_project'), {
+                'folder_name': 'ResumedImport',
+                'sample_rate': 16000
+            }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+            self.assertEqual(response.status_code, 500)
+
+            job = ImportJob.objects.get(folder_name='ResumedImport')
+            self.assertEqual(job.status, ImportJob.STATUS_FAILED)
+            self.assertTrue(job.can_resume)
+            self.assertEqual((job.processed, job.imported), (2, 2))
+            self.assertEqual(job.project.transcripts.count(), 2)
+
+            # Importing the same folder again picks the failed job back up.
+            response = self.client.post(reverse('import_project'), {
+                'folder_name': 'ResumedImport',
+                'sample_rate': 16000
+            }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['message'], 'Imported 5 items')
+        # The first checkpoint was neither re-read nor re-probed.
+        self.assertEqual(probed, [f'audio/{i}.wav' for i in [0, 1, 2, 3, 2, 3, 4]])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_SUCCEEDED)
+        self.assertEqual(job.processed, 5)
+        self.assertEqual(ImportJob.objects.count(), 1)
+        texts = sorted(job.project.transcripts.values_list('transcript', flat=True))
+        self.assertEqual(texts, ['0', '1', '2', '3', '4'])
+        job.project.refresh_from_db()
+        self.assertAlmostEqual(job.project.total_duration, 5.0)
+
+    @patch('transcription.views.SAVE_DIR', new=TEST_MEDIA_ROOT)
+    @patch('transcription.imports.BATCH_SIZE', new=2)
+    def test_import_that_died_with_its_process_is_resumed(self):
+        import datetime
+        import json
+        from django.utils import timezone
+        from . import imports
+        import_dir = os.path.join(TEST_MEDIA_ROOT, 'CrashedImport')
+        os.makedirs(os.path.join(import_dir, 'audio'), exist_ok=True)
+        for i in range(3):
+            write_wav(os.path.join(import_dir, 'audio', f'{i}.wav'), seconds=1)
+        with open(os.path.join(import_dir, 'details.json'), 'w') as f:
+            json.dump([{"audio_filepath": f"audio/{i}.wav", "text": str(i)} for i in range(3)], f)
+        job = ImportJob.objects.create(folder_name='CrashedImport', folder_path=TEST_MEDIA_ROOT, sample_rate=16000)
+        imports.run_import_job(job)
+        # As if the process had died mid-import, leaving the job running.
+        ImportJob.objects.filter(pk=job.pk).update(status=ImportJob.STATUS_RUNNING)
+
+        def import_again():
+            return self.client.post(reverse('import_project'), {
+                'folder_name': 'CrashedImport',
+                'sample_rate': 16000
+            }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        # A recent checkpoint means the import may still be going.
+        job.refresh_from_db()
+        self.assertFalse(job.can_resume)
+        response = import_again()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('still being imported', response.json()['error'])
+
+        ImportJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+        job.refresh_from_db()
+        self.assertTrue(job.is_stale)
+        self.assertTrue(job.can_resume)
+        response = import_again()
+        self.assertEqual(response.status_code, 200)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_SUCCEEDED)
+        self.assertEqual(ImportJob.objects.count(), 1)
+
+    def test_sync_project_applies_only_changes(self):
+        import json
+        from unittest.mock import patch
+        from . import imports
+        project_dir = os.path.join(self.project.folder_path, self.project.name)
+        os.makedirs(os.path.join(project_dir, 'audio'), exist_ok=True)
+        for name in ['same.wav', 'edited.wav', 'gone.wav', 'new.wav']:
+            write_wav(os.path.join(project_dir, 'audio', name), seconds=1)
+        for name, text in [('same.wav', 'Same'), ('edited.wav', ''), ('gone.wav', 'Gone')]:
+            Transcript.objects.create(project=self.project, user=self.user, audio_file=name,
+                                      transcript=text, duration=1.0)
+        from io import StringIO
+        from django.core.management import call_command
+        call_command('reconcile_counters', stdout=StringIO())
+        self.project.adjust_counters(duration=3.0)
+        self.assertEqual(self._counters(), (4, 3, 1, 1))
+        untouched = Transcript.objects.get(audio_file='same.wav')
+        with open(os.path.join(project_dir, 'details.json'), 'w') as f:
+            json.dump([
+                {"audio_filepath": "audio/same.wav", "text": "Same"},
+                {"audio_filepath": "audio/edited.wav", "text": "New"},
+                {"audio_filepath": "audio/new.wav", "text": "Added"},
+                {"audio_filepath": "audio/absent.wav", "text": "Absent"},
+            ], f)
+
+        probed = []
+        real_probe = imports.probe_audio_files
+
+        def recording_probe(executor, pending):
+            probed.extend(rel_path for _, rel_path, _ in pending)
+            return real_probe(executor, pending)
+
+        with patch('transcription.imports.probe_audio_files', side_effect=recording_probe):
+            response = self.client.post(reverse('sync_project', args=[self.project.id]))
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(
+            (data['created'], data['updated'], data['deleted'], data['unchanged']),
+            (1, 1, 2, 1),
+        )
+        self.assertEqual(data['missing_files'], ['audio/absent.wav'])
+        # Only the new entry was probed.
+        self.assertEqual(probed, ['audio/new.wav'])
+
+        texts = dict(self.project.transcripts.values_list('audio_file', 'transcript'))
+        # gone.wav and the setUp transcript are not in the manifest any more.
+        self.assertEqual(texts, {'same.wav': 'Same', 'edited.wav': 'New', 'new.wav': 'Added'})
+        self.assertEqual(Transcript.objects.get(audio_file='same.wav').pk, untouched.pk)
+        self.project.refresh_from_db()
+        self.assertAlmostEqual(self.project.total_duration, 3.0)
+        # The setUp transcript, whose audio was missing, was one of the deleted rows.
+        self.assertEqual(self._counters(), (3, 3, 0, 0))
+
+    def test_sync_project_keeps_durations_it_cannot_recompute(self):
+        import json
+        project_dir = os.path.join(self.project.folder_path, self.project.name)
+        os.makedirs(os.path.join(project_dir, 'audio'), exist_ok=True)
+        for name in ['kept.wav', 'gone.wav', 'new.wav']:
+            write_wav(os.path.join(project_dir, 'audio', name), seconds=1)
+        # A row counted in total_duration whose own duration was never stored.
+        Transcript.objects.create(project=self.project, user=self.user, audio_file='kept.wav',
+                                  transcript='Kept', duration=None)
+        Transcript.objects.create(project=self.project, user=self.user, audio_file='gone.wav',
+                                  transcript='Gone', duration=1.0)
+        self.project.adjust_counters(duration=5.0)
+        with open(os.path.join(project_dir, 'details.json'), 'w') as f:
+            json.dump([
+                {"audio_filepath": "audio/kept.wav", "text": "Kept"},
+                {"audio_filepath": "audio/new.wav", "text": "New"},
+            ], f)
+
+        response = self.client.post(reverse('sync_project', args=[self.project.id]))
+
+        self.assertEqual(response.status_code, 200)
+        self.project.refresh_from_db()
+        # 5s, less the deleted second, plus the new one.
+        self.assertAlmostEqual(self.project.total_duration, 5.0)
+
+def async_urlconf():
+    """The transcription URLs with the I/O views swapped for their async versions."""
+    import types
+    from django.urls import path
+    from . import async_views, views
+    urlconf = types.ModuleType('async_urls')
+    urlconf.urlpatterns = [
+        path('save_record/', async_views.save_record, name='save_record'),
+        path('api/uploads/', views.start_upload, name='start_upload'),
+        path('api/uploads/<uuid:upload_id>/', async_views.upload_chunk, name='upload_chunk'),
+        path('api/uploads/<uuid:upload_id>/finish/', async_views.finish_upload, name='finish_upload'),
+        path('audio/<uuid:transcript_id>/', async_views.serve_audio, name='serve_audio'),
+    ]
+    return urlconf
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, ROOT_URLCONF=async_urlconf())
+class AsyncViewsTests(TestCase):
+    def setUp(self):
+        from django.test import AsyncClient
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.async_client = AsyncClient()
+        self.async_client.force_login(self.user)
+        self.project = Project.objects.create(name="AsyncProject", sample_rate=16000, folder_path=TEST_MEDIA_ROOT)
+        self.audio_dir = os.path.join(TEST_MEDIA_ROOT, self.project.name, 'audio')
+        os.makedirs(self.audio_dir, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(os.path.join(TEST_MEDIA_ROOT, self.project.name), ignore_errors=True)
+
+    async def _body(self, response):
+        return b"".join([chunk async for chunk in response.streaming_content])
+
+    async def test_serve_audio_streams_ranges_and_decoded_flac(self):
+        import soundfile
+        transcript = await Transcript.objects.acreate(project=self.project, user=self.user, audio_file='a.wav')
+        with open(os.path.join(self.audio_dir, 'a.wav'), 'wb') as f:
+            f.write(b"0123456789")
+        url = reverse('serve_audio', args=[transcript.id])
+
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(await self._body(response), b"0123456789")
+
+        response = await self.async_client.get(url, headers={'Range': 'bytes=2-5'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(await self._body(response), b"2345")
+
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        wav_path = os.path.join(self.audio_dir, 'b.wav')
+        write_wav(wav_path, seconds=1)
+        soundfile.write(os.path.join(self.audio_dir, 'b.flac'), soundfile.read(wav_path, dtype='int16')[0],
+                        16000, subtype='PCM_16', format='FLAC')
+        transcript = await Transcript.objects.acreate(project=self.project, user=self.user, audio_file='b.flac')
+        response = await self.async_client.get(reverse('serve_audio', args=[transcript.id]), {'format': 'wav'})
+        self.assertEqual(response['Content-Type'], 'audio/wav')
+        with open(wav_path, 'rb') as f:
+            self.assertEqual(await self._body(response), f.read())
+
+    async def test_recordings_are_saved_and_uploaded_in_chunks(self):
+        wav_path = os.path.join(TEST_MEDIA_ROOT, 'async.wav')
+        write_wav(wav_path, seconds=1)
+        with open(wav_path, 'rb') as f:
+            data = f.read()
+
+        response = await self.async_client.post(reverse('save_record'), {
+            'project_id': str(self.project.id),
+            'transcript': 'Short recording',
+            'audio': SimpleUploadedFile('audio.wav', data, content_type='audio/wav'),
+        })
+        self.assertEqual(response.status_code, 200)
+        saved = await Transcript.objects.aget(id=response.json()['transcript_id'])
+        self.assertAlmostEqual(saved.duration, 1.0, places=3)
+
+        response = await self.async_client.post(reverse('start_upload'), {
+            'project_id': str(self.project.id),
+            'transcript': 'Long recording',
+            'size': len(data),
+        })
+        upload_id = response.json()['upload_id']
+        chunk_url = reverse('upload_chunk', args=[upload_id])
+
+        async def put(offset, body):
+            return await self.async_client.put(chunk_url, body, content_type='application/octet-stream',
+                                               headers={'Upload-Offset': str(offset)})
+
+        self.assertEqual((await put(0, data[:10000])).json()['offset'], 10000)
+        response = await put(20000, data[20000:])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 10000)
+        self.assertEqual((await self.async_client.get(chunk_url)).json()['offset'], 10000)
+        self.assertEqual((await put(10000, data[10000:])).json()['offset'], len(data))
+
+        response = await self.async_client.post(reverse('finish_upload', args=[upload_id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['transcript_id'], upload_id)
+        with open(os.path.join(self.audio_dir, f'{upload_id}.wav'), 'rb') as f:
+            self.assertEqual(f.read(), data)
+        await self.project.arefresh_from_db()
+        self.assertEqual(self.project.transcript_count, 2)
+
+    def test_asgi_benchmark(self):
+        import json
+        import subprocess
+        import sys
+        # The benchmark needs a real database its WSGI threads can share,
+        # so migrate a throwaway one and run it as a command.
+        env = dict(os.environ, DB_ENGINE='sqlite', DB_NAME=os.path.join(TEST_MEDIA_ROOT, 'bench.sqlite3'))
+        manage = os.path.join(settings.BASE_DIR, 'manage.py')
+        subprocess.run([sys.executable, manage, 'migrate', '-v0'], env=env, check=True)
+        subprocess.run([sys.executable, manage, 'shell', '-c',
+                        "from django.contrib.auth.models import User; "
+                        "User.objects.filter(is_superuser=True).exists() or "
+                        "User.objects.create_superuser('bench', password='bench')"], env=env, check=True)
+        output = subprocess.run(
+            [sys.executable, manage, 'benchmark_asgi', '--streams', '4', '--seconds', '0.5',
+             '--bandwidth', '1000000', '--json'],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        results = json.loads(output[output.index('{'):])
+        for mode in ('asgi', 'wsgi'):
+            self.assertEqual(results[mode]['errors'], 0)
+            self.assertIn('p95_ms', results[mode]['time_to_first_byte'])
+        # One sync worker thread serves one download at a time.
+        self.assertEqual(results['wsgi']['peak_concurrent_streams'], 1)
+        self.assertEqual(results['asgi']['peak_concurrent_streams'], 4)
+
+
+class SyntheticDatasetTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_quirky_manifest_parses_like_the_plain_one(self):
+        from .synthetic import generate_dataset
+        plain = generate_dataset(os.path.join(self.tmp_dir, 'plain'), 120, seconds=0.1)
+        quirky = generate_dataset(os.path.join(self.tmp_dir, 'quirky'), 120, seconds=0.1,
+                                  json5_quirks=True, nbsp=True, link_audio=True)
+        with open(quirky.manifest_path, encoding='utf-8') as f:
+            text = f.read()
+        self.assertIn('\u00a0', text)
+        self.assertIn('// entry 50', text)
+
+        rows = list(iter_objects_from_file(plain.manifest_path))
+        self.assertEqual(len(rows), 120)
+        self.assertEqual([r['audio_filepath'] for r in iter_objects_from_file(quirky.manifest_path)],
+                         [r['audio_filepath'] for r in rows])
+        self.assertEqual(rows[0]['duration'], 0.1)
+        audio_path = os.path.join(quirky.directory, rows[-1]['audio_filepath'])
+        self.assertEqual(read_audio_metadata(audio_path).duration, 0.1)
+        # Only the first recording takes space when the rest are links.
+        self.assertEqual(quirky.audio_bytes, os.path.getsize(audio_path))
+        self.assertEqual(plain.audio_bytes, 120 * os.path.getsize(audio_path))
+
+    def test_benchmark_suite(self):
+        import json
+        import subprocess
+        import sys
+        env = dict(os.environ, DB_ENGINE='sqlite', DB_NAME=os.path.join(self.tmp_dir, 'bench.sqlite3'),
+                   ASYNC_VIEWS='False')
+        manage = os.path.join(settings.BASE_DIR, 'manage.py')
+        subprocess.run([sys.executable, manage, 'migrate', '-v0'], env=env, check=True, capture_output=True)
+        output = os.path.join(self.tmp_dir, 'results.json')
+        subprocess.run(
+            [sys.executable, manage, 'benchmark_suite', '--sizes', '30', '--seconds', '0.1',
+             '--repeat', '2', '--json5', '--output', output],
+            env=env, check=True, capture_output=True,
+        )
+        with open(output) as f:
+            result = json.load(f)['results']['30']
+        self.assertGreater(result['parse']['rows_per_second'], 0)
+        for name in ('generate', 'import', 'export'):
+            self.assertIn('seconds', result[name])
+        self.assertEqual(set(result['project_detail']), {'first', 'middle', 'last'})
+        self.assertEqual(result['serve_audio']['range']['count'], 2)
+
+
+class MetricsRegistryTests(SimpleTestCase):
+
+    def test_histograms_grow_and_window_gauges_roll(self):
+        from unittest.mock import patch
+        from .metrics import MetricsRegistry, RequestStats
+        registry = MetricsRegistry(window=10)
+        stats = RequestStats()
+        stats.duration = 0.02
+        stats.sql_queries = 3
+
+        with patch('transcription.metrics.time.monotonic', return_value=100.0):
+            registry.record('project_detail', 200, stats)
+        with patch('transcription.metrics.time.monotonic', return_value=105.0):
+            registry.record('project_detail', 200, stats)
+            text = registry.render_prometheus()
+        self.assertIn('mozhi_request_duration_seconds_bucket{view="project_detail",le="0.01"} 0', text)
+        self.assertIn('mozhi_request_duration_seconds_bucket{view="project_detail",le="0.025"} 2', text)
+        self.assertIn('mozhi_request_sql_queries_sum{view="project_detail"} 6', text)
+
+        self.assertIn('mozhi_request_duration_seconds_window{view="project_detail",le="+Inf"} 2', text)
+        self.assertIn('# TYPE mozhi_request_duration_seconds histogram', text)
+        self.assertIn('# TYPE mozhi_request_duration_seconds_window gauge', text)
+
+        # Ten seconds later the first request has left the window; the
+        # histogram and the counter keep it.
+        with patch('transcription.metrics.time.monotonic', return_value=110.5):
+            text = registry.render_prometheus()
+        self.assertIn('mozhi_request_duration_seconds_window{view="project_detail",le="+Inf"} 1', text)
+        self.assertIn('mozhi_request_duration_seconds_count{view="project_detail"} 2', text)
+        self.assertIn('mozhi_requests_total{view="project_detail",code="200"} 2', text)
+
+
+class SearchIndexRebuildTests(TransactionTestCase):
+
+    def test_rebuild_restores_triggers_dropped_by_a_table_remake(self):
+        import io
+        from django.core.management import call_command
+        from django.db import connection, models
+        from .search import search_transcripts
+        if connection.vendor != 'sqlite':
+            self.skipTest("The triggers only exist on SQLite")
+
+        user = User.objects.create_user(username='searcher', password='password')
+        project = Project.objects.create(name="SearchProject", folder_path=TEST_MEDIA_ROOT)
+        Transcript.objects.create(project=project, user=user, audio_file='a.wav', transcript='ഇന്ത്യ one')
+
+        def found(query):
+            return sorted(search_transcripts(Transcript.objects.all(), query).values_list('transcript', flat=True))
+
+        def triggers():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                               "AND tbl_name = 'transcription_transcript'")
+                return len(cursor.fetchall())
+
+        # Altering a column makes SQLite copy the table into a new one.
+        old = Transcript._meta.get_field('audio_file')
+        new = models.CharField(max_length=300)
+        new.set_attributes_from_name('audio_file')
+        new.model = Transcript
+        with connection.schema_editor() as editor:
+            editor.alter_field(Transcript, old, new)
+            editor.alter_field(Transcript, new, old)
+        self.assertEqual(triggers(), 0)
+        Transcript.objects.create(project=project, user=user, audio_file='b.wav', transcript='ഇന്ത്യ two')
+        self.assertEqual(found('two'), [])
+
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(triggers(), 3)
+        self.assertEqual(found('ഇന്ത്യ'), ['ഇന്ത്യ one', 'ഇന്ത്യ two'])
+        Transcript.objects.create(project=project, user=user, audio_file='c.wav', transcript='ഇന്ത്യ three')
+        self.assertEqual(found('three'), ['ഇന്ത്യ three'])
+
+    def test_migrate_restores_triggers_dropped_by_a_table_remake(self):
+        import io
+        from django.core.management import call_command
+        from django.db import connection, models
+        from .search import search_transcripts
+        if connection.vendor != 'sqlite':
+            self.skipTest("The triggers only exist on SQLite")
+
+        user = User.objects.create_user(username='searcher', password='password')
+        project = Project.objects.create(name="SearchProject", folder_path=TEST_MEDIA_ROOT)
+        old = Transcript._meta.get_field('audio_file')
+        new = models.CharField(max_length=300)
+        new.set_attributes_from_name('audio_file')
+        new.model = Transcript
+        with connection.schema_editor() as editor:
+            editor.alter_field(Transcript, old, new)
+            editor.alter_field(Transcript, new, old)
+        Transcript.objects.create(project=project, user=user, audio_file='a.wav', transcript='ഇന്ത്യ one')
+
+        call_command('migrate', verbosity=0, stdout=io.StringIO())
+
+        found = search_transcripts(Transcript.objects.all(), 'ഇന്ത്യ').values_list('transcript', flat=True)
+        self.assertEqual(list(found), ['ഇന്ത്യ one'])
+        Transcript.objects.create(project=project, user=user, audio_file='b.wav', transcript='ഇന്ത്യ two')
+        self.assertEqual(search_transcripts(Transcript.objects.all(), 'two').count(), 1)
+
+
+class SQLiteProductionModeTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_production_options_apply_pragmas(self):
+        from django.db import connections
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+        from Mozhi.settings import SQLITE_PRODUCTION_OPTIONS
+        wrapper = DatabaseWrapper(dict(
+            connections.settings['default'],
+            NAME=os.path.join(self.tmp_dir, 'prod.sqlite3'),
+            OPTIONS=dict(SQLITE_PRODUCTION_OPTIONS),
+        ), alias='production-test')
+        try:
+            with wrapper.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.assertEqual(cursor.fetchone()[0], 'wal')
+                cursor.execute('PRAGMA synchronous')
+                self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            self.assertEqual(wrapper.transaction_mode, 'IMMEDIATE')
+        finally:
+            wrapper.close()
+
+    def test_concurrency_benchmark(self):
+        import json
+        import subprocess
+        import sys
+        # Its threads open their own connections, which the test runner
+        # forbids, so run it the way it is meant to be run.
+        output = subprocess.run(
+            [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'benchmark_sqlite_concurrency',
+             '--rows', '200', '--batch-size', '50', '--readers', '1', '--editors', '1',
+             '--mode', 'production', '--json'],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output[output.index('{'):])['production']
+        self.assertEqual(result['import']['rows'], 200)
+        self.assertEqual(result['import']['errors'], 0)
+        self.assertIn('p95_ms', result['import']['batches'])
+
+
+class AudioMetadataTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, name, data):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_pcm_wav(self):
+        path = os.path.join(self.tmp_dir, 'pcm.wav')
+        write_wav(path, seconds=2, sample_rate=16000)
+        info = parse_audio_header(path)
+        self.assertAlmostEqual(info.duration, 2.0)
+        self.assertEqual((info.sample_rate, info.channels, info.bits_per_sample), (16000, 1, 16))
+
+    def test_extensible_float_wav(self):
+        sample_rate, channels, frames = 48000, 2, 24000
+        block_align = channels * 4
+        sub_format = struct.pack('<H', 0x0003) + b'\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71'
+        fmt = struct.pack('<HHIIHHHHI', 0xFFFE, channels, sample_rate, sample_rate * block_align,
+                          block_align, 32, 22, 32, 3) + sub_format
+        data = b'\x00' * (frames * block_align)
+        body = b'WAVE' + b'fmt ' + struct.pack('<I', len(fmt)) + fmt + b'data' + struct.pack('<I', len(data)) + data
+        path = self._write('float.wav', b'RIFF' + struct.pack('<I', len(body)) + body)
+
+        info = parse_audio_header(path)
+        self.assertAlmostEqual(info.duration, 0.5)
+        self.assertEqual((info.sample_rate, info.channels, info.bits_per_sample), (48000, 2, 32))
+
+    def test_flac_streaminfo(self):
+        total_samples = 44100 * 3
+        packed = (44100 << 44) | ((2 - 1) << 41) | ((24 - 1) << 36) | total_samples
+        streaminfo = struct.pack('>HH', 4096, 4096) + b'\x00' * 6 + struct.pack('>Q', packed) + b'\x00' * 16
+        path = self._write('clip.flac', b'fLaC' + bytes([0x80, 0, 0, 34]) + streaminfo)
+
+        info = parse_audio_header(path)
+        self.assertAlmostEqual(info.duration, 3.0)
+        self.assertEqual((info.sample_rate, info.channels, info.bits_per_sample), (44100, 2, 24))
+
+    def test_ogg_opus(self):
+        def page(granule, packet, serial=7):
+            return (b'OggS' + struct.pack('<BBqIII', 0, 0, granule, serial, 0, 0)
+                    + bytes([1, len(packet)]) + packet)
+
+        head = b'OpusHead' + struct.pack('<BBHIhB', 1, 1, 312, 16000, 0, 0)
+        path = self._write('clip.opus', page(0, head) + page(48000 + 312, b'\x00' * 10))
+
+        info = parse_audio_header(path)
+        self.assertAlmostEqual(info.duration, 1.0)
+        self.assertEqual((info.sample_rate, info.channels), (48000, 1))
+
+    def test_truncated_ogg_headers_are_format_errors(self):
+        for name, packet in [
+            ('clip.ogg', b'\x01vorbis\x00\x00'),
+            ('clip.opus', b'OpusHead\x01'),
+            ('flac.ogg', b'\x7fFLAC\x01\x00\x00\x01fLaC\x00\x00\x00\x22'),
+        ]:
+            with self.subTest(name):
+                path = self._write(name, b'OggS' + struct.pack('<BBqIII', 0, 2, 0, 7, 0, 0)
+                                   + bytes([1, len(packet)]) + packet)
+                with self.assertRaises(AudioFormatError):
+                    parse_audio_header(path)
+                self.assertEqual(read_audio_metadata(path).duration, 0.0)
+
+    def test_unreadable_file_reports_zero_duration(self):
+        path = self._write('junk.wav', b'not audio at all')
+        self.assertEqual(read_audio_metadata(path).duration, 0.0)
+
+
+class AudioIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        audio_index.clear_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        audio_index.clear_cache()
+
+    def _age(self, seconds=60):
+        # Pretend the directory was last modified a while ago so its listing is cached.
+        past = os.stat(self.tmp_dir).st_mtime - seconds
+        os.utime(self.tmp_dir, (past, past))
+
+    def test_listing_is_cached_until_directory_changes(self):
+        from unittest.mock import patch
+        open(os.path.join(self.tmp_dir, 'a.wav'), 'wb').close()
+        self._age()
+
+        with patch('transcription.audio_index.os.scandir', wraps=os.scandir) as scandir:
+            self.assertEqual(audio_index.list_directory(self.tmp_dir), {'a.wav'})
+            self.assertEqual(audio_index.list_directory(self.tmp_dir), {'a.wav'})
+            self.assertEqual(scandir.call_count, 1)
+
+            open(os.path.join(self.tmp_dir, 'b.wav'), 'wb').close()
+            self._age(30)
+            self.assertEqual(audio_index.list_directory(self.tmp_dir), {'a.wav', 'b.wav'})
+            self.assertEqual(scandir.call_count, 2)
+
+    def test_recently_modified_directory_is_not_cached(self):
+        open(os.path.join(self.tmp_dir, 'a.wav'), 'wb').close()
+        audio_index.list_directory(self.tmp_dir)
+        os.remove(os.path.join(self.tmp_dir, 'a.wav'))
+        self.assertEqual(audio_index.list_directory(self.tmp_dir), frozenset())
+
+    def test_audio_index_exists(self):
+        os.makedirs(os.path.join(self.tmp_dir, 'audio'))
+        open(os.path.join(self.tmp_dir, 'audio', 'a.wav'), 'wb').close()
+        index = audio_index.AudioIndex()
+        self.assertTrue(index.exists(os.path.join(self.tmp_dir, 'audio', 'a.wav')))
+        self.assertFalse(index.exists(os.path.join(self.tmp_dir, 'audio', 'b.wav')))
+        self.assertFalse(index.exists(os.path.join(self.tmp_dir, 'missing', 'a.wav')))
+
+class PeaksTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'tone.wav')
+        # A ramp from -32768 up to 32767 and back, as 16-bit mono.
+        self.samples = [max(-32768, min(32767, (i * 64) % 65536 - 32768)) for i in range(4000)]
+        with wave.open(self.path, 'wb') as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(8000)
+            wf.writeframes(struct.pack(f'<{len(self.samples)}h', *self.samples))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_compute_peaks_matches_per_bin_min_max(self):
+        values, duration = peaks.compute_peaks(self.path, bins=10)
+        self.assertAlmostEqual(duration, 0.5)
+        expected = []
+        for i in range(10):
+            chunk = self.samples[i * 400:(i + 1) * 400]
+            expected += [max(min(chunk) >> 8, -127), max(chunk) >> 8]
+        self.assertEqual(values.tolist(), expected)
+
+    def test_compute_peaks_block_by_block(self):
+        from unittest.mock import patch
+        whole, _ = peaks.compute_peaks(self.path, bins=10)
+        # Blocks that straddle bin boundaries, and more bins than one block holds.
+        for block_frames in (333, 7):
+            with self.subTest(block_frames=block_frames), \
+                    patch('transcription.peaks.BLOCK_FRAMES', block_frames):
+                values, duration = peaks.compute_peaks(self.path, bins=10)
+                self.assertEqual(values.tolist(), whole.tolist())
+                self.assertAlmostEqual(duration, 0.5)
+                values, _ = peaks.compute_peaks(self.path, bins=1000)
+                expected = []
+                for i in range(1000):
+                    chunk = self.samples[i * 4:(i + 1) * 4]
+                    expected += [max(min(chunk) >> 8, -127), max(chunk) >> 8]
+                self.assertEqual(values.tolist(), expected)
+
+    def test_short_file_gets_one_bin_per_frame(self):
+        values, _ = peaks.compute_peaks(self.path, bins=10000)
+        self.assertEqual(len(values), 2 * len(self.samples))
+
+    def test_peaks_are_cached_until_audio_changes(self):
+        from unittest.mock import patch
+        first, _ = peaks.get_peaks(self.path, bins=10)
+        self.assertTrue(os.path.exists(peaks.peaks_cache_path(self.path)))
+
+        with patch('transcription.peaks.compute_peaks') as compute:
+            cached, duration = peaks.get_peaks(self.path, bins=10)
+            compute.assert_not_called()
+        self.assertEqual(cached.tolist(), first.tolist())
+        self.assertAlmostEqual(duration, 0.5)
+
+        # Re-recording the file invalidates the cache.
+        write_wav(self.path, seconds=1, sample_rate=8000)
+        values, duration = peaks.get_peaks(self.path, bins=10)
+        self.assertEqual(values.tolist(), [0] * 20)
+        self.assertAlmostEqual(duration, 1.0)
+
+class ManifestParserTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _parse(self, text, block_size=16):
+        path = os.path.join(self.tmp_dir, 'details.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return list(iter_objects_from_file(path, block_size=block_size))
+
+    def test_json_array_across_block_boundaries(self):
+        import json
+        rows = [{"audio_filepath": f"audio/{i}.wav", "text": f"വാക്യം {i} {{\"x\"}}"} for i in range(20)]
+        self.assertEqual(self._parse(json.dumps(rows, indent=4, ensure_ascii=False)), rows)
+
+    def test_jsonl(self):
+        text = '{"audio_filepath": "a.wav", "text": "A"}\n{"audio_filepath": "b.wav", "text": "B"}\n'
+        self.assertEqual([o['text'] for o in self._parse(text)], ['A', 'B'])
+
+    def test_json5_fallback_and_nbsp(self):
+        text = "[\n  {audio_filepath: 'a.wav', \"text\": \"one\u00a0two\",},\n]"
+        self.assertEqual(self._parse(text), [{'audio_filepath': 'a.wav', 'text': 'one two'}])
+
+    def test_malformed_objects_are_reported(self):
+        text = '[{"audio_filepath": "a.wav" "text": "x"}, {"audio_filepath": "b.wav"}, {"audio_filepath": '
+        items = self._parse(text)
+        self.assertEqual(len(items), 3)
+        self.assertIn('_error', items[0])
+        self.assertEqual(items[1], {'audio_filepath': 'b.wav'})
+        self.assertIn('_error', items[2])
+
+    def test_parallel_parse_matches_serial(self):
+        import json
+        # Split candidates inside strings and nested arrays must not confuse the merge.
+        rows = [{"audio_filepath": f"audio/{i}.wav", "text": "}, {" * (i % 3),
+                 "segments": [{"start": i}, {"end": "},{"}]} for i in range(50)]
+        path = os.path.join(self.tmp_dir, 'details.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, indent=2)
+
+        for chunk_size in (1, 37, 500, 1 << 20):
+            self.assertEqual(list(iter_objects_parallel(path, workers=2, chunk_size=chunk_size)), rows)
@@ -0,0 +1,99 @@
+"""
+Converting recordings between WAV and FLAC.
+
+FLAC is lossless and roughly half the size of 16-bit PCM for speech, so
+recordings can be kept as FLAC (AUDIO_STORAGE_FORMAT = "flac") and still
+be handed to clients that need WAV by decoding on the fly. Encoding and
+decoding go through soundfile (libsndfile), which librosa depends on.
+"""
+import struct
+
+import numpy as np
+
+# Frames decoded or encoded per step, so memory use does not grow with the
+# length of the recording.
+BLOCK_FRAMES = 64 * 1024
+
+# WAV sample formats FLAC stores losslessly, and the FLAC subtype for each.
+LOSSLESS_SUBTYPES = {
+    'PCM_S8': 'PCM_S8',
+    'PCM_U8': 'PCM_S8',
+    'PCM_16': 'PCM_16',
+    'PCM_24': 'PCM_24',
+}
+
+
+class TranscodeError(ValueError):
+    """Raised when a file cannot be converted or does not decode cleanly."""
+
+
+def wav_to_flac(src, dst):
+    """Encode the integer PCM WAV file `src` as FLAC at `dst`."""
+    import soundfile
+
+    try:
+        with soundfile.SoundFile(src) as f:
+            subtype = LOSSLESS_SUBTYPES.get(f.subtype)
+            if subtype is None:
+                raise TranscodeError(f"Cannot store {f.format} {f.subtype} audio losslessly as FLAC")
+            with soundfile.SoundFile(dst, 'w', samplerate=f.samplerate, channels=f.channels,
+                                     subtype=subtype, format='FLAC') as out:
+                # int32 holds every supported width without rescaling.
+                for block in f.blocks(BLOCK_FRAMES, dtype='int32'):
+                    out.write(block)
+    except soundfile.LibsndfileError as e:
+        raise TranscodeError(str(e))
+
+
+def verify_flac(path, metadata):
+    """
+    Decode all of the FLAC file at `path` and check that it holds as many
+    frames as its STREAMINFO (parsed into `metadata`) announces.
+    """
+    import soundfile
+
+    expected = round(metadata.duration * metadata.sample_rate)
+    decoded = 0
+    try:
+        with soundfile.SoundFile(path) as f:
+            for block in f.blocks(BLOCK_FRAMES, dtype='int32'):
+                decoded += len(block)
+    except soundfile.LibsndfileError as e:
+        raise TranscodeError(f"FLAC stream does not decode: {e}")
+    # A total of 0 in STREAMINFO means the encoder did not know the length.
+    if expected and decoded != expected:
+        raise TranscodeError(f"FLAC stream is truncated: {decoded} of {expected} frames decode")
+
+
+def wav_stream(path):
+    """
+    Decode the audio file at `path` to a 16- or 24-bit PCM WAV stream.
+    Returns `(content_length, chunks)`.
+    """
+    import soundfile
+
+    try:
+        f = soundfile.SoundFile(path)
+    except soundfile.LibsndfileError as e:
+        raise TranscodeError(str(e))
+    bits = 24 if f.subtype in ('PCM_24', 'PCM_32', 'FLOAT', 'DOUBLE') else 16
+    block_align = f.channels * bits // 8
+    data_size = f.frames * block_align
+    header = struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, f.channels, f.samplerate, f.samplerate * block_align, block_align, bits,
+        b'data', data_size,
+    )
+
+    def chunks():
+        with f:
+            yield header
+            for block in f.blocks(BLOCK_FRAMES, dtype='int16' if bits == 16 else 'int32'):
+                if bits == 16:
+                    yield block.astype('<i2', copy=False).tobytes()
+                else:
+                    # The top three bytes of each little-endian int32 sample.
+                    yield block.astype('<i4', copy=False).reshape(-1, 1).view(np.uint8)[:, 1:].tobytes()
+
+    return len(header) + data_size, chunks()
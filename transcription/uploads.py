@@ -0,0 +1,263 @@
+"""
+Writing uploaded audio into a project folder.
+
+An upload is streamed to a temporary file next to its destination, probed
+there, and only renamed to its final name once it is complete, so other
+requests never see a half-written file under a transcript's name.
+
+Long recordings can also be sent in chunks (see the Upload model): each
+chunk carries the byte offset it starts at and is appended to a part file
+in the project's audio folder, whose size is the resume point. A chunk
+that is retried after a lost response simply overwrites from its offset.
+Finalizing checks the header and registers the transcript; if registering
+fails the file goes back to being the part file, so finishing can be retried.
+
+Recordings arrive as WAV or FLAC. FLAC is kept as FLAC, and WAV is
+encoded as FLAC when AUDIO_STORAGE_FORMAT is "flac" (see transcode.py).
+"""
+import datetime
+import logging
+import os
+import struct
+import uuid
+
+from django.db import transaction
+from django.utils import timezone
+
+from Mozhi.settings import AUDIO_STORAGE_FORMAT, UPLOAD_EXPIRY
+from .audio import AudioFormatError, parse_audio_header, probe_audio_file
+from .audio_index import project_audio_dir
+from .models import Transcript, Upload, counter_deltas
+from .transcode import TranscodeError, verify_flac, wav_to_flac
+
+logger = logging.getLogger(__name__)
+
+
+class UploadError(ValueError):
+    """Raised when a chunk or a finished upload is rejected."""
+
+
+class UploadOffsetError(UploadError):
+    """Raised when a chunk does not start at or before the received size."""
+
+    def __init__(self, message, received):
+        super().__init__(message)
+        self.received = received
+
+
+def place_audio(path, directory, stem):
+    """
+    Move the uploaded audio file at `path` into `directory` as `stem` plus
+    the extension of its stored format, and return `(filename, info)`.
+    FLAC uploads must decode completely and are kept as they are; WAV
+    uploads are encoded as FLAC when AUDIO_STORAGE_FORMAT is "flac".
+    """
+    try:
+        metadata = parse_audio_header(path)
+    except AudioFormatError:
+        metadata = None
+
+    extension = 'wav'
+    try:
+        if metadata is not None and metadata.format == 'flac':
+            verify_flac(path, metadata)
+            extension = 'flac'
+        elif AUDIO_STORAGE_FORMAT == 'flac':
+            if metadata is None or metadata.format != 'wav':
+                raise UploadError("Only WAV or FLAC recordings can be stored as FLAC")
+            encoded_path = f"{path}.flac"
+            try:
+                wav_to_flac(path, encoded_path)
+                os.replace(encoded_path, path)
+            finally:
+                if os.path.exists(encoded_path):
+                    os.remove(encoded_path)
+            extension = 'flac'
+    except TranscodeError as e:
+        raise UploadError(str(e))
+
+    info = probe_audio_file(path)
+    filename = f"{stem}.{extension}"
+    # A rename keeps the mtime, so the probed file_mtime stays valid.
+    os.replace(path, os.path.join(directory, filename))
+    return filename, info
+
+
+def store_upload(chunks, directory, stem):
+    """
+    Write the byte strings in `chunks` to a temporary file in `directory`
+    and move it into place with place_audio; returns `(filename, info)`.
+    On error the temporary file is removed and nothing is left behind.
+    """
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".{uuid.uuid4().hex}.upload.tmp")
+    try:
+        with open(tmp_path, 'xb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        return place_audio(tmp_path, directory, stem)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def register_recording(transcript, target_path, before_commit=None, on_failure=None):
+    """
+    Insert `transcript`, whose audio is already at `target_path`, and bump
+    its project's totals. `before_commit`, if given, is called inside the
+    same transaction. If any of it fails the audio file is removed, or
+    handed to `on_failure(target_path)` when the caller has somewhere to
+    keep it.
+    """
+    try:
+        with transaction.atomic():
+            transcript.save(force_insert=True)
+            transcript.project.adjust_counters(
+                duration=transcript.duration,
+                **counter_deltas(added=[transcript.transcript]),
+            )
+            if before_commit is not None:
+                before_commit()
+    except Exception:
+        if on_failure is None:
+            os.remove(target_path)
+        else:
+            on_failure(target_path)
+        raise
+
+
+def part_path(upload):
+    """Return the file holding the bytes received so far for `upload`."""
+    return os.path.join(project_audio_dir(upload.project), f".{upload.id}.upload.part")
+
+
+def received_bytes(upload):
+    """Return how many bytes of `upload` are on disk, the offset to resume from."""
+    try:
+        return os.path.getsize(part_path(upload))
+    except FileNotFoundError:
+        return 0
+
+
+def write_chunk(upload, offset, chunks):
+    """
+    Write the byte strings in `chunks` to `upload`'s part file starting at
+    `offset`, and return the new received size. Anything previously
+    received past `offset` is discarded, so resending a chunk is harmless.
+    Only touches the filesystem; call touch_upload afterwards.
+    """
+    path = part_path(upload)
+    received = received_bytes(upload)
+    if offset < 0 or offset > received:
+        raise UploadOffsetError(f"Chunk starts at {offset} but {received} bytes were received", received)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'r+b' if received else 'wb') as f:
+        f.truncate(offset)
+        f.seek(offset)
+        written = offset
+        for chunk in chunks:
+            written += len(chunk)
+            if upload.size is not None and written > upload.size:
+                f.truncate(offset)
+                raise UploadError(f"Upload is larger than the announced {upload.size} bytes")
+            f.write(chunk)
+        f.flush()
+        # The client treats an acknowledged chunk as stored.
+        os.fsync(f.fileno())
+    return written
+
+
+def touch_upload(upload):
+    """Record that `upload` received a chunk, postponing its expiry."""
+    Upload.objects.filter(pk=upload.pk).update(updated_at=timezone.now())
+
+
+def _check_complete(path, received):
+    """Reject a part file whose header announces more bytes than arrived."""
+    with open(path, 'rb') as f:
+        header = f.read(12)
+    if len(header) == 12 and header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+        riff_size, = struct.unpack('<I', header[4:8])
+        # 0 and 0xFFFFFFFF are what streaming encoders write when the size is unknown.
+        if riff_size not in (0, 0xFFFFFFFF) and riff_size + 8 > received:
+            raise UploadError(f"Upload is incomplete: the header announces {riff_size + 8} bytes, {received} arrived")
+
+
+def place_upload(upload):
+    """
+    Check that `upload` is a complete WAV or FLAC file and move it into the
+    project's audio folder. Returns `(filename, info)`. Only touches the
+    filesystem; register_upload then records it.
+    """
+    path = part_path(upload)
+    received = received_bytes(upload)
+    if not received:
+        raise UploadError("Nothing was uploaded")
+    if upload.size is not None and received != upload.size:
+        raise UploadError(f"Upload is incomplete: {received} of {upload.size} bytes arrived")
+    _check_complete(path, received)
+    try:
+        metadata = parse_audio_header(path)
+    except AudioFormatError as e:
+        raise UploadError(f"Not a valid WAV or FLAC file: {e}")
+    if metadata.format not in ('wav', 'flac'):
+        raise UploadError(f"Not a valid WAV or FLAC file: found {metadata.format}")
+
+    return place_audio(path, project_audio_dir(upload.project), upload.id)
+
+
+def register_upload(upload, filename, info):
+    """
+    Register the Transcript for an upload placed as `filename` and drop the
+    upload in the same transaction, so there is never both or neither.
+    """
+    transcript = Transcript(id=upload.id, project=upload.project, user=upload.user,
+                            transcript=upload.transcript, audio_file=filename)
+    transcript.set_audio_info(info)
+    register_recording(transcript, os.path.join(project_audio_dir(upload.project), filename),
+                       before_commit=upload.delete, on_failure=lambda path: restore_part(upload, path))
+    return transcript
+
+
+def restore_part(upload, path):
+    """
+    Move the placed audio at `path` back to `upload`'s part file, so that a
+    finish that failed to register it can be retried: unlike a direct
+    upload, the client no longer has the bytes to send again.
+    """
+    target = part_path(upload)
+    os.replace(path, target)
+    size = os.path.getsize(target)
+    if upload.size is not None and size != upload.size:
+        # Transcoding to FLAC changed the size of the now complete file.
+        try:
+            Upload.objects.filter(pk=upload.pk).update(size=size)
+        except Exception:
+            logger.exception(f"Could not record the new size of upload {upload.id}")
+
+
+def remove_part(upload):
+    """Remove `upload`'s part file, if there is one."""
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def discard_upload(upload):
+    """Delete `upload` and its part file."""
+    remove_part(upload)
+    upload.delete()
+
+
+def purge_expired_uploads():
+    """Discard uploads that have not received a chunk for UPLOAD_EXPIRY seconds."""
+    cutoff = timezone.now() - datetime.timedelta(seconds=UPLOAD_EXPIRY)
+    expired = list(Upload.objects.filter(updated_at__lt=cutoff).select_related('project'))
+    for upload in expired:
+        logger.info(f"Discarding expired upload {upload.id}")
+        discard_upload(upload)
+    return len(expired)
@@ -1,59 +1,39 @@
-from Mozhi.settings import PAGE_NUM, SAVE_DIR, BATCH_SIZE, LINES_PER_READ
+from Mozhi.settings import PAGE_NUM, SAVE_DIR, BACKGROUND_IMPORTS, IMPORT_POLL_INTERVAL, IMPORT_PROGRESS_STREAM_SECONDS, PEAKS_BINS, UPLOAD_CHUNK_SIZE, AUDIO_STORAGE_FORMAT
 from django.shortcuts import render, redirect, get_object_or_404
 from django.conf import settings
-from django.http import HttpResponse, JsonResponse, FileResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 import os
 import shutil
+import time
 from .forms import ProjectForm, ImportProjectForm
-from .models import Transcript, Project
+from .models import Transcript, Project, ImportJob, Upload, counter_deltas
+from .audio import get_audio_duration
+from .uploads import (
+    UploadError, UploadOffsetError, discard_upload, place_upload, purge_expired_uploads,
+    received_bytes, register_recording, register_upload, store_upload, touch_upload, write_chunk,
+)
+from .serving import audio_content_type, serve_as_wav, serve_file
+from .peaks import PeaksError, get_peaks, remove_peaks
+from .pagination import page_from_request
+from .search import count_matches, search_transcripts
+from .edits import EditsFormatError, apply_edits, parse_edits, summarise
+from . import metrics
 from django.core.paginator import Paginator
 import json
 from django.contrib import messages
 from django.contrib.auth import logout as auth_logout, login as auth_login
 from django.contrib.auth.forms import AuthenticationForm
+from django.core.exceptions import ValidationError
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
-import librosa
-import wave
+from django.db import transaction
+import base64
 import logging
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 
 logger = logging.getLogger(__name__)
 
-def get_wav_duration(filepath: str) -> float:
-    """Return the duration in seconds of a WAV file by reading its header."""
-    try:
-        with wave.open(filepath, 'rb') as wf:
-            frames = wf.getnframes()
-            rate = wf.getframerate()
-            
-            # Check for zero to prevent ZeroDivisionError
-            if rate <= 0:
-                logger.warning(f"Invalid framerate {rate} for {filepath}")
-                return 0.0
-                
-            duration = frames / float(rate)
-            return duration
-    except wave.Error as e:
-        # Specifically catch wave-related errors (e.g., not a valid WAV)
-        logger.error(f"File {filepath} is not a valid WAV format: {e}")
-        return 0.0
-    except Exception as e:
-        logger.error(f"Unexpected error reading {filepath}: {e}")
-        return 0.0
-
-
-
-def get_wav_duration_librosa(filepath):
-    """Return the duration in seconds of a WAV file with librosa"""
-    try:
-        logger.info(f"Processing file: {filepath}")
-        # audio_data, sample_rate = librosa.load(filepath)
-        duration = librosa.get_duration(path=filepath)
-        return duration
-    except Exception as e:
-        logger.error(f"Failed to read duration for {filepath}: {e}")
-        return 0.0
-
 @csrf_exempt
 def logout_view(request):
     if request.method == 'POST':
@@ -96,18 +76,54 @@ def project_list(request):
 @login_required
 def project_detail(request, project_id):
     project = get_object_or_404(Project, id=project_id)
-    transcripts_list = project.transcripts.all().order_by('-created_at')
+    transcripts_list = project.transcripts.all()
+    query = request.GET.get('q', '').strip()
 
-    paginator = Paginator(transcripts_list, PAGE_NUM) # Show 10 transcripts per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    transcripts_count = transcripts_list.count()
+    if query:
+        transcripts_list = search_transcripts(transcripts_list, query)
+        transcripts_count, count_is_exact = count_matches(transcripts_list, query, project.id)
+    else:
+        transcripts_count, count_is_exact = project.transcript_count, True
+
+    # Keyset pages on (created_at, id): no OFFSET scan however deep the page.
+    page_obj = page_from_request(request, transcripts_list, PAGE_NUM)
     
     return render(request, 
         'transcription/project_detail.html', {
         'project': project,
         'page_obj': page_obj,
         'transcripts_count' : transcripts_count,
+        'count_is_exact': count_is_exact,
+        'query': query,
+        'upload_format': AUDIO_STORAGE_FORMAT,
+    })
+
+
+@login_required
+def search(request):
+    """Search transcript text across every project, or one with `?project=<id>`."""
+    query = request.GET.get('q', '').strip()
+    transcripts_list = Transcript.objects.select_related('project')
+    project = None
+    project_id = request.GET.get('project')
+    if project_id:
+        try:
+            project = Project.objects.get(id=project_id)
+        except (Project.DoesNotExist, ValidationError):
+            project = None
+        else:
+            transcripts_list = transcripts_list.filter(project=project)
+
+    transcripts_list = search_transcripts(transcripts_list, query)
+    transcripts_count, count_is_exact = count_matches(transcripts_list, query, project.id if project else 'all')
+    page_obj = page_from_request(request, transcripts_list, PAGE_NUM)
+
+    return render(request, 'transcription/search.html', {
+        'project': project,
+        'query': query,
+        'page_obj': page_obj,
+        'transcripts_count': transcripts_count,
+        'count_is_exact': count_is_exact,
     })
 
 
@@ -138,54 +154,8 @@ def create_project(request):
         form = ProjectForm()
     return render(request, 'transcription/create_project.html', {'form': form})
 
-from django.db import transaction
-from django.http import JsonResponse
-import os, json, json5
-
-def iter_objects_from_file(filepath: str, lines_per_read: int):
-    """
-    Reads `lines_per_read` lines at a time, accumulates text until
-    a complete JSON object is detected (balanced braces), then
-    yields it as a parsed dict. Never holds more than a few lines
-    + one object in memory at once.
-    """
-    accumulator = ''
-    depth = 0
-    in_string = False
-    escape_next = False
-
-    with open(filepath, 'r', encoding='utf-8-sig') as f:
-        while True:
-            lines = f.readlines(lines_per_read)
-            if not lines:
-                break
-
-            for raw_line in lines:
-                line = raw_line.replace('\u00a0', ' ')  # preprocess per line
-
-                for char in line:
-                    if escape_next:
-                        escape_next = False
-                    elif char == '\\' and in_string:
-                        escape_next = True
-                    elif char == '"':
-                        in_string = not in_string
-                    elif not in_string:
-                        if char == '{':
-                            depth += 1
-                        elif char == '}':
-                            depth -= 1
-
-                    if depth > 0:
-                        accumulator += char
-                    elif depth == 0 and accumulator.strip():
-                        accumulator += char  # capture the closing '}'
-                        try:
-                            yield json5.loads(accumulator.strip())
-                        except Exception as e:
-                            print(f"Skipping malformed object: {e}\n{accumulator[:100]}")
-                            yield {'_error': f"Malformed JSON object: {e}"}
-                        accumulator = ''
+from django.urls import reverse
+from .imports import run_import_job, resume_import_job, sync_project as sync_from_manifest
 
 @csrf_exempt
 @login_required
@@ -206,6 +176,21 @@ def import_project(request):
         full_target_dir = os.path.join(SAVE_DIR, folder_name)
 
         if Project.objects.filter(name=folder_name).exists():
+            # A project left behind by a failed import, or by one that died
+            # with its process, is resumed from its last checkpoint rather
+            # than rejected.
+            last_job = (
+                ImportJob.objects
+                .filter(project__name=folder_name, status__in=[ImportJob.STATUS_FAILED, ImportJob.STATUS_RUNNING])
+                .order_by('-created_at')
+                .first()
+            )
+            if last_job is not None and last_job.can_resume:
+                return _dispatch_import_job(resume_import_job(last_job), is_ajax)
+            if last_job is not None and last_job.status == ImportJob.STATUS_RUNNING:
+                if is_ajax:
+                    return JsonResponse({'status': 'error', 'error': f'Project "{folder_name}" is still being imported.'}, status=400)
+                return redirect('project_list')
             if is_ajax:
                 return JsonResponse({'status': 'error', 'error': f'Project "{folder_name}" already exists. Please choose a different name or delete the existing project first.'}, status=400)
             return redirect('project_list')
@@ -215,83 +200,118 @@ def import_project(request):
                 return JsonResponse({'status': 'error', 'error': 'Folder not found on server'}, status=404)
             return redirect('project_list')
 
-        try:
-            json_path = os.path.join(full_target_dir, 'details.json')
+        job = ImportJob.objects.create(
+            folder_name=folder_name,
+            folder_path=SAVE_DIR,
+            sample_rate=sample_rate,
+            user=request.user if request.user.is_authenticated else None,
+        )
+        return _dispatch_import_job(job, is_ajax)
 
-            user = request.user if request.user.is_authenticated else None
-            if not user:
-                from django.contrib.auth.models import User
-                user = User.objects.filter(is_superuser=True).first() or User.objects.first()
+    return redirect('project_list')
 
-            missing_files = []
-            total_imported = 0
-            total_duration = 0.0
 
-            with transaction.atomic():
-                project = Project.objects.create(
-                    name=folder_name,
-                    folder_path=SAVE_DIR,
-                    sample_rate=sample_rate,
-                )
+def _dispatch_import_job(job, is_ajax):
+    """Queue or run an import job and build the response import_project returns."""
+    # Leave the job for `manage.py run_import_worker` and let the client
+    # follow its progress instead of holding this request open.
+    if BACKGROUND_IMPORTS:
+        if is_ajax:
+            return JsonResponse({
+                'status': 'queued',
+                'job_id': str(job.id),
+                'progress_url': reverse('import_job_progress', args=[job.id]),
+                'status_url': reverse('import_job_status', args=[job.id]),
+            })
+        return redirect('project_list')
 
-                batch = []
-                for item in iter_objects_from_file(json_path, lines_per_read=LINES_PER_READ):
-                    if '_error' in item:
-                        missing_files.append(item['_error'])
-                        continue
-
-                    audio_rel_path = item.get('audio_filepath')
-                    if audio_rel_path is None:
-                        missing_files.append("Missing 'audio_filepath' in JSON")
-                        continue
-
-                    audio_full_path = os.path.join(full_target_dir, audio_rel_path)
-
-                    if not os.path.exists(audio_full_path):
-                        missing_files.append(audio_rel_path)
-                        continue
-
-                    # total_duration += get_wav_duration(audio_full_path)
-                    total_duration += get_wav_duration_librosa(audio_full_path)
-
-                    batch.append(
-                        Transcript(
-                            project=project,
-                            user=user,
-                            transcript=item.get('text'),
-                            audio_file=os.path.basename(audio_rel_path),
-                        )
-                    )
+    run_import_job(job)
 
-                    if len(batch) >= BATCH_SIZE:
-                        Transcript.objects.bulk_create(batch)
-                        total_imported += len(batch)
-                        batch = []
+    if is_ajax:
+        if job.status == ImportJob.STATUS_FAILED:
+            return JsonResponse({'status': 'error', 'error': job.error}, status=500)
+        return JsonResponse({
+            'status': 'success',
+            'message': f'Imported {job.imported} items',
+            'missing_files': job.missing_files,
+        })
 
-                # flush any remaining items
-                if batch:
-                    Transcript.objects.bulk_create(batch)
-                    total_imported += len(batch)
+    return redirect('project_list')
 
-                # Update total duration on the project
-                project.total_duration = total_duration
-                project.save(update_fields=['total_duration'])
 
-            if is_ajax:
-                return JsonResponse({
-                    'status': 'success',
-                    'message': f'Imported {total_imported} items',
-                    'missing_files': missing_files,
-                })
+@csrf_exempt
+@login_required
+def resume_import(request, job_id):
+    """Resume a failed or stale import job from its last checkpoint."""
+    if request.method == 'POST':
+        job = get_object_or_404(ImportJob, id=job_id)
+        if not job.can_resume:
+            return JsonResponse({'status': 'error', 'error': 'This import cannot be resumed'}, status=400)
+        is_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
+        return _dispatch_import_job(resume_import_job(job), is_ajax)
 
-            return redirect('project_list')
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+
+@csrf_exempt
+@login_required
+def sync_project(request, project_id):
+    """Re-sync an existing project from the details.json in its folder."""
+    if request.method == 'POST':
+        project = get_object_or_404(Project, id=project_id)
+        delete = request.POST.get('delete', 'true') == 'true'
 
+        try:
+            result = sync_from_manifest(project, user=request.user, delete=delete)
+        except FileNotFoundError as e:
+            return JsonResponse({'status': 'error', 'error': str(e)}, status=404)
         except Exception as e:
-            if is_ajax:
-                return JsonResponse({'status': 'error', 'error': str(e)}, status=500)
-            return redirect('project_list')
+            return JsonResponse({'status': 'error', 'error': str(e)}, status=500)
+
+        return JsonResponse({
+            'status': 'success',
+            'message': f'Added {result.created}, updated {result.updated}, deleted {result.deleted} items',
+            'created': result.created,
+            'updated': result.updated,
+            'deleted': result.deleted,
+            'unchanged': result.unchanged,
+            'missing_files': result.missing_files,
+        })
+
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
 
-    return redirect('project_list')
+
+@login_required
+def import_job_status(request, job_id):
+    """Return the current state of an import job as a single JSON message."""
+    job = get_object_or_404(ImportJob, id=job_id)
+    return JsonResponse(job.progress_message())
+
+
+@login_required
+def import_job_progress(request, job_id):
+    """
+    Stream an import job's progress as NDJSON until it finishes, or for at
+    most IMPORT_PROGRESS_STREAM_SECONDS so a sync worker is not held past
+    its timeout; the page then follows the job through import_job_status.
+    """
+    job = get_object_or_404(ImportJob, id=job_id)
+
+    def stream_progress():
+        yield json.dumps({"type": "init", "total": None, "job_id": str(job.id)}) + "\n"
+
+        deadline = time.monotonic() + IMPORT_PROGRESS_STREAM_SECONDS
+        last_update = None
+        while True:
+            job.refresh_from_db()
+            if job.updated_at != last_update:
+                last_update = job.updated_at
+                yield json.dumps(job.progress_message()) + "\n"
+            if job.is_finished or time.monotonic() >= deadline:
+                return
+            time.sleep(IMPORT_POLL_INTERVAL)
+
+    return StreamingHttpResponse(stream_progress(), content_type='application/x-ndjson')
 
 from django.core.files.base import ContentFile
 
@@ -318,36 +338,133 @@ def save_record(request):
                 if not user:
                     return JsonResponse({'status': 'error', 'error': 'No user available'}, status=400)
 
-            # 1. Create Transcript record FIRST to get UUID
-            transcript_instance = Transcript.objects.create(
+            # 1. Pick the UUID up front so the file can be named after it
+            transcript_instance = Transcript(
                 project=project,
                 user=user,
                 transcript=transcript_text,
-                audio_file="PENDING"
             )
+            audio_dir = os.path.join(project.folder_path, project.name, 'audio')
 
-            # 2. Save audio to project folder using the UUID
-            target_dir = os.path.join(project.folder_path, project.name, 'audio')
-            if not os.path.exists(target_dir):
-                os.makedirs(target_dir, exist_ok=True)
-            
-            filename = f"{transcript_instance.id}.wav"
-            target_path = os.path.join(target_dir, filename)
-            
-            with open(target_path, 'wb+') as destination:
-                for chunk in audio_file.chunks():
-                    destination.write(chunk)
-
-            # 3. Update the record with actual filename
+            # 2. Stream the upload to a temp file, probe it and rename it into
+            # place as <id>.wav or <id>.flac
+            filename, info = store_upload(audio_file.chunks(), audio_dir, transcript_instance.id)
             transcript_instance.audio_file = filename
-            transcript_instance.save()
+            transcript_instance.set_audio_info(info)
 
-            # 4. Update project total duration
-            duration = get_wav_duration_librosa(target_path)
-            project.total_duration = (project.total_duration or 0) + duration
-            project.save(update_fields=['total_duration'])
+            # 3. Insert the finished row and bump the project totals together
+            register_recording(transcript_instance, os.path.join(audio_dir, filename))
 
             return JsonResponse({'status': 'success', 'transcript_id': str(transcript_instance.id)})
+        except UploadError as e:
+            return JsonResponse({'status': 'error', 'error': str(e)}, status=400)
+        except Exception as e:
+            return JsonResponse({'status': 'error', 'error': str(e)}, status=500)
+
+    return JsonResponse({'status': 'error', 'error': 'Method not allowed'}, status=405)
+
+
+@csrf_exempt
+@login_required
+def start_upload(request):
+    """Start a resumable, chunked upload of a recording."""
+    if request.method == 'POST':
+        try:
+            project = get_object_or_404(Project, id=request.POST.get('project_id'))
+        except ValidationError:
+            return JsonResponse({'status': 'error', 'error': 'Invalid project id'}, status=400)
+        try:
+            size = int(request.POST['size']) if request.POST.get('size') else None
+        except ValueError:
+            return JsonResponse({'status': 'error', 'error': 'Invalid size'}, status=400)
+
+        try:
+            purge_expired_uploads()
+            upload = Upload.objects.create(
+                project=project,
+                user=request.user,
+                transcript=request.POST.get('transcript'),
+                size=size,
+            )
+            return JsonResponse({
+                'status': 'success',
+                'upload_id': str(upload.id),
+                'offset': 0,
+                'chunk_size': UPLOAD_CHUNK_SIZE,
+            })
+        except Exception as e:
+            return JsonResponse({'status': 'error', 'error': str(e)}, status=500)
+
+    return JsonResponse({'status': 'error', 'error': 'Method not allowed'}, status=405)
+
+
+@csrf_exempt
+@login_required
+def upload_chunk(request, upload_id):
+    """
+    GET reports how many bytes of an upload arrived, PUT appends the request
+    body at the offset given in the Upload-Offset header and DELETE cancels
+    the upload.
+    """
+    upload = get_object_or_404(Upload.objects.select_related('project'), id=upload_id)
+
+    if request.method == 'GET':
+        return JsonResponse({'status': 'success', 'offset': received_bytes(upload), 'size': upload.size})
+
+    if request.method == 'PUT':
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return JsonResponse({'status': 'error', 'error': 'Missing Upload-Offset header'}, status=400)
+
+        try:
+            # Read the body in blocks so a chunk never has to fit in memory.
+            chunks = iter(lambda: request.read(64 * 1024), b'')
+            received = write_chunk(upload, offset, chunks)
+            touch_upload(upload)
+            return JsonResponse({'status': 'success', 'offset': received})
+        except UploadOffsetError as e:
+            return JsonResponse({'status': 'error', 'error': str(e), 'offset': e.received}, status=409)
+        except UploadError as e:
+            return JsonResponse({'status': 'error', 'error': str(e)}, status=400)
+        except Exception as e:
+            return JsonResponse({'status': 'error', 'error': str(e)}, status=500)
+
+    if request.method == 'DELETE':
+        try:
+            discard_upload(upload)
+            return JsonResponse({'status': 'success'})
+        except Exception as e:
+            return JsonResponse({'status': 'error', 'error': str(e)}, status=500)
+
+    return JsonResponse({'status': 'error', 'error': 'Method not allowed'}, status=405)
+
+
+@csrf_exempt
+@login_required
+def finish_upload(request, upload_id):
+    """Validate a fully uploaded recording and save it as a transcript."""
+    if request.method == 'POST':
+        upload = Upload.objects.select_related('project', 'user').filter(id=upload_id).first()
+        if upload is None:
+            # A retry after a lost response finds the transcript already saved.
+            if Transcript.objects.filter(id=upload_id).exists():
+                return JsonResponse({'status': 'success', 'transcript_id': str(upload_id)})
+            return JsonResponse({'status': 'error', 'error': 'Upload not found'}, status=404)
+
+        try:
+            try:
+                filename, info = place_upload(upload)
+            except Exception:
+                # A concurrent finish of the same upload may have moved the
+                # part file and saved the transcript in the meantime.
+                if Transcript.objects.filter(id=upload.id).exists():
+                    return JsonResponse({'status': 'success', 'transcript_id': str(upload.id)})
+                raise
+            transcript = register_upload(upload, filename, info)
+            return JsonResponse({'status': 'success', 'transcript_id': str(transcript.id)})
+        except UploadError as e:
+            return JsonResponse({'status': 'error', 'error': str(e)}, status=400)
         except Exception as e:
             return JsonResponse({'status': 'error', 'error': str(e)}, status=500)
 
@@ -357,15 +474,49 @@ def save_record(request):
 @login_required
 def serve_audio(request, transcript_id):
     """Serves audio files from the project-specific folders."""
-    transcript = get_object_or_404(Transcript, id=transcript_id)
+    transcript = get_object_or_404(Transcript.objects.select_related('project'), id=transcript_id)
     project = transcript.project
     file_path = os.path.join(project.folder_path, project.name, 'audio', transcript.audio_file)
-    
-    if os.path.exists(file_path):
-        return FileResponse(open(file_path, 'rb'), content_type='audio/wav')
-    else:
+
+    # ?format=wav decodes other formats for clients that can only play WAV.
+    if request.GET.get('format') == 'wav' and audio_content_type(file_path) != 'audio/wav':
+        return serve_as_wav(request, file_path)
+
+    # Supports Range/206, ETag/Last-Modified revalidation and web server offload.
+    return serve_file(request, file_path, content_type=audio_content_type(file_path))
+
+@login_required
+def audio_peaks(request, transcript_id):
+    """Return the precomputed waveform peaks of a transcript's audio file."""
+    transcript = get_object_or_404(Transcript.objects.select_related('project'), id=transcript_id)
+    project = transcript.project
+    file_path = os.path.join(project.folder_path, project.name, 'audio', transcript.audio_file)
+
+    try:
+        st = metrics.stat(file_path)
+    except OSError:
         return JsonResponse({'error': 'File not found'}, status=404)
 
+    # The peaks only change with the audio file, so reuse its validators.
+    etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}-p{PEAKS_BINS}"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(st.st_mtime))
+    if response is None:
+        try:
+            peaks, duration = get_peaks(file_path, PEAKS_BINS, st=st)
+        except PeaksError as e:
+            return JsonResponse({'error': str(e)}, status=500)
+        response = JsonResponse({
+            'duration': transcript.duration or duration,
+            'bins': len(peaks) // 2,
+            # Interleaved int8 [min, max] pairs.
+            'peaks': base64.b64encode(peaks.tobytes()).decode('ascii'),
+        })
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(st.st_mtime)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
 import shutil
 
 @csrf_exempt
@@ -403,16 +554,29 @@ def delete_transcript(request, transcript_id):
             project = transcript.project
             target_path = os.path.join(project.folder_path, project.name, 'audio', transcript.audio_file)
 
-            # Subtract audio duration from project total
-            if os.path.exists(target_path):
-                duration = get_wav_duration_librosa(target_path)
-                project.total_duration = max(0, (project.total_duration or 0) - duration)
-                project.save(update_fields=['total_duration'])
+            # Subtract the stored duration; only rows that were never probed touch the disk.
+            audio_exists = os.path.exists(target_path)
+            duration = transcript.duration
+            if duration is None and audio_exists:
+                duration = get_audio_duration(target_path)
+
+            with transaction.atomic():
+                # Re-read the text under a lock, and only subtract what this
+                # request deleted: a concurrent delete may have got there first.
+                text = (
+                    Transcript.objects.select_for_update().filter(pk=transcript.pk)
+                    .values_list('transcript', flat=True).first()
+                )
+                deleted = Transcript.objects.filter(pk=transcript.pk).delete()[0]
+                if deleted:
+                    project.adjust_counters(
+                        duration=-(duration or 0.0),
+                        **counter_deltas(removed=[text], missing_audio=0 if audio_exists else -1),
+                    )
 
-            if delete_files and os.path.exists(target_path):
+            if deleted and delete_files and audio_exists:
                 os.remove(target_path)
-            
-            transcript.delete()
+                remove_peaks(target_path)
             return JsonResponse({'status': 'success'})
         except Exception as e:
             return JsonResponse({'status': 'error', 'error': str(e)}, status=500)
@@ -429,10 +593,50 @@ def edit_transcript(request, transcript_id):
         new_text = request.POST.get('text', '').strip()
         
         try:
-            transcript.transcript = new_text
-            transcript.save()
+            with transaction.atomic():
+                # Lock and re-read the row, so that concurrent edits each count
+                # from the text they actually replace.
+                locked = Transcript.objects.select_for_update().filter(pk=transcript.pk).only('transcript').first()
+                if locked is None:
+                    return JsonResponse({'status': 'error', 'error': 'Transcript not found'}, status=404)
+                old_text = locked.transcript
+                locked.transcript = new_text
+                locked.save(update_fields=['transcript'])
+                transcript.project.adjust_counters(**counter_deltas(added=[new_text], removed=[old_text]))
             return JsonResponse({'status': 'success', 'text': new_text})
         except Exception as e:
             return JsonResponse({'status': 'error', 'error': str(e)}, status=500)
 
-    return JsonResponse({'error': 'Method not allowed'}, status=405)
\ No newline at end of file
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+
+@csrf_exempt
+@login_required
+def edit_transcripts(request):
+    """
+    Apply a batch of `{"id": ..., "text": ...}` edits, sent as a JSON array
+    or as NDJSON, and report the status of each one.
+    """
+    if request.method == 'POST':
+        try:
+            # read() rather than body: a large batch may exceed DATA_UPLOAD_MAX_MEMORY_SIZE.
+            # A malformed line aborts the batch, rolling back the edits before it.
+            results = apply_edits(parse_edits(request.read(), strict=True))
+            return JsonResponse({
+                'status': 'success',
+                'counts': summarise(results),
+                'results': [result.as_dict() for result in results],
+            })
+        except EditsFormatError as e:
+            return JsonResponse({'status': 'error', 'error': str(e)}, status=400)
+        except Exception as e:
+            return JsonResponse({'status': 'error', 'error': str(e)}, status=500)
+
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+
+@login_required
+def metrics_view(request):
+    """Per-view request metrics in the Prometheus text format."""
+    return HttpResponse(metrics.registry.render_prometheus(),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
\ No newline at end of file